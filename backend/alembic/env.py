@@ -13,7 +13,10 @@ from config import config as app_config
 from db.session import Base
 from models.user import User
 from models.nft import NFT
-from models.transaction import Transaction
+from models.transaction import Transaction, TransactionItem
+from models.sales_rollup import DailySalesRollup
+from models.scheduler_lease import SchedulerLease
+from models.auth_token import RefreshToken, RevokedToken
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
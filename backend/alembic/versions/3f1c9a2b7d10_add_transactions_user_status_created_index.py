@@ -0,0 +1,30 @@
+"""Add composite (user_id, status, created_at) index on transactions
+
+Revision ID: 3f1c9a2b7d10
+Revises: 87de5fad2e40
+Create Date: 2026-10-19 10:12:31.482915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a2b7d10'
+down_revision: Union[str, None] = '87de5fad2e40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_transactions_user_status_created',
+        'transactions',
+        ['user_id', 'status', 'created_at'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_user_status_created', table_name='transactions')
@@ -0,0 +1,39 @@
+"""Rebuild transactions (user_id, status, created_at) index with created_at DESC
+
+Revision ID: b84e2f6c1a93
+Revises: 3f1c9a2b7d10
+Create Date: 2026-10-19 11:03:48.207154
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b84e2f6c1a93'
+down_revision: Union[str, None] = '3f1c9a2b7d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Newest-first history pages read the index in its natural order
+    op.drop_index('ix_transactions_user_status_created', table_name='transactions')
+    op.create_index(
+        'ix_transactions_user_status_created',
+        'transactions',
+        ['user_id', 'status', sa.text('created_at DESC')],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_user_status_created', table_name='transactions')
+    op.create_index(
+        'ix_transactions_user_status_created',
+        'transactions',
+        ['user_id', 'status', 'created_at'],
+        unique=False
+    )
@@ -0,0 +1,45 @@
+"""Add transaction_items for cart checkout
+
+Revision ID: c5d7e19f4a26
+Revises: b84e2f6c1a93
+Create Date: 2026-10-19 13:41:05.663120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d7e19f4a26'
+down_revision: Union[str, None] = 'b84e2f6c1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('transaction_items',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=False),
+    sa.Column('nft_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['nft_id'], ['nfts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_transaction_items_id'), 'transaction_items', ['id'], unique=False)
+    op.create_index(op.f('ix_transaction_items_nft_id'), 'transaction_items', ['nft_id'], unique=False)
+    op.create_index(op.f('ix_transaction_items_transaction_id'), 'transaction_items', ['transaction_id'], unique=False)
+    # Cart transactions reference their NFTs through items
+    op.alter_column('transactions', 'nft_id', existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM transactions WHERE nft_id IS NULL")
+    op.alter_column('transactions', 'nft_id', existing_type=sa.Integer(), nullable=False)
+    op.drop_index(op.f('ix_transaction_items_transaction_id'), table_name='transaction_items')
+    op.drop_index(op.f('ix_transaction_items_nft_id'), table_name='transaction_items')
+    op.drop_index(op.f('ix_transaction_items_id'), table_name='transaction_items')
+    op.drop_table('transaction_items')
@@ -0,0 +1,100 @@
+"""Numeric transaction amounts and daily_sales_rollup
+
+Revision ID: e2a9c4b7f031
+Revises: c5d7e19f4a26
+Create Date: 2026-10-19 10:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a9c4b7f031'
+down_revision: Union[str, None] = 'c5d7e19f4a26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # String amounts -> NUMERIC(12, 2); blank strings become NULL
+    op.alter_column('transactions', 'amount',
+                    existing_type=sa.String(length=50),
+                    type_=sa.Numeric(12, 2),
+                    existing_nullable=True,
+                    postgresql_using="NULLIF(TRIM(amount), '')::numeric(12, 2)")
+    op.alter_column('transaction_items', 'amount',
+                    existing_type=sa.String(length=50),
+                    type_=sa.Numeric(12, 2),
+                    existing_nullable=False,
+                    postgresql_using="amount::numeric(12, 2)")
+
+    # Backfill single-NFT transactions created without an amount from the NFT price
+    op.execute("""
+        UPDATE transactions
+        SET amount = CASE transactions.payment_method
+                         WHEN 'INR' THEN ROUND(nfts.price_inr::numeric, 2)
+                         ELSE ROUND(nfts.price_usd::numeric, 2)
+                     END,
+            currency = COALESCE(transactions.currency, transactions.payment_method::text)
+        FROM nfts
+        WHERE nfts.id = transactions.nft_id
+          AND transactions.amount IS NULL
+    """)
+
+    op.create_table('daily_sales_rollup',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('currency', sa.String(length=10), nullable=False),
+    sa.Column('contract_address', sa.String(length=255), nullable=False),
+    sa.Column('sale_count', sa.Integer(), nullable=False),
+    sa.Column('gross_amount', sa.Numeric(14, 2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day', 'currency', 'contract_address', name='uq_daily_sales_rollup_day_currency_contract')
+    )
+    op.create_index(op.f('ix_daily_sales_rollup_id'), 'daily_sales_rollup', ['id'], unique=False)
+    op.create_index(op.f('ix_daily_sales_rollup_day'), 'daily_sales_rollup', ['day'], unique=False)
+
+    # Seed the rollup from transactions already paid (single purchases and cart items)
+    op.execute("""
+        INSERT INTO daily_sales_rollup (day, currency, contract_address, sale_count, gross_amount)
+        SELECT day, currency, contract_address, COUNT(*), SUM(amount)
+        FROM (
+            SELECT CAST(COALESCE(t.completed_at, t.updated_at, t.created_at) AS DATE) AS day,
+                   COALESCE(t.currency, t.payment_method::text) AS currency,
+                   COALESCE(n.contract_address, '') AS contract_address,
+                   t.amount AS amount
+            FROM transactions t
+            JOIN nfts n ON n.id = t.nft_id
+            WHERE t.status = 'PAID' AND t.amount IS NOT NULL
+            UNION ALL
+            SELECT CAST(COALESCE(t.completed_at, t.updated_at, t.created_at) AS DATE),
+                   COALESCE(t.currency, t.payment_method::text),
+                   COALESCE(n.contract_address, ''),
+                   i.amount
+            FROM transactions t
+            JOIN transaction_items i ON i.transaction_id = t.id
+            JOIN nfts n ON n.id = i.nft_id
+            WHERE t.status = 'PAID'
+        ) AS paid
+        GROUP BY day, currency, contract_address
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_daily_sales_rollup_day'), table_name='daily_sales_rollup')
+    op.drop_index(op.f('ix_daily_sales_rollup_id'), table_name='daily_sales_rollup')
+    op.drop_table('daily_sales_rollup')
+    op.alter_column('transaction_items', 'amount',
+                    existing_type=sa.Numeric(12, 2),
+                    type_=sa.String(length=50),
+                    existing_nullable=False,
+                    postgresql_using="amount::text")
+    op.alter_column('transactions', 'amount',
+                    existing_type=sa.Numeric(12, 2),
+                    type_=sa.String(length=50),
+                    existing_nullable=True,
+                    postgresql_using="amount::text")
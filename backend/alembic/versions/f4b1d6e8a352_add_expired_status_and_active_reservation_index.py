@@ -0,0 +1,38 @@
+"""Add EXPIRED transaction status and partial index on active reservations
+
+Revision ID: f4b1d6e8a352
+Revises: e2a9c4b7f031
+Create Date: 2026-10-19 10:41:17.502913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b1d6e8a352'
+down_revision: Union[str, None] = 'e2a9c4b7f031'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ALTER TYPE ... ADD VALUE cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE transactionstatus ADD VALUE IF NOT EXISTS 'EXPIRED'")
+
+    op.create_index(
+        'ix_nfts_reserved_at_active',
+        'nfts',
+        ['reserved_at'],
+        unique=False,
+        postgresql_where=sa.text('is_reserved AND NOT is_sold')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_nfts_reserved_at_active', table_name='nfts')
+    # PostgreSQL cannot drop an enum value; map expired reservations back to cancelled
+    op.execute("UPDATE transactions SET status = 'CANCELLED' WHERE status = 'EXPIRED'")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark of buying 10 NFTs one at a time versus in a single cart checkout.
+
+Runs both flows through the purchase routes against a throwaway SQLite
+database with payment providers replaced by counters, and reports wall time,
+SQL statements and payment provider calls per flow.
+
+Usage:
+    python benchmarks/bench_cart_checkout.py [rounds]
+"""
+
+import sys
+import os
+import time
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from db.session import get_db, Base
+from models.user import User
+from models.nft import NFT
+from routes import purchase as purchase_routes
+from utils.auth import get_current_user, create_jwt_token
+from utils.inventory import MemoryInventoryCache
+
+DB_FILE = "bench_cart_checkout.db"
+CART_SIZE = 10
+
+engine = create_engine(f"sqlite:///./{DB_FILE}", connect_args={"check_same_thread": False})
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+statements = []
+payment_calls = []
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+
+def override_get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def fake_paypal(*args, **kwargs):
+    payment_calls.append(kwargs)
+    return "https://paypal.example.com/approve"
+
+
+def reset_database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(User(id=1, name="Bench User", email="bench@example.com", google_id="bench"))
+    db.add_all(
+        NFT(id=i, title=f"NFT {i}", image_url="https://example.com/nft.png", price_inr=1000.0, price_usd=12.0)
+        for i in range(1, CART_SIZE + 1)
+    )
+    db.commit()
+    db.close()
+    purchase_routes.inventory = MemoryInventoryCache()
+
+
+def run(label, rounds, flow):
+    elapsed = 0.0
+    total_statements = 0
+    total_payments = 0
+    for _ in range(rounds):
+        reset_database()
+        statements.clear()
+        payment_calls.clear()
+        start = time.perf_counter()
+        flow()
+        elapsed += time.perf_counter() - start
+        total_statements += len(statements)
+        total_payments += len(payment_calls)
+    print(f"{label:<28} {elapsed / rounds * 1000:8.2f} ms  "
+          f"{total_statements / rounds:6.1f} SQL statements  "
+          f"{total_payments / rounds:4.1f} payment calls")
+
+
+def main(rounds: int):
+    purchase_routes.initiate_paypal_payment = fake_paypal
+    purchase_routes.initiate_paypal_cart_payment = fake_paypal
+
+    app = FastAPI()
+    app.include_router(purchase_routes.router, prefix="/api")
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: User(
+        id=1, name="Bench User", email="bench@example.com", google_id="bench"
+    )
+    # Purchase routes read the bearer token for drop admission, so send one
+    client = TestClient(app, headers={"Authorization": f"Bearer {create_jwt_token(1, 'bench@example.com')}"})
+
+    def singles():
+        for nft_id in range(1, CART_SIZE + 1):
+            response = client.post(f"/api/purchase/usd/{nft_id}")
+            assert response.status_code == 200, response.text
+
+    def cart():
+        response = client.post(
+            "/api/purchase/cart",
+            json={"nft_ids": list(range(1, CART_SIZE + 1)), "payment_method": "USD"}
+        )
+        assert response.status_code == 200
+
+    print(f"Buying {CART_SIZE} NFTs with USD ({rounds} rounds)")
+    run(f"{CART_SIZE} single purchases", rounds, singles)
+    run("1 cart checkout", rounds, cart)
+
+    engine.dispose()
+    os.remove(DB_FILE)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark of arming and cancelling reservation expiry timers.
+
+Compares the in-memory heap of utils.reservation_expiry with one APScheduler
+date job per NFT (the previous add_reservation_expiry_job), arming N timers,
+cancelling half of them and popping the rest once due.
+
+Usage:
+    python benchmarks/bench_expiry_timers.py [timers]
+"""
+
+import sys
+import os
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from utils.reservation_expiry import ReservationExpiryEngine
+
+
+async def noop(nft_id: int):
+    pass
+
+
+def bench_heap(timers: int):
+    engine = ReservationExpiryEngine(ttl_seconds=30 * 60)
+    now = datetime.utcnow()
+
+    start = time.perf_counter()
+    for nft_id in range(timers):
+        engine.arm(nft_id, now + timedelta(milliseconds=nft_id))
+    armed = time.perf_counter()
+    for nft_id in range(0, timers, 2):
+        engine.cancel(nft_id)
+    cancelled = time.perf_counter()
+    fired = 0
+    deadline = engine.deadline_for(now + timedelta(milliseconds=timers))
+    while True:
+        due = engine.pop_due(deadline)
+        if not due:
+            break
+        fired += len(due)
+    popped = time.perf_counter()
+    assert fired == timers // 2
+    return armed - start, cancelled - armed, popped - cancelled
+
+
+async def bench_apscheduler(timers: int):
+    scheduler = AsyncIOScheduler()
+    scheduler.start(paused=True)
+    run_date = datetime.utcnow() + timedelta(minutes=30)
+
+    start = time.perf_counter()
+    for nft_id in range(timers):
+        scheduler.add_job(noop, args=[nft_id], trigger='date', run_date=run_date + timedelta(milliseconds=nft_id),
+                          id=f'expire_nft_{nft_id}', replace_existing=True)
+    armed = time.perf_counter()
+    for nft_id in range(0, timers, 2):
+        scheduler.remove_job(f'expire_nft_{nft_id}')
+    cancelled = time.perf_counter()
+    scheduler.shutdown(wait=False)
+    return armed - start, cancelled - armed, None
+
+
+def report(label, timers, timings):
+    arm, cancel, pop = timings
+    per_arm = arm / timers * 1e6
+    per_cancel = cancel / (timers // 2) * 1e6
+    pop_text = f"{pop * 1000:8.1f} ms pop" if pop is not None else " " * 15
+    print(f"{label:<28} arm {per_arm:8.2f} us  cancel {per_cancel:8.2f} us  {pop_text}")
+
+
+def main(timers: int):
+    print(f"Reservation expiry timers ({timers} armed, half cancelled)")
+    report("heap (expiry engine)", timers, bench_heap(timers))
+    report("APScheduler date jobs", timers, asyncio.run(bench_apscheduler(timers)))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark of request latency under load with synchronous and queued logging.
+
+Serves a trivial endpoint in-process through httpx at a fixed request rate
+(below capacity) and reports p50/p99/max latency for:
+
+  sync     the previous setup: a RotatingFileHandler on the app logger plus a
+           console handler on the root logger, both writing on the event loop,
+           and two lines per request (Request: and Response:)
+  queued   utils.logging_setup: one JSON line per request handed to the
+           background writer thread
+  sampled  queued, logging 10% of successful requests (LOG_SAMPLE_2XX_RATE)
+
+Log files go to a temporary directory; the console stream is a file there too.
+Each configuration runs twice: writing to the page cache, and with every
+100th write stalling for 5ms, as a busy disk, an fsync-ing journal or a
+full stderr pipe under a process manager would.
+
+Usage:
+    python benchmarks/bench_logging.py [requests] [rate]
+"""
+
+import sys
+import os
+import asyncio
+import logging
+import shutil
+import statistics
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from config import Config
+from middleware.logging import LoggingMiddleware
+from utils import logging_setup
+
+app_logger = logging.getLogger("app_middleware")
+
+
+class StallingStream:
+    """File stream whose every nth write blocks for stall_seconds"""
+
+    def __init__(self, stream, every: int = 100, stall_seconds: float = 0.005):
+        self.stream = stream
+        self.every = every
+        self.stall_seconds = stall_seconds
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        if self.writes % self.every == 0:
+            time.sleep(self.stall_seconds)
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def stall(handlers, stalls: bool):
+    if stalls:
+        for handler in handlers:
+            handler.stream = StallingStream(handler.stream)
+
+
+class SyncLoggingMiddleware(BaseHTTPMiddleware):
+    """The request logging this repo had before the queue: two synchronous lines per request"""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        app_logger.info(f"Request: {request.method} {request.url.path} | User: Anonymous | IP: bench")
+        response = await call_next(request)
+        app_logger.info(
+            f"Response: {request.method} {request.url.path} | Status: {response.status_code} | "
+            f"Time: {time.time() - start_time:.3f}s | User: Anonymous"
+        )
+        return response
+
+
+def build_app(middleware) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def configure_sync(log_dir: str, stalls: bool):
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    file_handler = RotatingFileHandler(os.path.join(log_dir, "app.log"), maxBytes=10*1024*1024, backupCount=5)
+    file_handler.setFormatter(formatter)
+    console = logging.StreamHandler(open(os.path.join(log_dir, "console.log"), "a"))
+    console.setFormatter(formatter)
+    app_logger.addHandler(file_handler)
+    app_logger.setLevel(logging.INFO)
+    logging.getLogger().addHandler(console)
+    stall([file_handler, console], stalls)
+    return [(app_logger, file_handler), (logging.getLogger(), console)]
+
+
+def reset_logging(installed):
+    for logger, handler in installed:
+        logger.removeHandler(handler)
+        handler.close()
+    logging_setup.stop_logging()
+
+
+async def run(label: str, app: FastAPI, requests: int, rate: float):
+    """Open-loop load: requests start at a fixed rate whatever the latency, as real clients do"""
+    latencies = []
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get("/health")
+
+        loop = asyncio.get_running_loop()
+
+        async def request(scheduled: float):
+            await client.get("/health")
+            latencies.append(loop.time() - scheduled)
+
+        tasks = []
+        started = loop.time()
+        for i in range(requests):
+            scheduled = started + i / rate
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(request(scheduled)))
+        await asyncio.gather(*tasks)
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"  {label:<8} p50 {p50:>6.2f}ms   p99 {p99:>6.2f}ms   max {latencies[-1] * 1000:>6.2f}ms")
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 400
+    log_dir = tempfile.mkdtemp(prefix="bench_logging_")
+    print(f"{requests} requests at {rate:.0f} req/s, logs in {log_dir}")
+
+    try:
+        for stalls in (False, True):
+            print("with write stalls" if stalls else "page cache")
+            installed = configure_sync(log_dir, stalls)
+            asyncio.run(run("sync", build_app(SyncLoggingMiddleware), requests, rate))
+            reset_logging(installed)
+
+            logging_setup.configure_logging(log_dir=log_dir)
+            listener = logging_setup._listener
+            # Console output of the listener goes to the temporary directory as well
+            listener.console.setStream(open(os.path.join(log_dir, "console.log"), "a"))
+            stall([listener.console, *listener.files.values()], stalls)
+            Config.LOG_SAMPLE_2XX_RATE = 1.0
+            asyncio.run(run("queued", build_app(LoggingMiddleware), requests, rate))
+            Config.LOG_SAMPLE_2XX_RATE = 0.1
+            asyncio.run(run("sampled", build_app(LoggingMiddleware), requests, rate))
+            reset_logging([])
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark of /health throughput through the application's middleware chain.
+
+Calls the ASGI app directly (no HTTP client or server in the way) and reports
+requests per second for:
+
+  bare     the endpoint without middleware
+  before   the previous chain: logging, security logging and security headers
+           as BaseHTTPMiddleware layers (each runs the rest of the chain in a
+           new task and relays the response through a memory stream)
+  after    the same work as plain ASGI middleware (middleware/logging.py)
+
+Both chains also include CORSMiddleware and AuthContextMiddleware, as in
+main.py. Logs are written by the queued handlers to a temporary directory.
+Requests rotate over many client addresses so none trips the per-IP
+request-count warning.
+
+Usage:
+    python benchmarks/bench_middleware.py [requests]
+"""
+
+import sys
+import os
+import asyncio
+import logging
+import random
+import shutil
+import tempfile
+import time
+import uuid
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from config import Config
+from middleware.auth import AuthContextMiddleware
+from middleware.logging import LoggingMiddleware, SecurityHeadersMiddleware, SecurityLoggingMiddleware
+from utils import logging_setup
+from utils.auth import request_auth
+
+logger = logging.getLogger("app_middleware")
+
+SUSPICIOUS_PATTERNS = [
+    "script", "javascript:", "onload=", "onerror=", "union select", "drop table", "../",
+    "etc/passwd", "admin'--", "1=1", "<script", "eval(", "document.cookie"
+]
+
+
+class BaseLogging(BaseHTTPMiddleware):
+    """LoggingMiddleware as it was before: a BaseHTTPMiddleware"""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.perf_counter()
+        request_id = uuid.uuid4().hex
+        context = logging_setup.request_id_var.set(request_id)
+        user_id = request_auth(request).user_id
+        try:
+            response = await call_next(request)
+        finally:
+            logging_setup.request_id_var.reset(context)
+        if response.status_code >= 300 or random.random() < Config.LOG_SAMPLE_2XX_RATE:
+            logger.info(
+                f"Response: {request.method} {request.url.path} | Status: {response.status_code} | "
+                f"Time: {time.perf_counter() - start_time:.3f}s | User: {user_id or 'Anonymous'}",
+                extra={"method": request.method, "path": request.url.path, "status": response.status_code}
+            )
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+class BaseSecurityLogging(BaseHTTPMiddleware):
+    """SecurityLoggingMiddleware as it was before: a BaseHTTPMiddleware"""
+
+    request_counts = {}
+
+    async def dispatch(self, request: Request, call_next):
+        url_str = str(request.url).lower()
+        for pattern in SUSPICIOUS_PATTERNS:
+            if pattern in url_str:
+                logger.warning(f"Suspicious request detected: {request.url}")
+                break
+        client_ip = request.client.host if request.client else 'Unknown'
+        current_time = time.time()
+        counts = [t for t in self.request_counts.get(client_ip, []) if current_time - t < 60]
+        counts.append(current_time)
+        self.request_counts[client_ip] = counts
+        return await call_next(request)
+
+
+async def add_security_headers(request: Request, call_next):
+    response = await call_next(request)
+    for name, value in SecurityHeadersMiddleware.HEADERS.items():
+        response.headers[name] = value
+    return response
+
+
+def build_app(chain: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy", "message": "NFT Marketplace API is running", "version": "1.0.0"}
+
+    if chain == "bare":
+        return app
+    app.add_middleware(LoggingMiddleware if chain == "after" else BaseLogging)
+    app.add_middleware(SecurityLoggingMiddleware if chain == "after" else BaseSecurityLogging)
+    app.add_middleware(CORSMiddleware, allow_origins=["http://localhost:3000"], allow_methods=["GET"])
+    if chain == "after":
+        app.add_middleware(SecurityHeadersMiddleware)
+    else:
+        app.middleware("http")(add_security_headers)
+    app.add_middleware(AuthContextMiddleware)
+    return app
+
+
+async def run(label: str, app: FastAPI, requests: int):
+    def receiver():
+        # The body, then the disconnect a server reports once the response is sent
+        messages = iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+        async def receive():
+            return next(messages, {"type": "http.disconnect"})
+        return receive
+
+    async def send(message):
+        pass
+
+    def scope(i: int):
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/health", "raw_path": b"/health", "root_path": "", "query_string": b"",
+            "headers": [(b"host", b"bench"), (b"user-agent", b"bench")],
+            "client": (f"10.0.{i % 250}.{i % 4}", 40000), "server": ("bench", 80),
+        }
+
+    for i in range(200):
+        await app(scope(i), receiver(), send)
+    started = time.perf_counter()
+    for i in range(requests):
+        await app(scope(i), receiver(), send)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<8} {requests / elapsed:>8.0f} req/s   {elapsed / requests * 1e6:>7.1f}us per request")
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    log_dir = tempfile.mkdtemp(prefix="bench_middleware_")
+    logging_setup.configure_logging(log_dir=log_dir)
+    logging_setup._listener.console.setStream(open(os.path.join(log_dir, "console.log"), "a"))
+    print(f"{requests} sequential requests to /health")
+    try:
+        for chain in ("bare", "before", "after"):
+            asyncio.run(run(chain, build_app(chain), requests))
+    finally:
+        logging_setup.stop_logging()
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of rate limiting overhead per request.
+
+Measures the in-process GCRA backend on its own and the full RateLimiter
+dependency (identity extraction + user and IP checks) for anonymous and
+authenticated requests.
+
+Usage:
+    python benchmarks/bench_rate_limit.py [iterations]
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.requests import Request
+
+from utils import rate_limit
+from utils.auth import create_jwt_token
+from utils.rate_limit import MemoryRateLimitBackend, RateLimiter
+
+
+def make_request(client_ip: str, token: str = None) -> Request:
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/api/purchase/inr/1",
+        "headers": headers,
+        "client": (client_ip, 50000),
+        "query_string": b"",
+    })
+
+
+async def time_per_call(label: str, iterations: int, call):
+    start = time.perf_counter()
+    for i in range(iterations):
+        await call(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<48} {elapsed / iterations * 1e6:8.2f} µs/request")
+
+
+async def main(iterations: int):
+    backend = MemoryRateLimitBackend(max_keys=100000)
+    rate_limit.backend = backend
+    # Large budget so every call takes the "allowed" path
+    limiter = RateLimiter(times=10**9, seconds=60)
+
+    anonymous = [make_request(f"10.0.{i // 256 % 256}.{i % 256}") for i in range(1000)]
+    token = create_jwt_token(1, "bench@example.com")
+    authenticated = [make_request(f"10.1.{i // 256 % 256}.{i % 256}", token) for i in range(1000)]
+
+    print(f"Rate limiting overhead ({iterations} iterations)")
+    await time_per_call("memory backend hit (hot key)", iterations,
+                        lambda i: backend.hit("ip:10.0.0.1:/bench", 10**9, 60))
+    await time_per_call("memory backend hit (100k rotating keys, LRU full)", iterations,
+                        lambda i: backend.hit(f"ip:{i % 200000}:/bench", 10**9, 60))
+    await time_per_call("RateLimiter dependency (anonymous, IP key)", iterations,
+                        lambda i: limiter(anonymous[i % 1000]))
+    await time_per_call("RateLimiter dependency (JWT, user + IP keys)", iterations,
+                        lambda i: limiter(authenticated[i % 1000]))
+    print(f"Tracked keys after run: {len(backend._tats)} (cap {backend.max_keys})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000))
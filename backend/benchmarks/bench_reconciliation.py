@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark of streaming statement reconciliation.
+
+Seeds a throwaway SQLite database with pending INR transactions, writes a
+statement CSV where a fraction of lines pay them and the rest are unrelated
+credits, and reports wall time of one run plus the peak Python heap of a second (dry) run
+traced with tracemalloc, which should stay flat as the statement grows.
+
+Usage:
+    python benchmarks/bench_reconciliation.py [lines] [pending]
+"""
+
+import sys
+import os
+import csv
+import time
+import tracemalloc
+import uuid
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from db.session import Base
+from models.user import User
+from models.nft import NFT
+from models.transaction import Transaction, PaymentMethod, TransactionStatus
+from utils.reconciliation import reconcile_statement
+
+DB_FILE = "bench_reconciliation.db"
+STATEMENT_FILE = "bench_statement.csv"
+
+
+def seed(session_factory, pending: int) -> list:
+    db = session_factory()
+    db.add(User(id=1, name="Bench User", email="bench@example.com", google_id="bench"))
+    db.execute(insert(NFT), [
+        {"id": i, "title": f"NFT {i}", "image_url": "https://example.com/nft.png",
+         "price_inr": 1000.0, "price_usd": 12.0, "is_reserved": True}
+        for i in range(1, pending + 1)
+    ])
+    refs = [str(uuid.uuid4()) for _ in range(pending)]
+    db.execute(insert(Transaction), [
+        {"id": i, "user_id": 1, "nft_id": i, "payment_method": PaymentMethod.INR,
+         "status": TransactionStatus.PENDING, "txn_ref": refs[i - 1], "amount": "1000.0", "currency": "INR"}
+        for i in range(1, pending + 1)
+    ])
+    db.commit()
+    db.close()
+    return refs
+
+
+def write_statement(lines: int, refs: list):
+    step = max(lines // len(refs), 1)
+    with open(STATEMENT_FILE, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Narration", "Amount", "Balance"])
+        paid = 0
+        for i in range(lines):
+            if i % step == 0 and paid < len(refs):
+                writer.writerow(["2024-01-01", f"UPI/CR/{refs[paid]}/buyer@okbank", "1,000.00", i])
+                paid += 1
+            else:
+                writer.writerow(["2024-01-01", f"NEFT/CR/{i:012d}/SOME VENDOR", "250.00", i])
+
+
+def main(lines: int, pending: int):
+    engine = create_engine(f"sqlite:///./{DB_FILE}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    refs = seed(session_factory, pending)
+    write_statement(lines, refs)
+    size_mb = os.path.getsize(STATEMENT_FILE) / 1024 / 1024
+
+    db = session_factory()
+    start = time.perf_counter()
+    with open(STATEMENT_FILE, newline="") as statement:
+        report = reconcile_statement(db, statement)
+    elapsed = time.perf_counter() - start
+
+    # Re-run against the same file with memory tracing (dry run, nothing left to match)
+    tracemalloc.start()
+    with open(STATEMENT_FILE, newline="") as statement:
+        reconcile_statement(db, statement, dry_run=True)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.close()
+
+    print(f"Statement: {lines} lines ({size_mb:.1f} MB), {pending} pending INR transactions")
+    print(f"Reconciled in {elapsed:.2f} s ({lines / elapsed:,.0f} lines/s)")
+    print(f"Matched {report.matched}, unmatched {report.unmatched_count}, invalid {report.invalid_count}")
+    print(f"Peak traced memory during a pass: {peak / 1024 / 1024:.1f} MB")
+
+    engine.dispose()
+    os.remove(DB_FILE)
+    os.remove(STATEMENT_FILE)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    )
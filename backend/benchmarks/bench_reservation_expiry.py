@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the reservation expiry sweep with many stale reservations.
+
+Seeds a throwaway SQLite database with stale reservations (each with a
+pending transaction) and times the set-based check_expired_reservations
+against the previous per-NFT loop, counting SQL statements for both.
+
+Usage:
+    python benchmarks/bench_reservation_expiry.py [stale] [legacy_stale]
+"""
+
+import sys
+import os
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, create_engine, event, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from db.session import Base
+from models.user import User
+from models.nft import NFT
+from models.transaction import Transaction, PaymentMethod, TransactionStatus
+from utils import scheduler
+from utils.inventory import MemoryInventoryCache
+
+DB_FILE = "bench_reservation_expiry.db"
+
+engine = create_engine(f"sqlite:///./{DB_FILE}")
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+statements = []
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+
+def seed(stale: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    reserved_at = datetime.utcnow() - timedelta(hours=1)
+    db = SessionLocal()
+    db.add(User(id=1, name="Bench User", email="bench@example.com", google_id="bench"))
+    db.execute(insert(NFT), [
+        {"id": i, "title": f"NFT {i}", "image_url": "https://example.com/nft.png", "price_inr": 1000.0,
+         "price_usd": 12.0, "is_reserved": True, "reserved_at": reserved_at}
+        for i in range(1, stale + 1)
+    ])
+    db.execute(insert(Transaction), [
+        {"id": i, "user_id": 1, "nft_id": i, "payment_method": PaymentMethod.INR,
+         "status": TransactionStatus.PENDING, "txn_ref": f"ref-{i}", "amount": 1000, "currency": "INR"}
+        for i in range(1, stale + 1)
+    ])
+    db.commit()
+    # Gather planner statistics, as PostgreSQL autovacuum would; without them SQLite
+    # prefers the is_reserved index over the partial index on reserved_at
+    db.execute(text("ANALYZE"))
+    db.commit()
+    db.close()
+
+
+def legacy_sweep():
+    """The previous implementation: load every expired NFT, then one query and ORM update per NFT"""
+    db = SessionLocal()
+    expiry_time = datetime.utcnow() - timedelta(minutes=30)
+    expired_nfts = db.query(NFT).filter(
+        and_(NFT.is_reserved == True, NFT.is_sold == False, NFT.reserved_at < expiry_time)
+    ).all()
+    for nft in expired_nfts:
+        nft.is_reserved = False
+        nft.reserved_at = None
+        for transaction in db.query(Transaction).filter(
+            and_(Transaction.nft_id == nft.id, Transaction.status == TransactionStatus.PENDING)
+        ).all():
+            transaction.status = TransactionStatus.EXPIRED
+            transaction.updated_at = datetime.utcnow()
+    db.commit()
+    db.close()
+
+
+def run(label, stale, sweep):
+    seed(stale)
+    statements.clear()
+    start = time.perf_counter()
+    sweep()
+    elapsed = time.perf_counter() - start
+
+    db = SessionLocal()
+    remaining = db.query(NFT).filter(NFT.is_reserved == True).count()
+    db.close()
+    assert remaining == 0, f"{remaining} reservations left"
+    print(f"{label:<34} {stale:>7} stale  {elapsed:8.2f} s  {len(statements):>8} SQL statements")
+
+
+def main(stale: int, legacy_stale: int):
+    scheduler.JobSessionLocal = SessionLocal
+    scheduler.inventory = MemoryInventoryCache()
+
+    print("Reservation expiry sweep (SQLite)")
+    run("set-based, chunks of 1000", stale, lambda: asyncio.run(scheduler.check_expired_reservations()))
+    run("per-NFT loop (previous)", legacy_stale, legacy_sweep)
+
+    engine.dispose()
+    os.remove(DB_FILE)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    )
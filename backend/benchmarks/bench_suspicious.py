@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of suspicious-pattern matching on request URLs.
+
+Times one check of a URL that matches no pattern (the common case, and the
+worst one: the whole text is searched), at several URL lengths, for:
+
+  loop     the previous middleware code: a fresh list of the 13 patterns and
+           an `in` test for each against the lowercased URL
+  matcher  utils.suspicious.matcher.scan(), as SecurityLoggingMiddleware calls it
+  regex    one precompiled alternation of all patterns (longest first)
+  trie     one precompiled alternation with common prefixes factored out
+
+The regex variants are the usual single-pass alternatives; in CPython they
+lose to repeated substring search on longer URLs, which is why the matcher
+does not use them.
+
+Usage:
+    python benchmarks/bench_suspicious.py [iterations]
+"""
+
+import sys
+import os
+import random
+import re
+import string
+import timeit
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.suspicious import PatternMatcher, SUSPICIOUS_PATTERNS
+
+WORDS = (
+    "nft marketplace collection sort price desc page limit search token utm_source newsletter "
+    "utm_campaign autumn drop redirect callback state code filter category art music"
+).split()
+
+
+def url(length: int, rng: random.Random) -> str:
+    """A clean /api/nfts URL of about length characters with word and token query parameters"""
+    params = []
+    while sum(len(param) + 1 for param in params) < length:
+        value = rng.choice([rng.choice(WORDS), "".join(rng.choices(string.ascii_letters + string.digits + "-_", k=24))])
+        params.append(f"{rng.choice(WORDS)}={value}")
+    return ("/api/nfts?" + "&".join(params))[:length]
+
+
+def loop(url_str: str):
+    suspicious_patterns = [
+        "script", "javascript:", "onload=", "onerror=", "union select", "drop table", "../",
+        "etc/passwd", "admin'--", "1=1", "<script", "eval(", "document.cookie"
+    ]
+    url_str = url_str.lower()
+    for pattern in suspicious_patterns:
+        if pattern in url_str:
+            return pattern
+    return None
+
+
+def trie_regex(patterns) -> re.Pattern:
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for char in pattern:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def expression(node) -> str:
+        branches = [re.escape(char) + expression(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 and "" not in node else "(?:" + "|".join(branches) + ")"
+        return group + "?" if "" in node else group
+
+    return re.compile(expression(trie))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(1)
+    matcher = PatternMatcher(SUSPICIOUS_PATTERNS)
+    regex = re.compile("|".join(re.escape(p) for p in sorted(SUSPICIOUS_PATTERNS, key=len, reverse=True)))
+    trie = trie_regex(SUSPICIOUS_PATTERNS)
+
+    print(f"{'length':>6} {'loop':>9} {'matcher':>9} {'regex':>9} {'trie':>9}   (us per URL, best of 5)")
+    for length in (80, 300, 1000, 4000):
+        text = url(length, rng)
+        assert loop(text) is None and matcher.scan([("url", text)]) is None
+        assert regex.search(text.lower()) is None and trie.search(text.lower()) is None
+        candidates = (
+            lambda: loop(text),
+            lambda: matcher.scan([("url", text)]),
+            lambda: regex.search(text.lower()),
+            lambda: trie.search(text.lower()),
+        )
+        timings = [min(timeit.repeat(candidate, number=iterations, repeat=5)) / iterations * 1e6 for candidate in candidates]
+        print(f"{length:>6} " + " ".join(f"{timing:>9.2f}" for timing in timings))
+
+
+if __name__ == "__main__":
+    main()
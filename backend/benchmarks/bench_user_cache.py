@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark of authenticated /api/my-transactions throughput with and without
+the user snapshot cache.
+
+Seeds a throwaway SQLite database with users and a few transactions each,
+then serves requests in-process through httpx, rotating over the users with
+real JWTs. Reports requests per second and SQL statements per request; with
+the cache warm, authentication issues no statement at all.
+
+Usage:
+    python benchmarks/bench_user_cache.py [requests] [users]
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from db.session import Base, get_db
+from models.user import User
+from models.transaction import Transaction, PaymentMethod, TransactionStatus
+from routes import nft as nft_routes
+from routes.auth import create_jwt_token
+from utils.user_cache import user_cache
+
+DB_FILE = "bench_user_cache.db"
+
+engine = create_engine(f"sqlite:///./{DB_FILE}")
+async_engine = create_async_engine(f"sqlite+aiosqlite:///./{DB_FILE}")
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+statements = []
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+
+async def override_get_db():
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def seed(users: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "name": f"User {i}", "email": f"user{i}@example.com", "google_id": f"g{i}"}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(insert(Transaction), [
+            {"user_id": (i % users) + 1, "payment_method": PaymentMethod.INR, "status": TransactionStatus.PAID,
+             "txn_ref": f"ref-{i}", "amount": 1000, "currency": "INR"}
+            for i in range(users * 5)
+        ])
+
+
+async def run(label: str, requests: int, tokens: list, cached: bool):
+    app = FastAPI()
+    app.include_router(nft_routes.router, prefix="/api")
+    app.dependency_overrides[get_db] = override_get_db
+
+    user_cache.clear()
+    user_cache.hits = user_cache.misses = 0
+    user_cache.ttl_seconds = 300 if cached else 0
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        # Warm up connections (and the cache, when enabled)
+        for token in tokens:
+            await client.get("/api/my-transactions", headers={"Authorization": f"Bearer {token}"})
+
+        statements.clear()
+        start = time.perf_counter()
+        for i in range(requests):
+            response = await client.get(
+                "/api/my-transactions", headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+            )
+            assert response.status_code == 200, response.text
+        elapsed = time.perf_counter() - start
+
+    print(f"{label:<24} {requests / elapsed:10.0f} req/s  {elapsed / requests * 1000:8.3f} ms/req  "
+          f"{len(statements) / requests:5.2f} SQL/req")
+
+
+async def main(requests: int, users: int):
+    seed(users)
+    tokens = [create_jwt_token(i, f"user{i}@example.com") for i in range(1, users + 1)]
+
+    print(f"Authenticated GET /api/my-transactions ({users} users, SQLite)")
+    await run("no user cache", requests, tokens, cached=False)
+    await run("user snapshot cache", requests, tokens, cached=True)
+    print(f"cache: {user_cache.to_dict()}")
+
+    await async_engine.dispose()
+    engine.dispose()
+    os.remove(DB_FILE)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    ))
@@ -15,7 +15,14 @@ class Config:
     GOOGLE_CLIENT_ID: str = os.getenv("GOOGLE_CLIENT_ID", "")
     GOOGLE_CLIENT_SECRET: str = os.getenv("GOOGLE_CLIENT_SECRET", "")
     GOOGLE_REDIRECT_URI: str = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:8000/auth/callback")
-    
+    OIDC_REFRESH_SECONDS: int = int(os.getenv("OIDC_REFRESH_SECONDS", 3600))  # Background refetch of discovery and JWKS
+    OIDC_LOGIN_STATE_SECONDS: int = int(os.getenv("OIDC_LOGIN_STATE_SECONDS", 600))  # Time allowed on the consent screen
+
+    # Outbound HTTP (one pooled client per worker)
+    HTTP_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", 10.0))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+    HTTP_MAX_KEEPALIVE: int = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+
     # Gmail Configuration
     GMAIL_APP_PASSWORD: str = os.getenv("GMAIL_APP_PASSWORD", "")
     GMAIL_EMAIL: str = os.getenv("GMAIL_EMAIL", "")
@@ -37,12 +44,79 @@ class Config:
     # JWT Configuration
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-super-secret-jwt-key-change-in-production")
     JWT_SECRET: str = os.getenv("JWT_SECRET", os.getenv("SECRET_KEY", "your-super-secret-jwt-key-change-in-production"))
-    JWT_ALGORITHM: str = "HS256"
-    JWT_EXPIRATION_HOURS: int = 1
+    JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "ES256")  # ES256 or EdDSA (published as a JWKS), or HS256 with JWT_SECRET
+    JWT_KEYS_DIR: str = os.getenv("JWT_KEYS_DIR", "keys/jwt")  # <kid>.pem signing keys, <kid>.pub.pem retired keys
+    JWT_ACTIVE_KID: str = os.getenv("JWT_ACTIVE_KID", "")  # Pin the signing key (default: newest in JWT_KEYS_DIR)
+    JWT_SIGNING_KEY: str = os.getenv("JWT_SIGNING_KEY", "")  # PEM private key, instead of JWT_KEYS_DIR
+    JWT_SIGNING_KID: str = os.getenv("JWT_SIGNING_KID", "env")
+    JWT_KEYS_RELOAD_SECONDS: int = int(os.getenv("JWT_KEYS_RELOAD_SECONDS", 30))  # Min interval between reloads on an unknown kid
+    JWT_ACCEPT_HS256: bool = os.getenv("JWT_ACCEPT_HS256", "true").lower() == "true"  # Accept HS256 tokens issued before switching
+    ACCESS_TOKEN_MINUTES: int = int(os.getenv("ACCESS_TOKEN_MINUTES", 15))  # Access token lifetime; renewed via /auth/refresh
+    REFRESH_TOKEN_DAYS: int = int(os.getenv("REFRESH_TOKEN_DAYS", 30))
+    JWT_CACHE_MAX_ENTRIES: int = int(os.getenv("JWT_CACHE_MAX_ENTRIES", 10000))  # Verified tokens kept until they expire
+
+    # Access token revocation (in-memory Bloom filter synced from revoked_tokens)
+    REVOCATION_SYNC_SECONDS: int = int(os.getenv("REVOCATION_SYNC_SECONDS", 5))  # Delay before other workers see a logout
+    REVOCATION_SYNC_OVERLAP_SECONDS: int = int(os.getenv("REVOCATION_SYNC_OVERLAP_SECONDS", 60))
+    REVOCATION_REBUILD_SECONDS: int = int(os.getenv("REVOCATION_REBUILD_SECONDS", 600))  # Drops expired tokens from the filter
+    REVOCATION_FILTER_CAPACITY: int = int(os.getenv("REVOCATION_FILTER_CAPACITY", 100000))
+    REVOCATION_FILTER_ERROR_RATE: float = float(os.getenv("REVOCATION_FILTER_ERROR_RATE", 1e-6))  # False positives force a refresh
+
+    # Authenticated user cache (snapshots served to get_current_user without a query)
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", 60))  # Bound on staleness across workers
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
     
     # Redis Configuration for rate limiting
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
-    
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "redis")  # redis (falls back to memory) or memory
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))  # LRU cap for the in-process limiter
+
+    # Per-IP request monitoring (SecurityLoggingMiddleware; logs, does not block)
+    SECURITY_REQUEST_LIMIT: int = int(os.getenv("SECURITY_REQUEST_LIMIT", 100))  # Requests per window before a warning
+    SECURITY_WINDOW_SECONDS: int = int(os.getenv("SECURITY_WINDOW_SECONDS", 60))
+    SECURITY_COUNTER_BUCKETS: int = int(os.getenv("SECURITY_COUNTER_BUCKETS", 12))  # Window slides in steps of window / buckets
+    SECURITY_COUNTER_MAX_KEYS: int = int(os.getenv("SECURITY_COUNTER_MAX_KEYS", 100000))  # LRU cap on tracked IPs
+    SECURITY_COUNTER_BACKEND: str = os.getenv("SECURITY_COUNTER_BACKEND", "memory")  # memory or redis (shared by workers)
+    SECURITY_SCAN_HEADERS: bool = os.getenv("SECURITY_SCAN_HEADERS", "false").lower() == "true"  # Also scan header values for suspicious patterns
+    SECURITY_SCAN_BODY_BYTES: int = int(os.getenv("SECURITY_SCAN_BODY_BYTES", 0))  # Scan this many leading body bytes (0 disables)
+
+    # Hot-drop waiting room (opt-in per NFT)
+    DROP_MODE_ENABLED: bool = os.getenv("DROP_MODE_ENABLED", "false").lower() == "true"
+    DROP_MODE_BACKEND: str = os.getenv("DROP_MODE_BACKEND", "memory")  # memory or redis
+    DROP_MODE_NFT_IDS: str = os.getenv("DROP_MODE_NFT_IDS", "")  # Comma-separated NFT IDs in drop mode at startup
+    DROP_ADMISSION_TTL_SECONDS: int = int(os.getenv("DROP_ADMISSION_TTL_SECONDS", 30))
+    DROP_ETA_SECONDS_PER_TICKET: float = float(os.getenv("DROP_ETA_SECONDS_PER_TICKET", 2.0))
+    DROP_TICKET_GRACE_SECONDS: int = int(os.getenv("DROP_TICKET_GRACE_SECONDS", 15))
+
+    # Inventory availability cache (fast-reject of sold/reserved NFTs)
+    INVENTORY_CACHE_BACKEND: str = os.getenv("INVENTORY_CACHE_BACKEND", "memory")  # memory or redis
+    INVENTORY_RECONCILE_SECONDS: int = int(os.getenv("INVENTORY_RECONCILE_SECONDS", 60))
+
+    # Reservation expiry (in-memory timers, with a periodic sweep as a backstop)
+    RESERVATION_TTL_MINUTES: int = int(os.getenv("RESERVATION_TTL_MINUTES", 30))
+    RESERVATION_SWEEP_MINUTES: int = int(os.getenv("RESERVATION_SWEEP_MINUTES", 5))
+
+    # Scheduler leader election (only the lease holder runs shared background jobs)
+    SCHEDULER_LEADER_ELECTION: bool = os.getenv("SCHEDULER_LEADER_ELECTION", "true").lower() == "true"
+    SCHEDULER_LEASE_SECONDS: int = int(os.getenv("SCHEDULER_LEASE_SECONDS", 30))  # Failover time after a leader dies
+    SCHEDULER_THREADS: int = int(os.getenv("SCHEDULER_THREADS", 2))  # Threads (and DB connections) for background job queries
+
+    # Logging (JSON lines written by a background thread, see utils/logging_setup.py)
+    LOG_DIR: str = os.getenv("LOG_DIR", "logs")
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # Records beyond this are dropped, not waited for
+    LOG_SAMPLE_2XX_RATE: float = float(os.getenv("LOG_SAMPLE_2XX_RATE", 1.0))  # Fraction of successful requests logged
+
+    # Metrics (Prometheus text format at /metrics, see utils/metrics.py)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    SLOW_REQUEST_SECONDS: float = float(os.getenv("SLOW_REQUEST_SECONDS", 1.0))  # Slower requests are also logged to performance.log
+
+    # Request profiling (sampled stacks in the folded format, see utils/profiler.py)
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", 5))  # Time between stack samples of a profiled request
+    PROFILE_EVERY_N: int = int(os.getenv("PROFILE_EVERY_N", 0))  # Also profile 1 in N requests into a rolling per-route profile (0 disables)
+    PROFILE_FLUSH_SECONDS: int = int(os.getenv("PROFILE_FLUSH_SECONDS", 60))  # How often the rolling profile file is rewritten
+
     # Server Configuration
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "production")
     PORT: int = int(os.getenv("PORT", 8000))
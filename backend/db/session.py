@@ -1,16 +1,21 @@
 from config import config
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from typing import Generator
 
+from utils.metrics import instrument_engine, timed_pool
+
 # Detect if using PostgreSQL (async) or SQLite (sync)
 db_url = config.get_database_url()
 
 if db_url.startswith("postgresql+asyncpg"):
     from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
 
     engine = create_async_engine(
         db_url,
+        poolclass=timed_pool(AsyncAdaptedQueuePool, "requests"),
         pool_pre_ping=True,
         pool_recycle=300,
         echo=config.is_development(),
@@ -25,8 +30,7 @@ if db_url.startswith("postgresql+asyncpg"):
         async with SessionLocal() as session:
             yield session
 else:
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker, Session
+    from sqlalchemy.orm import Session
     from sqlalchemy.pool import StaticPool
 
     engine = create_engine(
@@ -49,6 +53,41 @@ else:
         with SessionLocal() as session:
             yield session
 
+# Synchronous engine for background jobs, which run in their own thread pool
+# (see utils.scheduler) so they never block the event loop. It has its own
+# connections: asyncpg URLs use psycopg2, as in Alembic, and SQLite does not
+# share the request engine's single StaticPool connection across threads.
+if db_url.startswith("postgresql+asyncpg"):
+    from sqlalchemy.pool import QueuePool
+
+    job_engine = create_engine(
+        db_url.replace("postgresql+asyncpg", "postgresql"),
+        poolclass=timed_pool(QueuePool, "jobs"),
+        pool_size=config.SCHEDULER_THREADS,
+        max_overflow=2,
+        pool_pre_ping=True,
+        pool_recycle=300,
+    )
+else:
+    job_engine = create_engine(
+        db_url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": 20,
+        },
+        pool_pre_ping=True,
+    )
+
+# Pool checkouts and connections in use, for /metrics
+instrument_engine(getattr(engine, "sync_engine", engine), "requests")
+instrument_engine(job_engine, "jobs")
+
+JobSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=job_engine
+)
+
 Base = declarative_base()
 
 def create_tables():
@@ -59,7 +98,10 @@ def create_tables():
     # Import all models to ensure they are registered with Base
     from models.user import User
     from models.nft import NFT
-    from models.transaction import Transaction
+    from models.transaction import Transaction, TransactionItem
+    from models.sales_rollup import DailySalesRollup
+    from models.scheduler_lease import SchedulerLease
+    from models.auth_token import RefreshToken, RevokedToken
     
     # Create all tables
     Base.metadata.create_all(bind=engine)
@@ -0,0 +1,30 @@
+"""
+Gunicorn settings: gunicorn -c gunicorn.conf.py main:app
+
+Workers are separate processes, each with its own metrics. Setting
+PROMETHEUS_MULTIPROC_DIR here, before any worker imports prometheus_client,
+makes every worker write its metrics to files in that directory, so /metrics
+on any worker reports the totals of all of them (see utils/metrics.py).
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "nft-marketplace-metrics"))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 4))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+
+def on_starting(server):
+    # Values left by a previous run would be added to this one's
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def child_exit(server, worker):
+    # Drop the in-flight gauges of a dead worker; its counters and histograms are kept
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,5 +1,6 @@
 import os
-from fastapi import FastAPI, Request, Depends
+from fastapi import FastAPI, Depends, HTTPException, Path, Response
+from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from dotenv import load_dotenv
@@ -8,46 +9,48 @@ import logging
 from contextlib import asynccontextmanager
 from pydantic import BaseModel, field_validator
 from typing import Optional
-import redis
-from fastapi_limiter import FastAPILimiter
-from fastapi_limiter.depends import RateLimiter
 
-# Import scheduler and middleware
+from config import Config
+
+# Import scheduler, rate limiting and middleware
 from utils.scheduler import start_scheduler, stop_scheduler
-from middleware.logging import LoggingMiddleware, SecurityLoggingMiddleware, setup_logging
+from utils.leader import scheduler_election
+from utils.jobs import job_stats
+from utils.rate_limit import RateLimiter, configure_rate_limiting
+from utils.request_counter import configure_request_counting
+from utils import metrics, profiler, suspicious
+from utils.auth import get_current_admin_user
+from middleware.logging import LoggingMiddleware, SecurityHeadersMiddleware, SecurityLoggingMiddleware, setup_logging
+from middleware.auth import AuthContextMiddleware
+from middleware.metrics import MetricsMiddleware
+from middleware.profiling import ProfilingMiddleware
+from utils.http_client import close_http_client
+from utils.oidc import google_oidc
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
-
-# Initialize additional loggers
+# Configure logging: JSON lines written to logs/ and stderr by a background thread
 security_logger, perf_logger = setup_logging()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle - startup and shutdown events"""
     # Startup
-    try:
-        # Initialize Redis for rate limiting
-        from config import Config
-        redis_url = getattr(Config, 'REDIS_URL', 'redis://localhost:6379')
-        redis_client = redis.from_url(redis_url, decode_responses=True)
-        await FastAPILimiter.init(redis_client)
-        logging.info("Redis rate limiter initialized")
-    except Exception as e:
-        logging.warning(f"Redis not available, rate limiting disabled: {e}")
+    # Rate limiting (and request counting, if so configured) uses Redis when reachable and in-process state otherwise
+    await configure_rate_limiting()
+    await configure_request_counting()
     
     start_scheduler()
+    # Fetch Google's discovery document and signing keys now, then keep them fresh
+    google_oidc.start()
     logging.info("Application startup complete")
     yield
     # Shutdown
+    google_oidc.stop()
     stop_scheduler()
-    await FastAPILimiter.close()
+    await close_http_client()
+    profiler.rolling.flush()
     logging.info("Application shutdown complete")
 
 # Initialize FastAPI app
@@ -60,7 +63,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Add logging middleware
+# Sample flagged admin requests and 1 in PROFILE_EVERY_N; innermost, inside request logging
+app.add_middleware(ProfilingMiddleware)
+
+# Add logging middleware (all middleware is plain ASGI, see middleware/logging.py)
 app.add_middleware(LoggingMiddleware)
 app.add_middleware(SecurityLoggingMiddleware)
 
@@ -87,28 +93,30 @@ class PurchaseRequest(BaseModel):
         return v
 
 # Security headers middleware
-@app.middleware("http")
-async def add_security_headers(request: Request, call_next):
-    response = await call_next(request)
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    return response
+app.add_middleware(SecurityHeadersMiddleware)
+
+# Request latency and in-flight requests for /metrics
+if Config.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Verify the bearer token once per request; added last so it wraps every
+# other layer, which all read the claims from request.state.auth
+app.add_middleware(AuthContextMiddleware)
 
 # Import and include routers
-from routes.auth import router as auth_router
+from routes.auth import router as auth_router, well_known_router
 from routes.nft import router as nft_router
 from routes.purchase import router as purchase_router
 
 # Apply rate limiting to purchase endpoints
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
+app.include_router(well_known_router, tags=["Authentication"])
 app.include_router(nft_router, prefix="/api", tags=["NFTs"])
 app.include_router(
     purchase_router, 
     prefix="/api", 
     tags=["Purchases"],
-    dependencies=[Depends(RateLimiter(times=10, seconds=60))]  # 10 requests per minute for purchases
+    dependencies=[Depends(RateLimiter(times=10, seconds=60, ip_times=30))]  # 10 requests per minute per user, 30 per IP
 )
 
 @app.get("/health")
@@ -120,6 +128,38 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/health/scheduler")
+async def scheduler_health():
+    """Scheduler leadership state and job timings of this worker, for monitoring"""
+    return {
+        **scheduler_election.to_dict(),
+        "jobs": {name: stats.to_dict() for name, stats in job_stats.items()}
+    }
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Metrics in the Prometheus text format, of all workers in multiprocess mode"""
+    if not Config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Set as a header: media_type would append a second charset
+    return Response(metrics.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+@app.get("/admin/profiles/{name}", include_in_schema=False)
+def get_profile(
+    name: str = Path(..., pattern=r"^(request-[A-Za-z0-9._-]{1,64}|rolling-\d+)\.folded$"),
+    current_user=Depends(get_current_admin_user)
+):
+    """Admin endpoint returning a folded-stack profile (see utils/profiler.py) for flamegraph tools"""
+    path = profiler.profile_path(name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain")
+
+@app.get("/health/security")
+async def security_health():
+    """Suspicious-pattern hit counters of this worker, for monitoring"""
+    return suspicious.matcher.to_dict()
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -0,0 +1,29 @@
+"""
+Per-request authentication context.
+
+AuthContextMiddleware verifies the bearer token once, before any other layer
+runs, and stores the outcome as request.state.auth (scope["state"]). The
+request logger, the rate limiter and get_current_user all read it from there
+instead of decoding the token again. It is a plain ASGI middleware, so it adds
+no task or response buffering of its own and works with streaming responses.
+"""
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from utils.auth import AuthContext
+
+
+class AuthContextMiddleware:
+    """Verify the request's bearer token and expose the claims as request.state.auth"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            authorization = None
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    authorization = value.decode("latin-1")
+                    break
+            scope.setdefault("state", {})["auth"] = AuthContext.from_header(authorization)
+        await self.app(scope, receive, send)
@@ -1,211 +1,245 @@
+"""
+Request logging, security monitoring and security headers.
+
+These middlewares are plain ASGI callables rather than BaseHTTPMiddleware
+subclasses: they run in the request's own task, observe the response through
+a wrapped send() and never buffer the body, so streaming responses (and
+server-sent events) pass through chunk by chunk and each layer costs a
+function call rather than an extra task and queue per request.
+"""
 import logging
+import random
+import re
 import time
-import json
-from datetime import datetime
-from fastapi import Request, Response
+import uuid
+from urllib.parse import unquote_plus
+from fastapi import Request
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from logging.handlers import RotatingFileHandler
-import os
-import traceback
-from utils.auth import verify_jwt_token
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from config import Config
+from utils import request_counter, suspicious
+from utils.auth import request_auth
+from utils.logging_setup import configure_logging, request_id_var
 
-# Create logs directory if it doesn't exist
-os.makedirs('logs', exist_ok=True)
+# Handlers live on the queue listener thread (see utils.logging_setup)
+logger = logging.getLogger('app_middleware')
+security_logger = logging.getLogger('security')
+perf_logger = logging.getLogger('performance')
 
-# Configure rotating file handler
-file_handler = RotatingFileHandler(
-    'logs/app.log',
-    maxBytes=10*1024*1024,  # 10MB
-    backupCount=5
-)
-file_handler.setFormatter(
-    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-)
+# Credentials are never scanned (or logged)
+_UNSCANNED_HEADERS = {b"authorization", b"cookie"}
 
-# Configure logger
-logger = logging.getLogger('app_middleware')
-logger.setLevel(logging.INFO)
-logger.addHandler(file_handler)
+# Client-supplied request ids are kept only when they look like ids
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware to log all HTTP requests and errors"""
+def request_id_for(scope: Scope) -> str:
+    """X-Request-ID of the request, or a fresh one"""
+    for name, value in scope["headers"]:
+        if name == b"x-request-id":
+            supplied = value.decode("latin-1")
+            if _REQUEST_ID.match(supplied):
+                return supplied
+            break
+    return uuid.uuid4().hex
+
+def client_host(scope: Scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else 'Unknown'
+
+class LoggingMiddleware:
+    """Middleware to log all HTTP requests and errors, one JSON line per request"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
     
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Extract user ID from JWT if present
-        user_id = None
-        try:
-            auth_header = request.headers.get("authorization")
-            if auth_header and auth_header.startswith("Bearer "):
-                token = auth_header.split(" ")[1]
-                payload = verify_jwt_token(token)
-                user_id = payload.get("user_id")
-        except Exception:
-            pass  # Token invalid or not present
-        
-        # Log request
-        logger.info(
-            f"Request: {request.method} {request.url.path} | "
-            f"User: {user_id or 'Anonymous'} | "
-            f"IP: {request.client.host if request.client else 'Unknown'}"
-        )
+        start_time = time.perf_counter()
+        method, path = scope["method"], scope["path"]
+        
+        # Every line logged while serving the request carries its id
+        request_id = request_id_for(scope)
+        context = request_id_var.set(request_id)
+        
+        # User ID from the token verified by AuthContextMiddleware, if present
+        user_id = request_auth(Request(scope)).user_id
+        client_ip = client_host(scope)
+        fields = {"method": method, "path": path, "user_id": user_id, "ip": client_ip}
+        status = None
+        
+        async def send_with_request_id(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
         
         try:
-            # Process request
-            response = await call_next(request)
-            
-            # Calculate response time
-            process_time = time.time() - start_time
-            
-            # Log response
-            log_level = logging.WARNING if response.status_code >= 400 else logging.INFO
-            logger.log(
-                log_level,
-                f"Response: {request.method} {request.url.path} | "
-                f"Status: {response.status_code} | "
-                f"Time: {process_time:.3f}s | "
-                f"User: {user_id or 'Anonymous'}"
-            )
-            
-            # Log error details for 4xx and 5xx responses
-            if response.status_code >= 400:
-                logger.error(
-                    f"Error Response: {request.method} {request.url.path} | "
-                    f"Status: {response.status_code} | "
-                    f"User: {user_id or 'Anonymous'} | "
-                    f"IP: {request.client.host if request.client else 'Unknown'}"
-                )
-            
-            return response
-            
+            # Process request (the body, streamed or not, is sent before this returns)
+            await self.app(scope, receive, send_with_request_id)
         except Exception as e:
-            # Calculate response time for errors
-            process_time = time.time() - start_time
-            
             # Log exception with full stack trace
+            process_time = time.perf_counter() - start_time
             logger.error(
-                f"Exception: {request.method} {request.url.path} | "
+                f"Exception: {method} {path} | "
                 f"User: {user_id or 'Anonymous'} | "
                 f"Time: {process_time:.3f}s | "
-                f"Error: {str(e)} | "
-                f"Traceback: {traceback.format_exc()}"
+                f"Error: {str(e)}",
+                exc_info=True,
+                extra={**fields, "status": 500, "duration_ms": round(process_time * 1000, 2)}
             )
+            if status is not None:
+                # Headers are already out; all we can do is drop the connection
+                raise
             
-            # Return JSON error response
-            return JSONResponse(
+            # Return JSON error response; error_id matches the request_id in the logs
+            response = JSONResponse(
                 status_code=500,
                 content={
                     "detail": "Internal server error",
-                    "error_id": f"{int(time.time())}-{hash(str(e)) % 10000}"
+                    "error_id": request_id
+                },
+                headers={"X-Request-ID": request_id}
+            )
+            await response(scope, receive, send)
+            return
+        finally:
+            request_id_var.reset(context)
+        
+        # Calculate response time
+        process_time = time.perf_counter() - start_time
+        status = status or 500
+        
+        # Errors are always logged; successful requests at LOG_SAMPLE_2XX_RATE
+        if status >= 300 or random.random() < Config.LOG_SAMPLE_2XX_RATE:
+            log_level = logging.ERROR if status >= 500 else logging.WARNING if status >= 400 else logging.INFO
+            logger.log(
+                log_level,
+                f"Response: {method} {path} | "
+                f"Status: {status} | "
+                f"Time: {process_time:.3f}s | "
+                f"User: {user_id or 'Anonymous'} | "
+                f"IP: {client_ip}",
+                extra={
+                    **fields,
+                    "status": status,
+                    "duration_ms": round(process_time * 1000, 2),
+                    "request_id": request_id
                 }
             )
 
-class SecurityLoggingMiddleware(BaseHTTPMiddleware):
+class SecurityLoggingMiddleware:
     """Middleware to log security-related events"""
     
-    async def dispatch(self, request: Request, call_next):
-        # Check for potential security threats
-        suspicious_patterns = [
-            "script",
-            "javascript:",
-            "onload=",
-            "onerror=",
-            "union select",
-            "drop table",
-            "../",
-            "etc/passwd",
-            "admin'--",
-            "1=1",
-            "<script",
-            "eval(",
-            "document.cookie"
-        ]
-        
-        # Check URL and query parameters
-        url_str = str(request.url).lower()
-        for pattern in suspicious_patterns:
-            if pattern in url_str:
-                logger.warning(
-                    f"Suspicious request detected: {request.method} {request.url} | "
-                    f"Pattern: {pattern} | "
-                    f"IP: {request.client.host if request.client else 'Unknown'}"
-                )
-                break
-        
-        # Check for high-frequency requests (basic rate limiting check)
-        client_ip = request.client.host if request.client else 'Unknown'
-        current_time = time.time()
-        
-        # This is a simple example - in production, use Redis or similar
-        if not hasattr(self, 'request_counts'):
-            self.request_counts = {}
-        
-        if client_ip not in self.request_counts:
-            self.request_counts[client_ip] = []
-        
-        # Clean old requests (older than 1 minute)
-        self.request_counts[client_ip] = [
-            req_time for req_time in self.request_counts[client_ip]
-            if current_time - req_time < 60
-        ]
-        
-        # Add current request
-        self.request_counts[client_ip].append(current_time)
-        
-        # Check if too many requests
-        if len(self.request_counts[client_ip]) > 100:  # 100 requests per minute
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        # Check URL and query parameters (and headers, if configured) for attack signatures
+        client_ip = client_host(scope)
+        query = scope.get("query_string", b"").decode("latin-1")
+        if "%" in query or "+" in query:
+            query = unquote_plus(query)
+        parts = [("url", f"{scope['path']}?{query}" if query else scope["path"])]
+        if Config.SECURITY_SCAN_HEADERS:
+            parts.extend(
+                ("header", value.decode("latin-1"))
+                for name, value in scope["headers"] if name not in _UNSCANNED_HEADERS
+            )
+        match = suspicious.matcher.scan(parts)
+        if match is not None:
+            self.report(scope, client_ip, *match)
+        
+        if Config.SECURITY_SCAN_BODY_BYTES > 0 and scope["method"] in ("POST", "PUT", "PATCH"):
+            receive = self.scanning_receive(scope, client_ip, receive, Config.SECURITY_SCAN_BODY_BYTES)
+        
+        # Check for high-frequency requests (sliding window per IP, see utils.request_counter)
+        count = await request_counter.counter.hit(client_ip)
+        limit = Config.SECURITY_REQUEST_LIMIT
+        
+        # Report the first request over the limit, then every further limit's worth
+        if count > limit and (count - limit - 1) % limit == 0:
+            user_agent = 'Unknown'
+            for name, value in scope["headers"]:
+                if name == b"user-agent":
+                    user_agent = value.decode("latin-1")
+                    break
+            
             # Log rate limit violation to security log
             security_logger.warning(
                 f"Rate limit exceeded: IP {client_ip} | "
-                f"Requests in last minute: {len(self.request_counts[client_ip])} | "
-                f"Endpoint: {request.url.path} | "
-                f"User-Agent: {request.headers.get('user-agent', 'Unknown')}"
+                f"Requests in last {Config.SECURITY_WINDOW_SECONDS}s: {count} | "
+                f"Endpoint: {scope['path']} | "
+                f"User-Agent: {user_agent}",
+                extra={"event": "RATE_LIMIT_VIOLATION", "ip": client_ip, "path": scope["path"], "requests": count}
             )
-            
-            # Also log to main security log file
-            with open('logs/security.log', 'a') as f:
-                f.write(
-                    f"{datetime.utcnow().isoformat()} - RATE_LIMIT_VIOLATION - "
-                    f"IP: {client_ip}, Path: {request.url.path}, "
-                    f"Requests: {len(self.request_counts[client_ip])}\n"
-                )
-        
-        return await call_next(request)
-
-def setup_logging():
-    """Setup additional logging configuration"""
+        
+        await self.app(scope, receive, send)
     
-    # Create security logger
-    security_handler = RotatingFileHandler(
-        'logs/security.log',
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5
-    )
-    security_handler.setFormatter(
-        logging.Formatter('%(asctime)s - SECURITY - %(levelname)s - %(message)s')
-    )
+    def scanning_receive(self, scope: Scope, client_ip: str, receive: Receive, limit: int) -> Receive:
+        """Wrap receive() to scan the first limit bytes of the body as the app reads it"""
+        prefix = bytearray()
+        scanned = False
+        
+        async def receive_and_scan() -> Message:
+            nonlocal scanned
+            message = await receive()
+            if not scanned and message["type"] == "http.request":
+                prefix.extend(message.get("body", b"")[:limit - len(prefix)])
+                if len(prefix) >= limit or not message.get("more_body", False):
+                    scanned = True
+                    match = suspicious.matcher.scan([("body", prefix.decode("latin-1"))])
+                    if match is not None:
+                        self.report(scope, client_ip, *match)
+            return message
+        
+        return receive_and_scan
     
-    security_logger = logging.getLogger('security')
-    security_logger.setLevel(logging.WARNING)
-    security_logger.addHandler(security_handler)
+    @staticmethod
+    def report(scope: Scope, client_ip: str, pattern: str, location: str):
+        logger.warning(
+            f"Suspicious request detected: {scope['method']} {Request(scope).url} | "
+            f"Pattern: {pattern} in {location} | "
+            f"IP: {client_ip}",
+            extra={"event": "SUSPICIOUS_REQUEST", "pattern": pattern, "location": location, "ip": client_ip}
+        )
+
+class SecurityHeadersMiddleware:
+    """Middleware adding security headers to every HTTP response"""
     
-    # Create performance logger
-    perf_handler = RotatingFileHandler(
-        'logs/performance.log',
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5
-    )
-    perf_handler.setFormatter(
-        logging.Formatter('%(asctime)s - PERFORMANCE - %(message)s')
-    )
+    HEADERS = {
+        "X-Content-Type-Options": "nosniff",
+        "X-Frame-Options": "DENY",
+        "X-XSS-Protection": "1; mode=block",
+        "Strict-Transport-Security": "max-age=31536000; includeSubDomains"
+    }
     
-    perf_logger = logging.getLogger('performance')
-    perf_logger.setLevel(logging.INFO)
-    perf_logger.addHandler(perf_handler)
+    def __init__(self, app: ASGIApp):
+        self.app = app
     
-    return security_logger, perf_logger
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in self.HEADERS.items():
+                    headers[name] = value
+            await send(message)
+        
+        await self.app(scope, receive, send_with_headers)
 
-# Initialize loggers
-security_logger, perf_logger = setup_logging()
+def setup_logging():
+    """Route all logging through the background writer and return the security and performance loggers"""
+    configure_logging()
+    return security_logger, perf_logger
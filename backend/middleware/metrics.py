@@ -0,0 +1,97 @@
+"""
+Request metrics for /metrics (see utils.metrics).
+
+Plain ASGI, like the other middleware: it times the request through the rest
+of the stack, takes the status from the response start and labels the
+observation with the route template the router matched, so
+/api/purchase/17 and /api/purchase/18 share one series. Requests slower than
+SLOW_REQUEST_SECONDS are also written to the performance log.
+"""
+import logging
+import time
+from typing import Callable, Dict, List
+
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import Config
+from utils.metrics import http_request_duration, http_requests_in_flight
+
+perf_logger = logging.getLogger('performance')
+
+# Anything else is reported as OTHER, so clients cannot create series at will
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+UNMATCHED = "unmatched"
+
+
+class RouteTemplates:
+    """Path template of the route that handled a request, e.g. /api/nfts/{nft_id}"""
+
+    def __init__(self):
+        self._routes: Dict[Callable, List[BaseRoute]] = {}
+
+    def __call__(self, scope: Scope) -> str:
+        # The router stores the matched endpoint in the (shared) scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED
+        routes = self._routes.get(endpoint)
+        if routes is None:
+            self._index(scope)
+            routes = self._routes.get(endpoint)
+            if routes is None:
+                return UNMATCHED
+        if len(routes) == 1:
+            return routes[0].path
+        # One endpoint serving several paths
+        for route in routes:
+            if route.matches(scope)[0] != Match.NONE:
+                return route.path
+        return routes[0].path
+
+    def _index(self, scope: Scope):
+        """Map endpoints to their routes (rebuilt when an endpoint is not found, e.g. after routes were added)"""
+        routes: Dict[Callable, List[BaseRoute]] = {}
+        for route in getattr(scope.get("app"), "routes", ()):
+            endpoint = getattr(route, "endpoint", None) or getattr(route, "app", None)
+            if endpoint is not None and getattr(route, "path", None) is not None:
+                routes.setdefault(endpoint, []).append(route)
+        self._routes = routes
+
+
+class MetricsMiddleware:
+    """Middleware recording latency by method, route template and status, and requests in flight"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.route_template = RouteTemplates()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            process_time = time.perf_counter() - start_time
+            method = scope["method"] if scope["method"] in METHODS else "OTHER"
+            route = self.route_template(scope)
+            http_request_duration.labels(method, route, str(status)).observe(process_time)
+            if process_time >= Config.SLOW_REQUEST_SECONDS:
+                perf_logger.warning(
+                    f"Slow request: {method} {route} | Status: {status} | Time: {process_time:.3f}s",
+                    extra={"method": method, "route": route, "status": status, "duration_ms": round(process_time * 1000, 2)}
+                )
@@ -0,0 +1,113 @@
+"""
+On-demand and rolling request profiling (see utils.profiler).
+
+An admin adds X-Profile: 1 (or ?profile=1) to a request to have it sampled;
+the response carries X-Profile naming the folded profile in PROFILE_DIR,
+which GET /admin/profiles/{name} returns. The flag is ignored, and logged
+as a security event, for anyone else. With PROFILE_EVERY_N set, one request
+in N is also sampled into the per-route rolling profile.
+
+The middleware is the innermost layer, so profiles cover routing, dependencies
+and the endpoint, and log lines carry the request id the profile is named
+after.
+"""
+import itertools
+import logging
+import uuid
+from urllib.parse import parse_qs
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import Config
+from db.session import JobSessionLocal
+from middleware.metrics import RouteTemplates
+from models.user import User
+from utils import profiler
+from utils.auth import request_auth
+from utils.logging_setup import request_id_var
+from utils.user_cache import user_cache
+
+perf_logger = logging.getLogger('performance')
+security_logger = logging.getLogger('security')
+
+
+def profile_requested(scope: Scope) -> bool:
+    """True if the request asks to be profiled by header or query flag"""
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.strip() in (b"1", b"true")
+    query = scope.get("query_string", b"")
+    if b"profile" in query:
+        return parse_qs(query.decode("latin-1")).get("profile", [""])[-1] in ("1", "true")
+    return False
+
+
+async def is_admin(user_id) -> bool:
+    """Admin flag of a user, from the user cache or the database"""
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        def load():
+            # The job session is synchronous whatever the request engine, see db.session
+            with JobSessionLocal() as db:
+                user = db.query(User).filter(User.id == user_id).first()
+                return user_cache.put(user) if user is not None else None
+        snapshot = await run_in_threadpool(load)
+    return snapshot is not None and snapshot.is_admin
+
+
+class ProfilingMiddleware:
+    """Middleware sampling the stacks of flagged admin requests and of one request in PROFILE_EVERY_N"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.route_template = RouteTemplates()
+        self._requests = itertools.count(1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        on_demand = profile_requested(scope) and await self.allowed(scope)
+        every = Config.PROFILE_EVERY_N
+        sampled = every > 0 and next(self._requests) % every == 0
+        if not (on_demand or sampled):
+            await self.app(scope, receive, send)
+            return
+
+        name = f"request-{request_id_var.get() or uuid.uuid4().hex}.folded" if on_demand else None
+
+        async def send_with_profile(message: Message):
+            if message["type"] == "http.response.start" and name:
+                MutableHeaders(scope=message)["X-Profile"] = name
+            await send(message)
+
+        profile = profiler.sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            profiler.sampler.stop(profile)
+            route = f"{scope['method']} {self.route_template(scope)}"
+            if sampled:
+                profiler.rolling.add(route, profile)
+                if profiler.rolling.due():
+                    await run_in_threadpool(profiler.rolling.flush)
+            if name:
+                await run_in_threadpool(profiler.write_profile, profiler.profile_path(name), profile.folded(route))
+                perf_logger.info(
+                    f"Profiled {route}: {profile.samples} samples in {profile.seconds * 1000:.1f}ms -> {name}",
+                    extra={"route": route, "samples": profile.samples, "profile": name}
+                )
+
+    async def allowed(self, scope: Scope) -> bool:
+        user_id = request_auth(Request(scope)).user_id
+        if user_id is not None and await is_admin(user_id):
+            return True
+        security_logger.warning(
+            f"Profiling requested without admin rights: {scope['method']} {scope['path']} | User: {user_id or 'Anonymous'}",
+            extra={"event": "PROFILE_DENIED", "user_id": user_id, "path": scope["path"]}
+        )
+        return False
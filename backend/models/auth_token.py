@@ -0,0 +1,45 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from db.session import Base
+
+class RefreshToken(Base):
+    """
+    Refresh token, stored as a SHA-256 hash of the opaque token given to the client
+
+    Every refresh revokes the presented token and issues its successor in the
+    same family; presenting a revoked token again revokes the whole family.
+    """
+
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    # All tokens descending from one login share a family
+    family_id = Column(String(32), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True)
+
+    # Lifetime, in UTC
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=True)
+    replaced_by_id = Column(Integer, nullable=True)  # Successor issued when this token was used
+
+    def __repr__(self):
+        return f"<RefreshToken(id={self.id}, user_id={self.user_id}, family_id='{self.family_id}')>"
+
+
+class RevokedToken(Base):
+    """Access token revoked before its expiry (e.g. on logout), by jti"""
+
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)
+    user_id = Column(Integer, nullable=True)
+
+    # Workers sync rows by revoked_at; rows can be deleted once the token has expired
+    revoked_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<RevokedToken(jti='{self.jti}', expires_at={self.expires_at})>"
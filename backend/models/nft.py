@@ -1,12 +1,36 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Text
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Text, Index, text, and_, or_
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from sqlalchemy.ext.hybrid import hybrid_method
 from db.session import Base
+from config import Config
+
+def reservation_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Reservations made before this (naive UTC) time have lapsed"""
+    return (now or datetime.utcnow()) - timedelta(minutes=Config.RESERVATION_TTL_MINUTES)
+
+def reservation_lapses_at(reserved_at: datetime) -> float:
+    """Epoch seconds when a reservation made at reserved_at lapses"""
+    if reserved_at.tzinfo is None:
+        reserved_at = reserved_at.replace(tzinfo=timezone.utc)
+    return reserved_at.timestamp() + Config.RESERVATION_TTL_MINUTES * 60
 
 class NFT(Base):
     """NFT model for storing NFT information and marketplace data"""
     
     __tablename__ = "nfts"
+    __table_args__ = (
+        # Partial index over active reservations only, for the expiry sweep
+        Index(
+            "ix_nfts_reserved_at_active",
+            "reserved_at",
+            postgresql_where=text("is_reserved AND NOT is_sold"),
+            # SQLite renders booleans as 0/1 and only uses the index on a textual match
+            sqlite_where=text("is_reserved = 1 AND is_sold = 0")
+        ),
+    )
     
     # Primary key
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -47,6 +71,39 @@ class NFT(Base):
     buyer = relationship("User", back_populates="purchased_nfts")
     transactions = relationship("Transaction", back_populates="nft")
     
+    @hybrid_method
+    def is_available(self, cutoff: datetime) -> bool:
+        """
+        Whether the NFT can be bought: unsold, and unreserved or its reservation lapsed
+        
+        Lapsed reservations count as available straight away; the expiry timers
+        and sweep only clean up the rows afterwards.
+        
+        Args:
+            cutoff: reservation_cutoff() for the current request
+        """
+        if self.is_sold:
+            return False
+        if not self.is_reserved:
+            return True
+        reserved_at = self.reserved_at
+        if reserved_at is None:
+            return False
+        if reserved_at.tzinfo is not None:
+            cutoff = cutoff.replace(tzinfo=timezone.utc)
+        return reserved_at < cutoff
+    
+    @is_available.expression
+    def is_available(cls, cutoff: datetime):
+        return and_(
+            cls.is_sold == False,
+            or_(cls.is_reserved == False, cls.reserved_at < cutoff)
+        )
+    
+    def is_reservation_active(self, cutoff: datetime) -> bool:
+        """Whether the NFT is held by a reservation that has not lapsed"""
+        return self.is_reserved and not self.is_sold and not self.is_available(cutoff)
+    
     def __repr__(self):
         return f"<NFT(id={self.id}, title='{self.title}', price_inr={self.price_inr}, is_sold={self.is_sold})>"
     
@@ -189,15 +189,22 @@ class TransactionPublicResponse(BaseModel):
 class PurchaseRequest(BaseModel):
     """Purchase initiation request"""
     nft_id: int = Field(..., gt=0, le=999999, description="NFT ID to purchase")
+
+
+class CartCheckoutRequest(BaseModel):
+    """Multi-NFT cart checkout request (one payment for all NFTs)"""
+    nft_ids: List[int] = Field(..., min_length=1, max_length=20, description="NFT IDs to purchase together")
+    payment_method: PaymentMethod = Field(..., description="Payment method for the whole cart")
     
-    @field_validator('nft_id')
+    @field_validator('nft_ids')
     @classmethod
-    def validate_nft_id(cls, v: int) -> int:
-        """Validate NFT ID for security"""
-        nft_id_str = str(v)
-        if re.search(r"[;'\"\\]|--|/\*|\*/|union|select|drop|insert|update|delete", nft_id_str, re.IGNORECASE):
-            raise ValueError('Invalid NFT ID format - potential security threat detected')
-        return v
+    def validate_nft_ids(cls, v: List[int]) -> List[int]:
+        """Validate cart NFT IDs are in range and unique"""
+        if any(nft_id <= 0 or nft_id > 999999 for nft_id in v):
+            raise ValueError('NFT IDs must be between 1 and 999999')
+        if len(set(v)) != len(v):
+            raise ValueError('Duplicate NFT IDs in cart')
+        return sorted(v)
 
 
 class NFTListResponse(BaseModel):
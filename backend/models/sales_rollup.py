@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Numeric, UniqueConstraint
+from sqlalchemy.sql import func
+from db.session import Base
+from models.transaction import AMOUNT_SCALE, format_amount
+
+class DailySalesRollup(Base):
+    """Pre-aggregated paid sales per day, currency and NFT contract"""
+
+    __tablename__ = "daily_sales_rollup"
+    __table_args__ = (
+        # Upsert target for incremental updates
+        UniqueConstraint("day", "currency", "contract_address", name="uq_daily_sales_rollup_day_currency_contract"),
+    )
+
+    # Primary key
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+
+    # Grouping keys
+    day = Column(Date, nullable=False, index=True)  # UTC day the payment completed
+    currency = Column(String(10), nullable=False)
+    contract_address = Column(String(255), nullable=False, default="")  # Empty for NFTs without a contract
+
+    # Aggregates
+    sale_count = Column(Integer, nullable=False, default=0)  # NFTs sold
+    gross_amount = Column(Numeric(14, AMOUNT_SCALE), nullable=False, default=0)
+
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<DailySalesRollup(day={self.day}, currency='{self.currency}', contract_address='{self.contract_address}', sale_count={self.sale_count})>"
+
+    def to_dict(self):
+        """Convert rollup row to dictionary"""
+        return {
+            "day": self.day.isoformat() if self.day else None,
+            "currency": self.currency,
+            "contract_address": self.contract_address or None,
+            "sale_count": self.sale_count,
+            "gross_amount": format_amount(self.gross_amount),
+            "average_amount": format_amount(self.gross_amount / self.sale_count) if self.sale_count else None,
+        }
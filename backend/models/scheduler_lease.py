@@ -0,0 +1,29 @@
+from sqlalchemy import Column, String, DateTime
+from db.session import Base
+
+class SchedulerLease(Base):
+    """Named lease held by the worker currently allowed to run a background role"""
+
+    __tablename__ = "scheduler_leases"
+
+    # Lease name (one row per role, e.g. "scheduler")
+    name = Column(String(100), primary_key=True)
+
+    # Current holder ("host:pid:nonce") and lease window, in UTC
+    holder = Column(String(255), nullable=False)
+    acquired_at = Column(DateTime, nullable=False)  # When the current holder took the lease
+    renewed_at = Column(DateTime, nullable=False)  # Last heartbeat
+    expires_at = Column(DateTime, nullable=False)  # Other workers may take over after this
+
+    def __repr__(self):
+        return f"<SchedulerLease(name='{self.name}', holder='{self.holder}', expires_at={self.expires_at})>"
+
+    def to_dict(self):
+        """Convert lease to dictionary"""
+        return {
+            "name": self.name,
+            "holder": self.holder,
+            "acquired_at": self.acquired_at.isoformat() if self.acquired_at else None,
+            "renewed_at": self.renewed_at.isoformat() if self.renewed_at else None,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+        }
@@ -1,9 +1,22 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text, Index, Numeric, desc
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from decimal import Decimal, ROUND_HALF_UP
 from db.session import Base
 import enum
 
+# Amounts are stored as NUMERIC(12, 2) in the transaction currency
+AMOUNT_PRECISION = 12
+AMOUNT_SCALE = 2
+
+def to_amount(value) -> Decimal:
+    """Convert a price (float, str or Decimal) to an exact two-decimal amount"""
+    return Decimal(str(value)).quantize(Decimal(1).scaleb(-AMOUNT_SCALE), rounding=ROUND_HALF_UP)
+
+def format_amount(value):
+    """Render a stored amount as a string for API responses (None stays None)"""
+    return f"{value:.{AMOUNT_SCALE}f}" if value is not None else None
+
 class PaymentMethod(enum.Enum):
     """Enum for payment methods"""
     INR = "INR"
@@ -15,11 +28,16 @@ class TransactionStatus(enum.Enum):
     PAID = "paid"
     FAILED = "failed"
     CANCELLED = "cancelled"
+    EXPIRED = "expired"  # Reservation timed out before payment
 
 class Transaction(Base):
     """Transaction model for storing payment and purchase information"""
     
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Serves per-user history lookups filtered by status and ordered by recency
+        Index("ix_transactions_user_status_created", "user_id", "status", desc("created_at")),
+    )
     
     # Primary key
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -34,7 +52,7 @@ class Transaction(Base):
     nft_id = Column(
         Integer, 
         ForeignKey("nfts.id", ondelete="CASCADE"), 
-        nullable=False,
+        nullable=True,  # NULL for cart transactions, whose NFTs are in items
         index=True
     )
     
@@ -58,7 +76,7 @@ class Transaction(Base):
     gateway_response = Column(Text, nullable=True)  # JSON string of gateway response
     
     # Amount information
-    amount = Column(String(50), nullable=True)  # Store as string to avoid float precision issues
+    amount = Column(Numeric(AMOUNT_PRECISION, AMOUNT_SCALE), nullable=True)  # Exact decimal, no float rounding
     currency = Column(String(10), nullable=True)  # INR, USD, etc.
     
     # Timestamps
@@ -69,6 +87,7 @@ class Transaction(Base):
     # Relationships
     user = relationship("User", back_populates="transactions")
     nft = relationship("NFT", back_populates="transactions")
+    items = relationship("TransactionItem", back_populates="transaction", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<Transaction(id={self.id}, user_id={self.user_id}, nft_id={self.nft_id}, status={self.status.value})>"
@@ -82,7 +101,7 @@ class Transaction(Base):
             "payment_method": self.payment_method.value if self.payment_method else None,
             "status": self.status.value if self.status else None,
             "txn_ref": self.txn_ref,
-            "amount": self.amount,
+            "amount": format_amount(self.amount),
             "currency": self.currency,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
@@ -91,12 +110,74 @@ class Transaction(Base):
     
     def to_public_dict(self):
         """Convert transaction object to dictionary for public API (excludes sensitive info)"""
+        return Transaction.public_dict_from_row(self)
+    
+    @classmethod
+    def public_columns(cls):
+        """Columns needed to build the public dictionary without loading full ORM objects"""
+        return (
+            cls.id,
+            cls.nft_id,
+            cls.payment_method,
+            cls.status,
+            cls.amount,
+            cls.currency,
+            cls.created_at,
+        )
+    
+    @staticmethod
+    def public_dict_from_row(row):
+        """Build the public dictionary from a row selected with public_columns() or a Transaction"""
+        return {
+            "id": row.id,
+            "nft_id": row.nft_id,
+            "payment_method": row.payment_method.value if row.payment_method else None,
+            "status": row.status.value if row.status else None,
+            "amount": format_amount(row.amount),
+            "currency": row.currency,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+        }
+
+class TransactionItem(Base):
+    """Line item of a cart transaction (one NFT per item)"""
+    
+    __tablename__ = "transaction_items"
+    
+    # Primary key
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    
+    # Foreign keys
+    transaction_id = Column(
+        Integer,
+        ForeignKey("transactions.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    nft_id = Column(
+        Integer,
+        ForeignKey("nfts.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    
+    # Price of this NFT at checkout, in the parent transaction's currency
+    amount = Column(Numeric(AMOUNT_PRECISION, AMOUNT_SCALE), nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    # Relationships
+    transaction = relationship("Transaction", back_populates="items")
+    nft = relationship("NFT")
+    
+    def __repr__(self):
+        return f"<TransactionItem(id={self.id}, transaction_id={self.transaction_id}, nft_id={self.nft_id})>"
+    
+    def to_dict(self):
+        """Convert transaction item to dictionary"""
         return {
             "id": self.id,
+            "transaction_id": self.transaction_id,
             "nft_id": self.nft_id,
-            "payment_method": self.payment_method.value if self.payment_method else None,
-            "status": self.status.value if self.status else None,
-            "amount": self.amount,
-            "currency": self.currency,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "amount": format_amount(self.amount),
         }
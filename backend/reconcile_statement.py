@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Reconcile a bank/UPI statement CSV against pending INR transactions.
+
+Matched transactions are marked paid and their NFTs sold; the mismatch
+report is printed as JSON (or written to --report).
+
+Usage:
+    python reconcile_statement.py statement.csv [--dry-run] [--report report.json]
+"""
+
+import sys
+import os
+import argparse
+import json
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from config import config
+from models.user import User  # noqa: F401 - registers the mapper NFT relationships refer to
+from utils.reconciliation import reconcile_statement
+
+
+def create_session():
+    """Open a synchronous session (asyncpg URLs are switched to psycopg2, as in Alembic)"""
+    db_url = config.get_database_url()
+    if db_url.startswith("postgresql+asyncpg"):
+        db_url = db_url.replace("postgresql+asyncpg", "postgresql")
+    return sessionmaker(autocommit=False, autoflush=False, bind=create_engine(db_url))()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile a bank/UPI statement CSV against pending INR payments")
+    parser.add_argument("statement", help="Path to the statement CSV")
+    parser.add_argument("--dry-run", action="store_true", help="Report matches without marking transactions paid")
+    parser.add_argument("--reference-column", help="Header of the txn_ref column (auto-detected by default)")
+    parser.add_argument("--amount-column", help="Header of the amount column (auto-detected by default)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Matched transactions per bulk update")
+    parser.add_argument("--report", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    db = create_session()
+    try:
+        with open(args.statement, encoding="utf-8-sig", newline="") as statement:
+            report = reconcile_statement(
+                db,
+                statement,
+                reference_column=args.reference_column,
+                amount_column=args.amount_column,
+                batch_size=args.batch_size,
+                dry_run=args.dry_run
+            )
+    except ValueError as e:
+        print(f"❌ Invalid statement: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+    output = json.dumps(report.to_dict(), indent=2)
+    if args.report:
+        with open(args.report, "w") as report_file:
+            report_file.write(output)
+        print(f"✅ {report.matched} payments confirmed; report written to {args.report}")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Rotate the access token signing key in JWT_KEYS_DIR.
+
+Without arguments a new key is generated; workers sign with it once they
+reload their key set (restart, or any token with its kid). --retire strips
+the private half of an old key so it stays in the JWKS and keeps verifying
+tokens it signed until they expire. --list prints the key set.
+
+Usage:
+    python rotate_jwt_key.py [--algorithm ES256|EdDSA]
+    python rotate_jwt_key.py --retire <kid>
+    python rotate_jwt_key.py --list
+"""
+
+import sys
+import os
+import argparse
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import config
+from utils.jwt_keys import ASYMMETRIC_ALGORITHMS, KeyStore, generate_key, retire_key
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rotate the JWT signing key")
+    parser.add_argument("--algorithm", choices=ASYMMETRIC_ALGORITHMS, help="Key type (default: JWT_ALGORITHM)")
+    parser.add_argument("--retire", metavar="KID", help="Keep only the public half of this key")
+    parser.add_argument("--list", action="store_true", help="List keys and the active signing key")
+    parser.add_argument("--keys-dir", default=config.JWT_KEYS_DIR, help="Key directory (default: JWT_KEYS_DIR)")
+    args = parser.parse_args()
+
+    if args.list:
+        store = KeyStore(args.keys_dir, config.JWT_ALGORITHM, active_kid=config.JWT_ACTIVE_KID or None)
+        store.load()
+        active = store.active_kid_loaded
+        for kid, key in sorted(store.keys().items()):
+            state = "active" if kid == active else ("signing key" if key.private_key else "retired")
+            print(f"{kid}  {key.algorithm}  {state}")
+        return 0
+
+    if args.retire:
+        try:
+            retire_key(args.keys_dir, args.retire)
+        except FileNotFoundError:
+            print(f"❌ No private key {args.retire} in {args.keys_dir}", file=sys.stderr)
+            return 1
+        print(f"✅ Retired {args.retire}; delete {args.retire}.pub.pem once its tokens have expired")
+        return 0
+
+    algorithm = args.algorithm or config.JWT_ALGORITHM
+    if algorithm not in ASYMMETRIC_ALGORITHMS:
+        print(f"❌ JWT_ALGORITHM is {algorithm}; pass --algorithm ES256 or EdDSA", file=sys.stderr)
+        return 1
+    kid = generate_key(args.keys_dir, algorithm)
+    print(f"✅ Generated {algorithm} key {kid} in {args.keys_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
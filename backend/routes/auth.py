@@ -1,56 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response
+from sqlalchemy import desc, func, literal, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from authlib.integrations.starlette_client import OAuth
-from authlib.integrations.starlette_client import OAuthError
-import jwt
-from datetime import datetime, timedelta
-import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 
 from db.session import get_db
 from models.user import User
+from utils.auth import create_jwt_token, request_auth, request_claims
+from utils.refresh_tokens import REFRESH_TOKEN_COOKIE, InvalidRefreshToken, issue_refresh_token, revoke_refresh_token, rotate_refresh_token
+from utils.revocation import revocation_filter, revoke_access_token
+from utils.jwt_keys import key_store
+from utils.oidc import LOGIN_STATE_COOKIE, OIDCError, code_challenge, google_oidc, login_state, read_login_state
+from utils.user_cache import UserSnapshot, user_cache
 from config import config
 
 # Create FastAPI router
 router = APIRouter()
 
-# Configure OAuth
-oauth = OAuth()
-oauth.register(
-    name='google',
-    client_id=config.GOOGLE_CLIENT_ID,
-    client_secret=config.GOOGLE_CLIENT_SECRET,
-    server_metadata_url='https://accounts.google.com/.well-known/openid_configuration',
-    client_kwargs={
-        'scope': 'openid email profile'
-    }
-)
-
-def create_jwt_token(user_id: int, email: str) -> str:
-    """Create JWT token for authenticated user"""
-    payload = {
-        "user_id": user_id,
-        "email": email,
-        "exp": datetime.utcnow() + timedelta(hours=config.JWT_EXPIRATION_HOURS),
-        "iat": datetime.utcnow(),
-        "iss": "nft-marketplace"
-    }
-    
-    token = jwt.encode(payload, config.SECRET_KEY, algorithm=config.JWT_ALGORITHM)
-    return token
-
-def verify_jwt_token(token: str) -> dict:
-    """Verify and decode JWT token"""
-    try:
-        payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.JWT_ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+# Routes served at the site root (/.well-known/...)
+well_known_router = APIRouter()
 
-async def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
-    """FastAPI dependency to get current authenticated user from JWT token"""
+async def get_current_user(request: Request, db: Session = Depends(get_db)) -> UserSnapshot:
+    """FastAPI dependency to get current authenticated user from JWT token (a cached snapshot, see utils.user_cache)"""
     
     # Get token from Authorization header
     authorization = request.headers.get("Authorization")
@@ -65,120 +38,250 @@ async def get_current_user(request: Request, db: Session = Depends(get_db)) -> U
     except ValueError:
         raise HTTPException(status_code=401, detail="Invalid authorization header format")
     
-    # Verify token
-    payload = verify_jwt_token(token)
+    # Verified once per request (see middleware.auth)
+    payload = request_claims(request, token)
     user_id = payload.get("user_id")
     
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
     
-    # Get user from database
-    user = db.query(User).filter(User.id == user_id).first()
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    
+    # Get user from database (async routes such as routes/nft.py receive an AsyncSession)
+    if isinstance(db, AsyncSession):
+        user = await db.get(User, user_id)
+    else:
+        user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
-    return user
+    return user_cache.put(user)
+
+def _upsert_google_user(db: Session, google_id: str, name: str, email: str, profile_pic: Optional[str]):
+    """
+    Create or update a user from their Google profile in one statement
+    
+    INSERT ... ON CONFLICT (google_id) DO UPDATE ... WHERE the profile differs,
+    so an unchanged returning user is not written (updated_at stays put and
+    no row lock is taken). Rows skipped by the WHERE return nothing, so on
+    PostgreSQL the upsert runs as a CTE with a fallback SELECT of the existing
+    id, still one round trip; other dialects issue the SELECT separately.
+    
+    Returns:
+        (user id, whether the row was inserted or updated)
+    """
+    table = User.__table__
+    insert = postgresql.insert(table) if db.get_bind().dialect.name == "postgresql" else sqlite.insert(table)
+    insert = insert.values(google_id=google_id, name=name, email=email, profile_pic=profile_pic)
+    profile = ("name", "email", "profile_pic")
+    upsert = insert.on_conflict_do_update(
+        index_elements=[table.c.google_id],
+        set_={**{column: insert.excluded[column] for column in profile}, "updated_at": func.now()},
+        where=or_(*(table.c[column].is_distinct_from(insert.excluded[column]) for column in profile))
+    ).returning(table.c.id)
+    existing = select(table.c.id, literal(False).label("changed")).where(table.c.google_id == google_id)
+    
+    if db.get_bind().dialect.name == "postgresql":
+        written = upsert.cte("written")
+        row = db.execute(
+            select(written.c.id, literal(True).label("changed"))
+            .union_all(existing)
+            .order_by(desc("changed"))
+            .limit(1)
+        ).first()
+    else:
+        row = db.execute(upsert).first()
+        row = (row.id, True) if row is not None else db.execute(existing).first()
+    return row[0], row[1]
+
+def _login(db: Session, google_id: str, name: str, email: str, profile_pic: Optional[str]):
+    """Upsert the user and issue their tokens; returns (user id, profile changed, access token, refresh token)"""
+    user_id, changed = _upsert_google_user(db, google_id, name, email, profile_pic)
+    
+    # Generate a short-lived access token and a refresh token for renewing it
+    refresh_token, _ = issue_refresh_token(db, user_id)
+    return user_id, changed, create_jwt_token(user_id, email), refresh_token
 
 @router.get("/login-google")
 async def login_google(request: Request):
     """Initiate Google OAuth 2.0 login flow"""
     
     try:
-        # Generate OAuth authorization URL
-        redirect_uri = config.GOOGLE_REDIRECT_URI
-        return await oauth.google.authorize_redirect(request, redirect_uri)
-        
+        # Generate OAuth authorization URL (discovery document is cached, see utils.oidc)
+        state, cookie = login_state()
+        url = await google_oidc.authorization_url(
+            config.GOOGLE_REDIRECT_URI,
+            state=state["state"],
+            nonce=state["nonce"],
+            code_challenge=code_challenge(state["code_verifier"])
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OAuth initialization failed: {str(e)}")
+    
+    # state, nonce and PKCE verifier come back with the callback in a signed cookie
+    response = RedirectResponse(url=url)
+    response.set_cookie(
+        LOGIN_STATE_COOKIE,
+        cookie,
+        max_age=config.OIDC_LOGIN_STATE_SECONDS,
+        path="/auth",
+        httponly=True,
+        secure=not config.is_development(),
+        samesite="lax"
+    )
+    return response
 
 @router.get("/callback")
-async def auth_callback(request: Request, db: Session = Depends(get_db)):
+async def auth_callback(
+    request: Request,
+    code: Optional[str] = None,
+    state: Optional[str] = None,
+    error: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
     """Handle Google OAuth 2.0 callback and create/update user"""
     
     try:
-        # Get authorization token from Google
-        token = await oauth.google.authorize_access_token(request)
+        if error:
+            raise OIDCError(f"Authorization denied: {error}")
+        if not code:
+            raise OIDCError("Missing authorization code")
+        pending = read_login_state(request.cookies.get(LOGIN_STATE_COOKIE), state)
         
-        # Get user info from Google
-        user_info = token.get('userinfo')
-        if not user_info:
-            # Fallback: fetch user info manually
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    'https://www.googleapis.com/oauth2/v2/userinfo',
-                    headers={
-                        'Authorization': f"Bearer {token['access_token']}"
-                    }
-                )
-                user_info = response.json()
+        # Exchange the code, then verify the ID token locally instead of calling userinfo
+        token = await google_oidc.exchange_code(code, config.GOOGLE_REDIRECT_URI, pending["code_verifier"])
+        user_info = await google_oidc.verify_id_token(token.get("id_token"), nonce=pending["nonce"])
         
         # Extract user data
-        google_id = user_info.get('id')
+        google_id = user_info.get('sub')
         email = user_info.get('email')
         name = user_info.get('name')
         profile_pic = user_info.get('picture')
         
         if not google_id or not email or not name:
             raise HTTPException(status_code=400, detail="Incomplete user information from Google")
+        if user_info.get('email_verified') is False:
+            raise OIDCError(f"Email {email} is not verified")
         
-        # Check if user already exists
-        existing_user = db.query(User).filter(User.google_id == google_id).first()
-        
-        if existing_user:
-            # Update existing user's information
-            existing_user.name = name
-            existing_user.email = email
-            existing_user.profile_pic = profile_pic
-            db.commit()
-            db.refresh(existing_user)
-            user = existing_user
-        else:
-            # Create new user
-            user = User(
-                name=name,
-                email=email,
-                google_id=google_id,
-                profile_pic=profile_pic
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        
-        # Generate JWT token
-        jwt_token = create_jwt_token(user.id, user.email)
+        # Create or update the user; a returning user whose profile is unchanged costs no write
+        user_id, changed, jwt_token, refresh_token = await _in_session(db, _login, google_id, name, email, profile_pic)
+        if changed:
+            # Core statements bypass the mapper events that normally drop the cached snapshot
+            user_cache.invalidate(user_id)
         
-        # Redirect to frontend with token
+        # Redirect to frontend with the access token; the refresh token stays in a cookie
         frontend_url = f"{config.FRONTEND_URL}/auth/success?token={jwt_token}"
-        return RedirectResponse(url=frontend_url)
+        response = RedirectResponse(url=frontend_url)
+        _set_refresh_cookie(response, refresh_token)
         
-    except OAuthError as e:
+    except OIDCError as e:
         print(f"OAuth Error: {e}")
         error_url = f"{config.FRONTEND_URL}/auth/error?error=oauth_failed"
-        return RedirectResponse(url=error_url)
+        response = RedirectResponse(url=error_url)
         
     except Exception as e:
         print(f"Authentication Error: {e}")
         error_url = f"{config.FRONTEND_URL}/auth/error?error=unknown"
-        return RedirectResponse(url=error_url)
+        response = RedirectResponse(url=error_url)
+    
+    # The login state is single-use
+    response.delete_cookie(LOGIN_STATE_COOKIE, path="/auth")
+    return response
+
+def _set_refresh_cookie(response: Response, refresh_token: str):
+    """Keep the refresh token out of page scripts and off every request but /auth"""
+    response.set_cookie(
+        REFRESH_TOKEN_COOKIE,
+        refresh_token,
+        max_age=config.REFRESH_TOKEN_DAYS * 24 * 60 * 60,
+        path="/auth",
+        httponly=True,
+        secure=not config.is_development(),
+        samesite="lax"
+    )
 
 @router.get("/me")
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: UserSnapshot = Depends(get_current_user)):
     """Get current authenticated user's information"""
     return {
         "success": True,
         "user": current_user.to_dict()
     }
 
+async def _in_session(db, work, *args):
+    """Run sync work(session, *args) on a sync or async request session and commit"""
+    if isinstance(db, AsyncSession):
+        result = await db.run_sync(lambda session: work(session, *args))
+        await db.commit()
+    else:
+        result = work(db, *args)
+        db.commit()
+    return result
+
+def _refresh(db: Session, token: str):
+    """Rotate a refresh token; returns (user, new token) or (None, error) so a revoked family is committed"""
+    try:
+        user_id, new_token = rotate_refresh_token(db, token)
+    except InvalidRefreshToken as e:
+        return None, str(e)
+    user = db.get(User, user_id)
+    if user is None:
+        return None, "User not found"
+    return (user.id, user.email), new_token
+
+@router.post("/refresh")
+async def refresh(request: Request, response: Response, db: Session = Depends(get_db)):
+    """Exchange the refresh token cookie for a new access token and a new refresh token cookie"""
+    
+    refresh_token = request.cookies.get(REFRESH_TOKEN_COOKIE)
+    if not refresh_token:
+        raise HTTPException(status_code=401, detail="Refresh token missing")
+    
+    user, result = await _in_session(db, _refresh, refresh_token)
+    if user is None:
+        raise HTTPException(status_code=401, detail=result)
+    
+    user_id, email = user
+    _set_refresh_cookie(response, result)
+    return {
+        "success": True,
+        "data": {
+            "access_token": create_jwt_token(user_id, email),
+            "token_type": "bearer",
+            "expires_in": config.ACCESS_TOKEN_MINUTES * 60
+        },
+        "error": None
+    }
+
+def _logout(db: Session, user_id: int, claims: dict, refresh_token: Optional[str]):
+    if claims.get("jti"):
+        revoke_access_token(db, claims)
+    if refresh_token:
+        revoke_refresh_token(db, refresh_token, user_id)
+
 @router.post("/logout")
-async def logout():
-    """Logout endpoint (client should delete the JWT token)"""
+async def logout(
+    request: Request,
+    response: Response,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Revoke the current access token and, when the cookie is present, the refresh token's family"""
+    
+    claims = request_auth(request).claims or {}
+    await _in_session(db, _logout, current_user.id, claims, request.cookies.get(REFRESH_TOKEN_COOKIE))
+    if claims.get("jti"):
+        revocation_filter.add(claims["jti"])
+    response.delete_cookie(REFRESH_TOKEN_COOKIE, path="/auth")
     return {
         "success": True,
         "message": "Logged out successfully. Please delete your JWT token."
     }
 
 @router.get("/verify-token")
-async def verify_token(current_user: User = Depends(get_current_user)):
+async def verify_token(current_user: UserSnapshot = Depends(get_current_user)):
     """Verify if the current JWT token is valid"""
     return {
         "success": True,
@@ -186,3 +289,13 @@ async def verify_token(current_user: User = Depends(get_current_user)):
         "user_id": current_user.id,
         "email": current_user.email
     }
+
+@well_known_router.get("/.well-known/jwks.json")
+async def jwks():
+    """Public keys access tokens are signed with, for verification by other services"""
+    # Short max-age: verifiers refetch when they meet an unknown kid anyway
+    return Response(
+        content=key_store.jwks(),
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=300"}
+    )
@@ -1,20 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import and_, select, func
+from sqlalchemy import and_, or_, select, func, union_all
 from typing import List, Optional
 from datetime import datetime
 
 from db.session import get_db
-from models.nft import NFT
-from models.transaction import Transaction, PaymentMethod, TransactionStatus
+from models.nft import NFT, reservation_cutoff
+from models.transaction import Transaction, TransactionItem, PaymentMethod, TransactionStatus, to_amount
 from models.user import User
 from models.pydantic_models import NFTPublicResponse, NFTListResponse
 from utils.response import success_response, error_response, not_found_response
+from utils.pagination import encode_cursor, decode_cursor, cursor_pagination
+from utils.inventory import inventory
 from routes.auth import get_current_user
+from routes.purchase import claim_pending_transaction
+from utils.scheduler import release_lapsed_reservations
 
 # Create FastAPI router
 router = APIRouter()
 
+def public_nft_dict(nft: NFT, cutoff: datetime) -> dict:
+    """Public NFT fields, reporting a lapsed reservation as not reserved"""
+    data = NFTPublicResponse.model_validate(nft).model_dump()
+    data["is_reserved"] = nft.is_reservation_active(cutoff)
+    return data
+
 @router.get("/nfts")
 async def list_available_nfts(
     skip: int = Query(0, ge=0, description="Number of NFTs to skip"),
@@ -24,15 +34,16 @@ async def list_available_nfts(
     db: AsyncSession = Depends(get_db)
 ):
     """
-    List all available NFTs (not sold) with optional filtering and pagination
+    List all available NFTs (not sold, not held by a live reservation) with optional filtering and pagination
     
     Returns:
         List of available NFTs with title, image_url, price_inr, price_usd
     """
     
     try:
-        # Build query for available NFTs
-        query = select(NFT).where(NFT.is_sold == False)
+        # Build query for available NFTs; lapsed reservations are back on sale
+        cutoff = reservation_cutoff()
+        query = select(NFT).where(NFT.is_available(cutoff))
         
         # Apply price filters if provided
         if min_price_inr is not None:
@@ -42,7 +53,7 @@ async def list_available_nfts(
             query = query.where(NFT.price_inr <= max_price_inr)
         
         # Get total count for pagination info
-        count_query = select(func.count(NFT.id)).where(NFT.is_sold == False)
+        count_query = select(func.count(NFT.id)).where(NFT.is_available(cutoff))
         if min_price_inr is not None:
             count_query = count_query.where(NFT.price_inr >= min_price_inr)
         if max_price_inr is not None:
@@ -57,7 +68,7 @@ async def list_available_nfts(
         nfts = result.scalars().all()
         
         # Convert to public dictionary format
-        nft_list = [NFTPublicResponse.model_validate(nft).model_dump() for nft in nfts]
+        nft_list = [public_nft_dict(nft, cutoff) for nft in nfts]
         
         return success_response(
             data=nft_list,
@@ -97,9 +108,7 @@ async def get_nft_details(
             return not_found_response("NFT not found")
         
         # Return public information (hide buyer details if sold)
-        nft_data = NFTPublicResponse.model_validate(nft)
-        
-        return success_response(data=nft_data.model_dump())
+        return success_response(data=public_nft_dict(nft, reservation_cutoff()))
         
     except HTTPException:
         raise
@@ -155,6 +164,17 @@ async def buy_nft(
                 "data": existing_transaction.to_dict()
             }
         
+        # A live reservation by another buyer blocks the sale; a lapsed one is released
+        cutoff = reservation_cutoff()
+        if not nft.is_available(cutoff):
+            raise HTTPException(status_code=400, detail="NFT is reserved")
+        if nft.is_reserved:
+            released_ids, _ = await db.run_sync(
+                lambda session: release_lapsed_reservations(session, [nft_id], cutoff)
+            )
+            if not released_ids:
+                raise HTTPException(status_code=400, detail="NFT is reserved")
+        
         # Lock the NFT (mark as sold and assign to user)
         nft.is_sold = True
         nft.sold_to_user_id = current_user.id
@@ -166,7 +186,7 @@ async def buy_nft(
             nft_id=nft_id,
             payment_method=payment_method,
             status=TransactionStatus.PENDING,
-            amount=str(nft.price_inr if payment_method == PaymentMethod.INR else nft.price_usd),
+            amount=to_amount(nft.price_inr if payment_method == PaymentMethod.INR else nft.price_usd),
             currency=payment_method.value
         )
         
@@ -174,6 +194,7 @@ async def buy_nft(
         await db.commit()
         await db.refresh(transaction)
         await db.refresh(nft)
+        await inventory.set_available(nft_id, False)
         
         return {
             "success": True,
@@ -231,15 +252,18 @@ async def complete_transaction(
         if not transaction:
             raise HTTPException(status_code=404, detail="Transaction not found")
         
-        if transaction.status != TransactionStatus.PENDING:
+        # Update transaction, unless a concurrent request or the payment webhook already did;
+        # not rolled up, as the buyer's own report is unconfirmed (see utils.sales_rollup)
+        completed_at = datetime.utcnow()
+        claimed = await db.run_sync(
+            lambda session: claim_pending_transaction(
+                session, transaction.id, completed_at, txn_ref=txn_ref, gateway_response=gateway_response
+            )
+        )
+        if not claimed:
+            await db.rollback()
             raise HTTPException(status_code=400, detail="Transaction is not in pending status")
         
-        # Update transaction
-        transaction.status = TransactionStatus.PAID
-        transaction.txn_ref = txn_ref
-        transaction.gateway_response = gateway_response
-        transaction.completed_at = datetime.utcnow()
-        
         await db.commit()
         await db.refresh(transaction)
         
@@ -257,83 +281,185 @@ async def complete_transaction(
 
 @router.get("/my-purchases")
 async def get_user_purchases(
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=100, description="Number of purchases to return (a cart counts once)"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Get all NFTs purchased by the current user
+    Get NFTs purchased by the current user, newest first
+    
+    Pages and counts are per transaction: a cart counts as one purchase and is
+    never split across pages, but lists one entry per NFT, all with the same
+    transaction.
     
+    Args:
+        cursor: Opaque cursor returned as next_cursor by the previous page
+        limit: Page size, in transactions
+        
     Returns:
-        List of purchased NFTs and their transaction details
+        Page of purchased NFTs and their transaction details; total_purchases
+        is the user's number of paid transactions, pagination.count the
+        number on this page
     """
     
     try:
-        # Get all completed transactions for the user
-        transactions_query = select(Transaction).where(
-            and_(
-                Transaction.user_id == current_user.id,
-                Transaction.status == TransactionStatus.PAID
+        paid = and_(
+            Transaction.user_id == current_user.id,
+            Transaction.status == TransactionStatus.PAID
+        )
+        
+        # One page of paid transactions, served from the (user_id, status, created_at) index
+        page = select(Transaction.id).where(paid)
+        
+        if cursor:
+            try:
+                cursor_created_at, cursor_id = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            page = page.where(
+                or_(
+                    Transaction.created_at < cursor_created_at,
+                    and_(
+                        Transaction.created_at == cursor_created_at,
+                        Transaction.id < cursor_id
+                    )
+                )
             )
+        
+        # Fetch one extra transaction to know whether another page exists
+        page = page.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(limit + 1).subquery()
+        
+        # NFTs of single purchases (nft_id) and of carts (line items; nft_id is NULL)
+        purchased = union_all(
+            select(Transaction.id.label("transaction_id"), Transaction.nft_id.label("nft_id"))
+            .where(Transaction.id.in_(select(page.c.id)), Transaction.nft_id.isnot(None)),
+            select(TransactionItem.transaction_id, TransactionItem.nft_id)
+            .where(TransactionItem.transaction_id.in_(select(page.c.id)))
+        ).subquery()
+        
+        # The page joined with its NFTs in a single round trip
+        query = (
+            select(Transaction, NFT)
+            .join(purchased, purchased.c.transaction_id == Transaction.id)
+            .join(NFT, NFT.id == purchased.c.nft_id)
+            .order_by(Transaction.created_at.desc(), Transaction.id.desc(), NFT.id)
         )
-        transactions_result = await db.execute(transactions_query)
-        transactions = transactions_result.scalars().all()
-        
-        # Get purchased NFTs
-        purchases = []
-        for transaction in transactions:
-            nft_query = select(NFT).where(NFT.id == transaction.nft_id)
-            nft_result = await db.execute(nft_query)
-            nft = nft_result.scalar_one_or_none()
-            if nft:
-                purchases.append({
-                    "nft": nft.to_dict(),
-                    "transaction": transaction.to_public_dict()
-                })
+        result = await db.execute(query)
+        rows = result.all()
+        
+        transaction_ids = list(dict.fromkeys(transaction.id for transaction, _ in rows))
+        has_more = len(transaction_ids) > limit
+        if has_more:
+            rows = [row for row in rows if row[0].id != transaction_ids[limit]]
+            transaction_ids = transaction_ids[:limit]
+        
+        # Index-only count over the same index
+        total_purchases = (await db.execute(select(func.count()).select_from(Transaction).where(paid))).scalar_one()
+        
+        purchases = [
+            {
+                "nft": nft.to_dict(),
+                "transaction": transaction.to_public_dict()
+            }
+            for transaction, nft in rows
+        ]
+        
+        next_cursor = None
+        if has_more:
+            last_transaction = rows[-1][0]
+            next_cursor = encode_cursor(last_transaction.created_at, last_transaction.id)
         
         return {
             "success": True,
             "data": purchases,
-            "total_purchases": len(purchases)
+            "total_purchases": total_purchases,
+            "pagination": cursor_pagination(transaction_ids, limit, next_cursor)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch purchases: {str(e)}")
 
 @router.get("/my-transactions")
 async def get_user_transactions(
     status: Optional[TransactionStatus] = Query(None, description="Filter by transaction status"),
+    created_from: Optional[datetime] = Query(None, description="Only transactions created at or after this time"),
+    created_to: Optional[datetime] = Query(None, description="Only transactions created before this time"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=100, description="Number of transactions to return"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Get all transactions for the current user
+    Get transactions for the current user, newest first
     
     Args:
         status: Optional filter by transaction status
+        created_from: Optional inclusive lower bound on created_at
+        created_to: Optional exclusive upper bound on created_at
+        cursor: Opaque cursor returned as next_cursor by the previous page
+        limit: Page size
         
     Returns:
-        List of user's transactions
+        Page of user's transactions
     """
     
     try:
-        # Build query
-        query = select(Transaction).where(Transaction.user_id == current_user.id)
+        if created_from and created_to and created_from > created_to:
+            raise HTTPException(status_code=400, detail="created_from must not be after created_to")
+        
+        # Project only the public columns; served from the
+        # (user_id, status, created_at DESC) index
+        query = select(*Transaction.public_columns()).where(Transaction.user_id == current_user.id)
         
         if status:
             query = query.where(Transaction.status == status)
         
-        query = query.order_by(Transaction.created_at.desc())
+        if created_from:
+            query = query.where(Transaction.created_at >= created_from)
+        
+        if created_to:
+            query = query.where(Transaction.created_at < created_to)
+        
+        if cursor:
+            try:
+                cursor_created_at, cursor_id = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            query = query.where(
+                or_(
+                    Transaction.created_at < cursor_created_at,
+                    and_(
+                        Transaction.created_at == cursor_created_at,
+                        Transaction.id < cursor_id
+                    )
+                )
+            )
+        
+        # Fetch one extra row to know whether another page exists
+        query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(limit + 1)
         result = await db.execute(query)
-        transactions = result.scalars().all()
+        rows = result.all()
         
-        # Convert to public dictionary format
-        transaction_list = [transaction.to_public_dict() for transaction in transactions]
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        transaction_list = [Transaction.public_dict_from_row(row) for row in rows]
+        
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
         
         return {
             "success": True,
             "data": transaction_list,
-            "total_transactions": len(transaction_list)
+            "total_transactions": len(transaction_list),
+            "pagination": cursor_pagination(transaction_list, limit, next_cursor)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch transactions: {str(e)}")
@@ -1,25 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, Path, Request
+from fastapi import APIRouter, Depends, File, HTTPException, Path, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from datetime import datetime
+from sqlalchemy import and_, func, update
+from datetime import date, datetime
+from typing import List, Optional
+import io
 import uuid
 import logging
 from pydantic import BaseModel, field_validator
 
 from db.session import get_db
 from models.user import User
-from models.nft import NFT
-from models.transaction import Transaction
-from models.pydantic_models import PurchaseRequest, TransactionResponse
-from utils.qr import generate_upi_qr
+from models.nft import NFT, reservation_cutoff, reservation_lapses_at
+from models.transaction import Transaction, TransactionItem, PaymentMethod, TransactionStatus, to_amount, format_amount
+from models.sales_rollup import DailySalesRollup
+from models.pydantic_models import PurchaseRequest, TransactionResponse, CartCheckoutRequest
+from utils.qr import generate_upi_qr, UPI_MAX_AMOUNT
 from utils.email import send_upi_qr_email
-from utils.paypal import initiate_paypal_payment
-from utils.auth import get_current_user
+from utils.paypal import initiate_paypal_payment, initiate_paypal_cart_payment
+from utils.auth import get_current_user, security, request_claims
+from utils.waiting_room import waiting_room, QueueStatus
+from utils.inventory import inventory
+from utils.metrics import cache_lookups
+from utils.reconciliation import reconcile_statement
+from utils.sales_rollup import record_paid_transactions
+from utils.scheduler import add_reservation_expiry_job, cancel_reservation_expiry, release_lapsed_reservations
+from config import Config
 from utils.response import success_response, error_response, not_found_response, validation_error_response, server_error_response
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# A hit is a request rejected by the inventory cache without touching the database
+_inventory_hits = cache_lookups.labels("inventory", "hit")
+_inventory_misses = cache_lookups.labels("inventory", "miss")
+
 # Input validation schemas
 class NFTIdPath(BaseModel):
     nft_id: int
@@ -31,27 +47,170 @@ class NFTIdPath(BaseModel):
             raise ValueError('NFT ID must be a positive integer')
         if v > 999999:  # Reasonable upper limit
             raise ValueError('NFT ID too large')
-        # Check for potential SQL injection patterns
-        nft_id_str = str(v)
-        import re
-        if re.search(r"[;'\"\\]|--|/\*|\*/|union|select|drop|insert|update|delete", nft_id_str, re.IGNORECASE):
-            raise ValueError('Invalid NFT ID format')
         return v
 
 def validate_nft_id_path(nft_id: int = Path(..., gt=0, lt=1000000, description="NFT ID must be between 1 and 999999")):
-    """Validate NFT ID from path parameter"""
-    # Additional security checks
-    nft_id_str = str(nft_id)
-    if re.search(r'[;\'"\\]|--|/\*|\*/|union|select|drop|insert|update|delete', nft_id_str, re.IGNORECASE):
+    """Validate NFT ID from path parameter (an int in range; its digits need no further checks)"""
+    return nft_id
+
+async def reject_unavailable_nft(nft_id: int = Depends(validate_nft_id_path)) -> int:
+    """
+    Fast-reject NFTs the inventory cache knows are sold or reserved.
+    
+    Runs before authentication and before any database work; IDs the cache has
+    no verdict for fall through to the regular availability check.
+    """
+    if await inventory.is_unavailable(nft_id):
+        _inventory_hits.inc()
         raise HTTPException(
             status_code=400,
-            detail="Invalid NFT ID format - potential security threat detected"
+            detail={"success": False, "data": None, "error": "NFT not found, already sold, or reserved"}
         )
+    _inventory_misses.inc()
     return nft_id
 
+async def drop_admission(
+    request: Request,
+    nft_id: int = Depends(reject_unavailable_nft),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Gate purchases of NFTs in drop mode behind the waiting room queue.
+    
+    Runs before get_current_user so queued buyers are answered from the queue
+    alone, without touching the database. Yields the admitted QueueStatus (or
+    None when the NFT is not in drop mode) and frees the head of the queue once
+    the purchase attempt has finished.
+    """
+    if not Config.DROP_MODE_ENABLED or not await waiting_room.is_active(nft_id):
+        yield None
+        return
+    
+    user_id = request_claims(request, credentials.credentials).get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    
+    user_key = str(user_id)
+    queue_status = await waiting_room.join(nft_id, user_key)
+    
+    if queue_status.closed:
+        raise HTTPException(
+            status_code=400,
+            detail={"success": False, "data": None, "error": "NFT not found, already sold, or reserved"}
+        )
+    
+    if not queue_status.admitted:
+        raise HTTPException(
+            status_code=202,
+            detail={"success": False, "data": queue_status.to_dict(), "error": "Queued for drop, retry after eta_seconds"},
+            headers={"Retry-After": str(max(1, int(queue_status.eta_seconds)))}
+        )
+    
+    try:
+        yield queue_status
+    finally:
+        await waiting_room.leave(nft_id, user_key)
+
+def reserve_nfts(db: Session, nft_ids: List[int], reserved_at: datetime) -> list:
+    """
+    Reserve a set of NFTs with a single UPDATE ... RETURNING
+    
+    Returns the (id, price_inr, price_usd) rows that were available and are now
+    reserved. Callers needing all-or-nothing must roll back when fewer rows than
+    requested come back. Lapsed reservations are released first, expiring the
+    previous holder's pending transaction.
+    """
+    release_lapsed_reservations(db, nft_ids, reservation_cutoff(reserved_at))
+    return db.execute(
+        update(NFT)
+        .where(
+            and_(
+                NFT.id.in_(nft_ids),
+                NFT.is_sold == False,
+                NFT.is_reserved == False
+            )
+        )
+        .values(is_reserved=True, reserved_at=reserved_at)
+        .returning(NFT.id, NFT.price_inr, NFT.price_usd)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+def take_over_lapsed_reservation(db: Session, nft: NFT, cutoff: datetime) -> bool:
+    """
+    Release the lapsed reservation of an NFT about to be reserved again
+    
+    No-op for unreserved NFTs. Returns False when another buyer took over the
+    reservation first.
+    """
+    if not nft.is_reserved:
+        return True
+    released_ids, expired_ids = release_lapsed_reservations(db, [nft.id], cutoff)
+    db.expire(nft, ["is_reserved", "reserved_at"])
+    if not released_ids:
+        return False
+    logger.info(f"Took over lapsed reservation of NFT {nft.id} (expired transactions {expired_ids})")
+    return True
+
+def claim_pending_transaction(db: Session, transaction_id: int, paid_at: datetime, **values) -> bool:
+    """
+    Move a pending transaction to PAID with a conditional UPDATE ... RETURNING
+
+    Returns False when it was no longer pending (a retried webhook or a
+    concurrent verification got there first), so only one caller marks the
+    NFTs sold and rolls the sale up. values are extra columns to set.
+    """
+    return db.execute(
+        update(Transaction)
+        .where(Transaction.id == transaction_id, Transaction.status == TransactionStatus.PENDING)
+        .values(status=TransactionStatus.PAID, updated_at=paid_at, completed_at=paid_at, **values)
+        .returning(Transaction.id)
+        .execution_options(synchronize_session=False)
+    ).first() is not None
+
+def transaction_nft_ids(transaction: Transaction) -> List[int]:
+    """IDs of the NFTs bought by a single or cart transaction"""
+    if transaction.nft_id:
+        return [transaction.nft_id]
+    return [item.nft_id for item in transaction.items]
+
+def mark_transaction_nfts_sold(db: Session, transaction: Transaction) -> List[int]:
+    """
+    Mark every NFT of a single or cart transaction as sold with one UPDATE
+
+    Only NFTs still reserved and unsold are touched, so an earlier sale is
+    never overwritten. Returns the IDs marked sold; callers compare them with
+    transaction_nft_ids() to detect NFTs the transaction no longer holds.
+    """
+    return db.execute(
+        update(NFT)
+        .where(
+            and_(
+                NFT.id.in_(transaction_nft_ids(transaction)),
+                NFT.is_sold == False,
+                NFT.is_reserved == True
+            )
+        )
+        .values(
+            is_sold=True,
+            is_reserved=False,
+            sold_to_user_id=transaction.user_id,
+            sold_at=datetime.utcnow()
+        )
+        .returning(NFT.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+def flag_late_payment(transaction: Transaction, reason: str):
+    """Report a payment for a transaction that can no longer be fulfilled, so it gets refunded"""
+    logger.error(
+        f"Late payment for transaction {transaction.txn_ref} ({reason}); refund required",
+        extra={"event": "LATE_PAYMENT", "transaction_id": transaction.id, "txn_ref": transaction.txn_ref}
+    )
+
 @router.post("/purchase/inr/{nft_id}")
 async def purchase_inr(
-    nft_id: int = Depends(validate_nft_id_path),
+    nft_id: int = Depends(reject_unavailable_nft),
+    admission: Optional[QueueStatus] = Depends(drop_admission),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -60,15 +219,18 @@ async def purchase_inr(
     # Log security event for rate limiting/monitoring
     logger.info(f"INR purchase attempt for NFT {nft_id} by user {current_user.id} from IP: {getattr(current_user, 'ip_address', 'unknown')}")
     
-    # Validate NFT exists and is available
+    # Validate NFT exists and is available (a lapsed reservation counts as available)
+    cutoff = reservation_cutoff()
     nft = db.query(NFT).filter(
         and_(
             NFT.id == nft_id,
-            NFT.is_sold == False,
-            NFT.is_reserved == False
+            NFT.is_available(cutoff)
         )
     ).first()
     
+    if nft and not take_over_lapsed_reservation(db, nft, cutoff):
+        nft = None
+    
     if not nft:
         # Log potential attack
         logger.warning(f"Invalid NFT access attempt: NFT {nft_id} by user {current_user.id}")
@@ -81,10 +243,11 @@ async def purchase_inr(
     transaction = Transaction(
         user_id=current_user.id,
         nft_id=nft_id,
-        payment_method="INR",
-        status="pending",
+        payment_method=PaymentMethod.INR,
+        status=TransactionStatus.PENDING,
         txn_ref=txn_ref,
-        buyer_currency="INR",
+        amount=to_amount(nft.price_inr),
+        currency="INR",
         created_at=datetime.utcnow()
     )
     
@@ -108,11 +271,19 @@ async def purchase_inr(
         )
         
         # Reserve the NFT
+        reserved_at = datetime.utcnow()
         nft.is_reserved = True
-        nft.reserved_at = datetime.utcnow()
+        nft.reserved_at = reserved_at
         
         db.commit()
         
+        await inventory.set_available(nft_id, False, reserved_until=reservation_lapses_at(reserved_at))
+        add_reservation_expiry_job(nft_id, reserved_at)
+        
+        # Turn away everyone still queued for this drop
+        if admission:
+            await waiting_room.close(nft_id, until=reservation_lapses_at(reserved_at))
+        
         logger.info(f"INR purchase initiated for NFT {nft_id} by user {current_user.id}")
         
         return success_response(
@@ -132,7 +303,8 @@ async def purchase_inr(
 
 @router.post("/purchase/usd/{nft_id}")
 async def purchase_usd(
-    nft_id: int = Depends(validate_nft_id_path),
+    nft_id: int = Depends(reject_unavailable_nft),
+    admission: Optional[QueueStatus] = Depends(drop_admission),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -141,15 +313,18 @@ async def purchase_usd(
     # Log security event for rate limiting/monitoring
     logger.info(f"USD purchase attempt for NFT {nft_id} by user {current_user.id} from IP: {getattr(current_user, 'ip_address', 'unknown')}")
     
-    # Validate NFT exists and is available
+    # Validate NFT exists and is available (a lapsed reservation counts as available)
+    cutoff = reservation_cutoff()
     nft = db.query(NFT).filter(
         and_(
             NFT.id == nft_id,
-            NFT.is_sold == False,
-            NFT.is_reserved == False
+            NFT.is_available(cutoff)
         )
     ).first()
     
+    if nft and not take_over_lapsed_reservation(db, nft, cutoff):
+        nft = None
+    
     if not nft:
         raise HTTPException(
             status_code=400,
@@ -163,10 +338,11 @@ async def purchase_usd(
     transaction = Transaction(
         user_id=current_user.id,
         nft_id=nft_id,
-        payment_method="USD",
-        status="pending",
+        payment_method=PaymentMethod.USD,
+        status=TransactionStatus.PENDING,
         txn_ref=txn_ref,
-        buyer_currency="USD",
+        amount=to_amount(nft.price_usd),
+        currency="USD",
         created_at=datetime.utcnow()
     )
     
@@ -185,11 +361,19 @@ async def purchase_usd(
         )
         
         # Reserve the NFT
+        reserved_at = datetime.utcnow()
         nft.is_reserved = True
-        nft.reserved_at = datetime.utcnow()
+        nft.reserved_at = reserved_at
         
         db.commit()
         
+        await inventory.set_available(nft_id, False, reserved_until=reservation_lapses_at(reserved_at))
+        add_reservation_expiry_job(nft_id, reserved_at)
+        
+        # Turn away everyone still queued for this drop
+        if admission:
+            await waiting_room.close(nft_id, until=reservation_lapses_at(reserved_at))
+        
         logger.info(f"USD purchase initiated for NFT {nft_id} by user {current_user.id}")
         
         return {
@@ -213,6 +397,134 @@ async def purchase_usd(
             detail={"success": False, "data": None, "error": "Failed to initiate purchase"}
         )
 
+@router.post("/purchase/cart")
+async def purchase_cart(
+    cart: CartCheckoutRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Initiate a multi-NFT purchase paid with a single UPI QR code or PayPal payment"""
+    
+    nft_ids = cart.nft_ids
+    payment_method = PaymentMethod(cart.payment_method.value)
+    
+    logger.info(f"Cart purchase attempt for NFTs {nft_ids} by user {current_user.id}")
+    
+    # Reject from the inventory cache before touching the NFT rows
+    unavailable_ids = [nft_id for nft_id in nft_ids if await inventory.is_unavailable(nft_id)]
+    if unavailable_ids:
+        raise HTTPException(
+            status_code=400,
+            detail={"success": False, "data": {"unavailable_nft_ids": unavailable_ids}, "error": "NFT not found, already sold, or reserved"}
+        )
+    
+    # NFTs in drop mode must go through their waiting room queue
+    if Config.DROP_MODE_ENABLED:
+        for nft_id in nft_ids:
+            if await waiting_room.is_active(nft_id):
+                raise HTTPException(
+                    status_code=400,
+                    detail={"success": False, "data": {"nft_id": nft_id}, "error": "NFT is in a drop and must be purchased individually"}
+                )
+    
+    try:
+        # All-or-nothing reservation in a single statement
+        reserved_at = datetime.utcnow()
+        reserved = reserve_nfts(db, nft_ids, reserved_at)
+        
+        if len(reserved) != len(nft_ids):
+            db.rollback()
+            unavailable_ids = sorted(set(nft_ids) - {row.id for row in reserved})
+            raise HTTPException(
+                status_code=400,
+                detail={"success": False, "data": {"unavailable_nft_ids": unavailable_ids}, "error": "NFT not found, already sold, or reserved"}
+            )
+        
+        if payment_method == PaymentMethod.INR:
+            prices = [(row.id, to_amount(row.price_inr)) for row in reserved]
+        else:
+            prices = [(row.id, to_amount(row.price_usd)) for row in reserved]
+        total = sum(price for _, price in prices)
+        
+        if payment_method == PaymentMethod.INR and total > UPI_MAX_AMOUNT:
+            db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail={"success": False, "data": {"amount": float(total)}, "error": f"Cart total exceeds the UPI limit of {UPI_MAX_AMOUNT} INR"}
+            )
+        
+        # One parent transaction with a line item per NFT
+        txn_ref = str(uuid.uuid4())
+        transaction = Transaction(
+            user_id=current_user.id,
+            nft_id=None,
+            payment_method=payment_method,
+            status=TransactionStatus.PENDING,
+            txn_ref=txn_ref,
+            amount=total,
+            currency=payment_method.value,
+            items=[TransactionItem(nft_id=nft_id, amount=price) for nft_id, price in prices]
+        )
+        db.add(transaction)
+        db.flush()  # Get transaction ID
+        
+        payment_data = {}
+        if payment_method == PaymentMethod.INR:
+            qr_base64 = generate_upi_qr(
+                user_email=current_user.email,
+                amount=total,
+                transaction_id=txn_ref
+            )
+            await send_upi_qr_email(
+                recipient_email=current_user.email,
+                qr_base64=qr_base64,
+                amount=total,
+                transaction_id=txn_ref
+            )
+        else:
+            approval_url = initiate_paypal_cart_payment(
+                items=prices,
+                transaction_id=txn_ref,
+                buyer_currency="USD",
+                return_url="/payment/paypal-callback",
+                cancel_url="/payment/cancel"
+            )
+            if not approval_url:
+                raise Exception("PayPal payment could not be created")
+            payment_data["approval_url"] = approval_url
+        
+        db.commit()
+        
+        for nft_id in nft_ids:
+            await inventory.set_available(nft_id, False, reserved_until=reservation_lapses_at(reserved_at))
+            add_reservation_expiry_job(nft_id, reserved_at)
+        
+        logger.info(f"Cart purchase initiated for NFTs {nft_ids} by user {current_user.id}, transaction {transaction.id}")
+        
+        return {
+            "success": True,
+            "data": {
+                "transaction_id": transaction.id,
+                "txn_ref": txn_ref,
+                "amount": total,
+                "currency": payment_method.value,
+                "status": "pending",
+                "items": [{"nft_id": nft_id, "amount": price} for nft_id, price in prices],
+                **payment_data
+            },
+            "error": None
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to initiate cart purchase: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={"success": False, "data": None, "error": "Failed to initiate purchase"}
+        )
+
 @router.post("/payment/paypal-webhook")
 async def paypal_webhook(
     request: Request,
@@ -274,20 +586,29 @@ async def paypal_webhook(
             transaction = db.query(Transaction).filter(
                 Transaction.txn_ref == txn_ref
             ).first()
-            if transaction:
-                transaction.status = "paid"
-                transaction.buyer_currency = buyer_currency
-                transaction.updated_at = datetime.utcnow()
-                nft = db.query(NFT).filter(NFT.id == transaction.nft_id).first()
-                if nft:
-                    nft.is_sold = True
-                    nft.is_reserved = False
-                    nft.sold_to_user_id = transaction.user_id
-                    nft.sold_at = datetime.utcnow()
-                db.commit()
-                logger.info(f"PayPal payment completed for transaction {txn_ref}, currency: {buyer_currency}")
-            else:
+            paid_at = datetime.utcnow()
+            if not transaction:
                 logger.error(f"Transaction not found for PayPal webhook: {txn_ref}")
+            elif not claim_pending_transaction(db, transaction.id, paid_at):
+                db.rollback()
+                if transaction.status == TransactionStatus.PAID:
+                    # PayPal retries webhooks; count each payment once
+                    logger.info(f"PayPal webhook for already paid transaction {txn_ref}")
+                else:
+                    # Paid after the reservation expired or was taken over: the NFT is not this buyer's
+                    flag_late_payment(transaction, f"transaction {transaction.status.value}")
+            else:
+                sold_nft_ids = mark_transaction_nfts_sold(db, transaction)
+                if len(sold_nft_ids) < len(transaction_nft_ids(transaction)):
+                    db.rollback()
+                    flag_late_payment(transaction, "NFTs no longer reserved for it")
+                else:
+                    record_paid_transactions(db, [transaction.id], paid_at)
+                    db.commit()
+                    for nft_id in sold_nft_ids:
+                        await inventory.set_available(nft_id, False)
+                        cancel_reservation_expiry(nft_id)
+                    logger.info(f"PayPal payment completed for transaction {txn_ref}, currency: {buyer_currency}")
         return {"success": True, "data": {"status": "success"}, "error": None}
     except Exception as e:
         logger.error(f"PayPal webhook error: {str(e)}")
@@ -312,8 +633,8 @@ async def verify_inr_transaction(
     transaction = db.query(Transaction).filter(
         and_(
             Transaction.id == transaction_id,
-            Transaction.payment_method == "INR",
-            Transaction.status == "pending"
+            Transaction.payment_method == PaymentMethod.INR,
+            Transaction.status == TransactionStatus.PENDING
         )
     ).first()
     
@@ -324,19 +645,29 @@ async def verify_inr_transaction(
         )
     
     try:
-        # Update transaction status
-        transaction.status = "paid"
-        transaction.updated_at = datetime.utcnow()
-        
-        # Update NFT as sold
-        nft = db.query(NFT).filter(NFT.id == transaction.nft_id).first()
-        if nft:
-            nft.is_sold = True
-            nft.is_reserved = False
-            nft.sold_to_user_id = transaction.user_id
-            nft.sold_at = datetime.utcnow()
+        # Update transaction status, unless a concurrent verification already did
+        paid_at = datetime.utcnow()
+        if not claim_pending_transaction(db, transaction.id, paid_at):
+            db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail={"success": False, "data": None, "error": "Transaction not found, not INR payment, or already processed"}
+            )
+        
+        # Update NFTs as sold (every item for cart transactions)
+        sold_nft_ids = mark_transaction_nfts_sold(db, transaction)
+        if len(sold_nft_ids) < len(transaction_nft_ids(transaction)):
+            db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail={"success": False, "data": None, "error": "NFTs of this transaction are no longer reserved for it"}
+            )
+        record_paid_transactions(db, [transaction.id], paid_at)
         
         db.commit()
+        for nft_id in sold_nft_ids:
+            await inventory.set_available(nft_id, False)
+            cancel_reservation_expiry(nft_id)
         
         logger.info(f"Admin verified INR transaction {transaction_id}")
         
@@ -348,6 +679,8 @@ async def verify_inr_transaction(
             },
             "error": None
         }
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Failed to verify transaction {transaction_id}: {str(e)}")
@@ -356,6 +689,58 @@ async def verify_inr_transaction(
             detail={"success": False, "data": None, "error": "Failed to verify transaction"}
         )
 
+@router.post("/admin/reconcile-statement")
+async def reconcile_upi_statement(
+    statement: UploadFile = File(..., description="Bank/UPI statement CSV"),
+    dry_run: bool = Query(False, description="Report matches without marking transactions paid"),
+    reference_column: Optional[str] = Query(None, description="Header of the txn_ref column"),
+    amount_column: Optional[str] = Query(None, description="Header of the amount column"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Admin endpoint to confirm pending INR payments from a bank/UPI statement CSV"""
+    
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=403,
+            detail={"success": False, "data": None, "error": "Admin access required"}
+        )
+    
+    # Stream the spooled upload line by line instead of reading it into memory
+    lines = io.TextIOWrapper(statement.file, encoding="utf-8-sig", newline="")
+    try:
+        report = await run_in_threadpool(
+            reconcile_statement,
+            db,
+            lines,
+            reference_column=reference_column,
+            amount_column=amount_column,
+            dry_run=dry_run
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail={"success": False, "data": None, "error": f"Invalid statement: {str(e)}"}
+        )
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to reconcile statement: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={"success": False, "data": None, "error": "Failed to reconcile statement"}
+        )
+    finally:
+        lines.detach()
+    
+    for nft_id in report.sold_nft_ids:
+        await inventory.set_available(nft_id, False)
+        cancel_reservation_expiry(nft_id)
+    
+    logger.info(f"Admin {current_user.id} reconciled statement {statement.filename}: {report.matched} payments confirmed")
+    
+    return {"success": True, "data": report.to_dict(), "error": None}
+
 @router.get("/admin/transactions")
 async def get_pending_transactions(
     current_user: User = Depends(get_current_user),
@@ -371,7 +756,7 @@ async def get_pending_transactions(
         )
     try:
         # Get pending INR transactions with user and NFT details
-        transactions = db.query(Transaction).join(User).join(NFT).filter(
+        transactions = db.query(Transaction).join(User).outerjoin(NFT, NFT.id == Transaction.nft_id).filter(
             and_(
                 Transaction.payment_method == "INR",
                 Transaction.status == "pending"
@@ -389,7 +774,7 @@ async def get_pending_transactions(
                 "nft_id": transaction.nft_id,
                 "nft_title": nft.title if nft else "Unknown",
                 "user_email": user.email if user else "Unknown",
-                "amount": nft.price_inr if nft else 0,
+                "amount": nft.price_inr if nft else transaction.amount,
                 "status": transaction.status,
                 "created_at": transaction.created_at.isoformat() if transaction.created_at else None
             })
@@ -410,3 +795,145 @@ async def get_pending_transactions(
             status_code=500,
             detail={"success": False, "data": None, "error": "Failed to fetch transactions"}
         )
+
+# Dimensions the sales analytics can be grouped by, all served from the rollup
+SALES_DIMENSIONS = {
+    "day": DailySalesRollup.day,
+    "currency": DailySalesRollup.currency,
+    "contract": DailySalesRollup.contract_address,
+}
+
+@router.get("/admin/analytics/sales")
+async def get_sales_analytics(
+    date_from: Optional[date] = Query(None, description="First day to include (UTC)"),
+    date_to: Optional[date] = Query(None, description="Last day to include (UTC)"),
+    currency: Optional[str] = Query(None, description="Only this currency"),
+    contract_address: Optional[str] = Query(None, description="Only NFTs of this contract"),
+    group_by: str = Query("day,currency,contract", description="Comma-separated: day, currency, contract"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Admin endpoint for GMV, sale count and average sale, read only from the daily sales rollup"""
+    
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=403,
+            detail={"success": False, "data": None, "error": "Admin access required"}
+        )
+    
+    dimensions = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = [name for name in dimensions if name not in SALES_DIMENSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail={"success": False, "data": None, "error": f"Unknown group_by dimensions: {', '.join(unknown)}"}
+        )
+    if "currency" not in dimensions and not currency:
+        raise HTTPException(
+            status_code=400,
+            detail={"success": False, "data": None, "error": "Group by currency or filter on one; amounts in different currencies cannot be summed"}
+        )
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(
+            status_code=400,
+            detail={"success": False, "data": None, "error": "date_from must not be after date_to"}
+        )
+    
+    try:
+        columns = [SALES_DIMENSIONS[name].label(name) for name in dimensions]
+        query = db.query(
+            *columns,
+            func.sum(DailySalesRollup.sale_count).label("sale_count"),
+            func.sum(DailySalesRollup.gross_amount).label("gross_amount")
+        )
+        
+        if date_from:
+            query = query.filter(DailySalesRollup.day >= date_from)
+        if date_to:
+            query = query.filter(DailySalesRollup.day <= date_to)
+        if currency:
+            query = query.filter(DailySalesRollup.currency == currency.upper())
+        if contract_address is not None:
+            query = query.filter(DailySalesRollup.contract_address == contract_address)
+        if columns:
+            query = query.group_by(*columns).order_by(*columns)
+        
+        rows = []
+        for row in query.all():
+            if not row.sale_count:
+                continue
+            entry = {name: getattr(row, name) for name in dimensions}
+            if "day" in entry:
+                entry["day"] = entry["day"].isoformat()
+            if "contract" in entry:
+                entry["contract"] = entry["contract"] or None
+            entry["sale_count"] = row.sale_count
+            entry["gmv"] = format_amount(row.gross_amount)
+            entry["average_sale"] = format_amount(row.gross_amount / row.sale_count)
+            rows.append(entry)
+        
+        return {
+            "success": True,
+            "data": {
+                "group_by": dimensions,
+                "rows": rows
+            },
+            "error": None
+        }
+    except Exception as e:
+        logger.error(f"Error fetching sales analytics: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={"success": False, "data": None, "error": "Failed to fetch sales analytics"}
+        )
+
+@router.post("/admin/drops/{nft_id}")
+async def enable_drop_mode(
+    nft_id: int = Depends(validate_nft_id_path),
+    current_user: User = Depends(get_current_user)
+):
+    """Admin endpoint to put an NFT into drop mode (waiting room queue)"""
+    
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=403,
+            detail={"success": False, "data": None, "error": "Admin access required"}
+        )
+    
+    await waiting_room.enable(nft_id)
+    logger.info(f"Admin {current_user.id} enabled drop mode for NFT {nft_id}")
+    
+    return {"success": True, "data": await waiting_room.stats(nft_id), "error": None}
+
+@router.delete("/admin/drops/{nft_id}")
+async def disable_drop_mode(
+    nft_id: int = Depends(validate_nft_id_path),
+    current_user: User = Depends(get_current_user)
+):
+    """Admin endpoint to take an NFT out of drop mode"""
+    
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=403,
+            detail={"success": False, "data": None, "error": "Admin access required"}
+        )
+    
+    await waiting_room.disable(nft_id)
+    logger.info(f"Admin {current_user.id} disabled drop mode for NFT {nft_id}")
+    
+    return {"success": True, "data": await waiting_room.stats(nft_id), "error": None}
+
+@router.get("/admin/drops/{nft_id}")
+async def get_drop_status(
+    nft_id: int = Depends(validate_nft_id_path),
+    current_user: User = Depends(get_current_user)
+):
+    """Admin endpoint to inspect a drop queue"""
+    
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=403,
+            detail={"success": False, "data": None, "error": "Admin access required"}
+        )
+    
+    return {"success": True, "data": await waiting_room.stats(nft_id), "error": None}
@@ -0,0 +1,135 @@
+import pytest
+import os
+import time
+import logging
+from datetime import datetime, timedelta
+import jwt
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from config import Config
+from db.session import get_db, Base
+from models.user import User
+from models.nft import NFT  # noqa: F401 (resolves User relationships)
+from models.transaction import Transaction  # noqa: F401
+from middleware.auth import AuthContextMiddleware
+from middleware.logging import LoggingMiddleware
+from utils import auth
+from utils.auth import get_current_user, token_cache, VerifiedTokenCache
+from utils.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_auth_context.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def test_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    db.add(User(id=1, name="Buyer", email="buyer@example.com", google_id="buyer"))
+    db.commit()
+    token_cache.clear()
+    user_cache.clear()
+    try:
+        yield db
+    finally:
+        db.close()
+        token_cache.clear()
+        user_cache.clear()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if os.path.exists("test_auth_context.db"):
+            os.remove("test_auth_context.db")
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Count signature verifications"""
+    calls = []
+    decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", counting_decode)
+    return calls
+
+
+@pytest.fixture
+def http(test_db):
+    app = FastAPI()
+    app.add_middleware(LoggingMiddleware)
+    app.add_middleware(AuthContextMiddleware)
+    app.dependency_overrides[get_db] = override_get_db
+
+    @app.get("/whoami")
+    def whoami(current_user=Depends(get_current_user)):
+        return {"id": current_user.id}
+
+    return TestClient(app)
+
+
+def bearer(expires_in: float = 3600, secret: str = Config.JWT_SECRET):
+    token = jwt.encode(
+        {"user_id": 1, "email": "buyer@example.com", "exp": datetime.utcnow() + timedelta(seconds=expires_in)},
+        secret,
+        algorithm="HS256"
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestAuthContext:
+    """Test that a bearer token is verified once per request and shared"""
+
+    def test_token_verified_once_and_cached(self, http, decodes, caplog):
+        """Test that the logger and get_current_user share one verification, and repeats skip it"""
+        headers = bearer()
+        with caplog.at_level(logging.INFO, logger="app_middleware"):
+            assert http.get("/whoami", headers=headers).json() == {"id": 1}
+        assert len(decodes) == 1
+        assert any("User: 1" in record.getMessage() for record in caplog.records)
+
+        assert http.get("/whoami", headers=headers).json() == {"id": 1}
+        assert len(decodes) == 1
+
+    def test_invalid_and_expired_tokens(self, http, decodes):
+        """Test that bad tokens are rejected every time and never cached"""
+        forged = bearer(secret="not-the-secret")
+        for _ in range(2):
+            response = http.get("/whoami", headers=forged)
+            assert response.status_code == 401
+            assert response.json()["detail"] == "Invalid token"
+        assert len(decodes) == 2 and len(token_cache) == 0
+
+        expired = bearer(expires_in=-10)
+        response = http.get("/whoami", headers=expired)
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Token has expired"
+
+    def test_cache_entries_end_at_exp(self):
+        """Test that cached claims stop being served once the token expires, and the LRU is bounded"""
+        cache = VerifiedTokenCache(max_entries=2)
+        cache.put("a", {"user_id": 1, "exp": time.time() + 60})
+        cache.put("b", {"user_id": 2, "exp": time.time() - 1})
+        cache.put("c", {"user_id": 3})
+        assert cache.get("a")["user_id"] == 1
+        assert cache.get("b") is None
+        assert cache.get("c") is None
+
+        cache.put("d", {"user_id": 4, "exp": time.time() + 60})
+        cache.put("e", {"user_id": 5, "exp": time.time() + 60})
+        assert len(cache) == 2 and cache.get("a") is None
@@ -0,0 +1,209 @@
+import pytest
+import os
+import logging
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from db.session import get_db, Base
+from models.user import User
+from models.nft import NFT
+from models.transaction import Transaction, TransactionItem, TransactionStatus
+from routes import nft as nft_routes
+from routes import purchase as purchase_routes
+from utils.auth import get_current_user
+from utils.inventory import MemoryInventoryCache
+
+logger = logging.getLogger(__name__)
+
+# Purchases run on a sync Session, listings (routes/nft.py) on an AsyncSession
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_cart.db"
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test_cart.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+TEST_USER_ID = 1
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as session:
+        yield session
+
+
+def override_get_current_user():
+    return User(id=TEST_USER_ID, name="Test User", email="test@example.com", google_id="test_google_id")
+
+
+@pytest.fixture
+def test_db():
+    """Create a fresh schema with a user and five NFTs for each test"""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    db.add(User(id=TEST_USER_ID, name="Test User", email="test@example.com", google_id="test_google_id"))
+    for i in range(1, 6):
+        db.add(NFT(
+            id=i,
+            title=f"NFT {i}",
+            image_url="https://example.com/nft.png",
+            price_inr=1000.0 * i,
+            price_usd=10.0 * i
+        ))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if os.path.exists("test_cart.db"):
+            os.remove("test_cart.db")
+
+
+@pytest.fixture
+def payments(monkeypatch):
+    """Record payment provider calls instead of contacting UPI/PayPal"""
+    calls = []
+
+    def fake_qr(user_email, amount, transaction_id):
+        calls.append(("upi", amount))
+        return "qr"
+
+    async def fake_email(recipient_email, qr_base64, amount, transaction_id):
+        return True
+
+    def fake_paypal(items, transaction_id, buyer_currency, return_url, cancel_url):
+        calls.append(("paypal", items))
+        return "https://paypal.example.com/approve"
+
+    monkeypatch.setattr(purchase_routes, "generate_upi_qr", fake_qr)
+    monkeypatch.setattr(purchase_routes, "send_upi_qr_email", fake_email)
+    monkeypatch.setattr(purchase_routes, "initiate_paypal_cart_payment", fake_paypal)
+    monkeypatch.setattr(purchase_routes, "inventory", MemoryInventoryCache())
+    return calls
+
+
+@pytest.fixture
+def client(test_db, payments):
+    app = FastAPI()
+    app.include_router(purchase_routes.router, prefix="/api")
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = override_get_current_user
+    return TestClient(app)
+
+
+class TestCartCheckout:
+    """Test multi-NFT checkout with a single payment"""
+
+    def test_cart_reserves_all_and_creates_one_payment(self, client, test_db, payments):
+        """Test that a cart reserves every NFT under one parent transaction"""
+        response = client.post("/api/purchase/cart", json={"nft_ids": [3, 1, 2], "payment_method": "INR"})
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["amount"] == 6000.0
+        assert [item["nft_id"] for item in data["items"]] == [1, 2, 3]
+
+        # One payment request for the cart total
+        assert payments == [("upi", 6000.0)]
+
+        transactions = test_db.query(Transaction).all()
+        assert len(transactions) == 1
+        assert transactions[0].nft_id is None
+        assert transactions[0].status == TransactionStatus.PENDING
+        assert sorted(item.nft_id for item in transactions[0].items) == [1, 2, 3]
+
+        reserved = {nft.id for nft in test_db.query(NFT).filter(NFT.is_reserved == True).all()}
+        assert reserved == {1, 2, 3}
+
+    def test_cart_is_all_or_nothing(self, client, test_db, payments):
+        """Test that one unavailable NFT leaves the rest of the cart unreserved"""
+        test_db.query(NFT).filter(NFT.id == 2).update({"is_sold": True})
+        test_db.commit()
+
+        response = client.post("/api/purchase/cart", json={"nft_ids": [1, 2, 3], "payment_method": "USD"})
+        assert response.status_code == 400
+        assert response.json()["detail"]["data"]["unavailable_nft_ids"] == [2]
+
+        test_db.expire_all()
+        assert test_db.query(NFT).filter(NFT.is_reserved == True).count() == 0
+        assert test_db.query(Transaction).count() == 0
+        assert test_db.query(TransactionItem).count() == 0
+        assert payments == []
+
+    def test_overlapping_carts_cannot_both_reserve(self, client, test_db, payments):
+        """Test that a second cart sharing an NFT with a pending one is rejected"""
+        first = client.post("/api/purchase/cart", json={"nft_ids": [1, 2], "payment_method": "USD"})
+        second = client.post("/api/purchase/cart", json={"nft_ids": [2, 3], "payment_method": "USD"})
+
+        assert first.status_code == 200
+        assert payments == [("paypal", [(1, 10.0), (2, 20.0)])]
+        assert second.status_code == 400
+        assert test_db.query(NFT).filter(NFT.id == 3, NFT.is_reserved == True).count() == 0
+
+    def test_duplicate_ids_rejected(self, client):
+        """Test that a cart listing the same NFT twice is a validation error"""
+        response = client.post("/api/purchase/cart", json={"nft_ids": [1, 1], "payment_method": "INR"})
+        assert response.status_code == 422
+
+    def test_admin_verification_sells_every_item(self, client, test_db):
+        """Test that confirming a cart payment marks all of its NFTs sold"""
+        client.post("/api/purchase/cart", json={"nft_ids": [4, 5], "payment_method": "INR"})
+        transaction = test_db.query(Transaction).one()
+
+        db = TestingSessionLocal()
+        try:
+            sold = purchase_routes.mark_transaction_nfts_sold(db, db.get(Transaction, transaction.id))
+            db.commit()
+        finally:
+            db.close()
+
+        assert sorted(sold) == [4, 5]
+        test_db.expire_all()
+        for nft in test_db.query(NFT).filter(NFT.id.in_([4, 5])).all():
+            assert nft.is_sold and not nft.is_reserved
+            assert nft.sold_to_user_id == TEST_USER_ID
+
+    def test_paid_cart_listed_in_purchases(self, client, test_db):
+        """Test that every NFT of a paid cart shows up in /my-purchases next to single purchases"""
+        assert client.post("/api/purchase/inr/1", headers={"Authorization": "Bearer test-token"}).status_code == 200
+        assert client.post("/api/purchase/cart", json={"nft_ids": [2, 3], "payment_method": "INR"}).status_code == 200
+        client.app.dependency_overrides[get_current_user] = lambda: User(
+            id=TEST_USER_ID, name="Test User", email="test@example.com", google_id="test_google_id", is_admin=True
+        )
+        for transaction in test_db.query(Transaction).all():
+            assert client.post(f"/api/admin/verify-transaction/{transaction.id}").status_code == 200
+
+        client.app.include_router(nft_routes.router, prefix="/api")
+        client.app.dependency_overrides[get_db] = override_get_async_db
+        client.app.dependency_overrides[nft_routes.get_current_user] = override_get_current_user
+        body = client.get("/api/my-purchases").json()
+
+        listed = {}
+        for item in body["data"]:
+            listed.setdefault(item["transaction"]["id"], []).append(item["nft"]["id"])
+        single = test_db.query(Transaction).filter(Transaction.nft_id == 1).one()
+        cart = test_db.query(Transaction).filter(Transaction.nft_id.is_(None)).one()
+        assert listed == {single.id: [1], cart.id: [2, 3]}
+        assert body["pagination"]["has_more"] is False
+        # Counted per transaction, like the pages
+        assert (body["total_purchases"], body["pagination"]["count"]) == (2, 2)
+
+        # A page of one transaction holds the whole cart
+        first = client.get("/api/my-purchases?limit=1").json()
+        second = client.get(f"/api/my-purchases?limit=1&cursor={first['pagination']['next_cursor']}").json()
+        pages = [[item["nft"]["id"] for item in page["data"]] for page in (first, second)]
+        assert sorted(pages) == [[1], [2, 3]]
+        assert all(page["pagination"]["count"] == 1 and page["total_purchases"] == 2 for page in (first, second))
+        assert second["pagination"]["has_more"] is False
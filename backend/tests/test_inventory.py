@@ -0,0 +1,113 @@
+import pytest
+import asyncio
+import os
+import logging
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db.session import get_db, Base
+from models.nft import NFT
+from routes import purchase as purchase_routes
+from utils import scheduler
+from utils.inventory import MemoryInventoryCache, build_bitmaps
+
+logger = logging.getLogger(__name__)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_inventory.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def test_db():
+    """Create a fresh schema and session for each test"""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if os.path.exists("test_inventory.db"):
+            os.remove("test_inventory.db")
+
+
+class TestInventoryBitmap:
+    """Test availability bitmap semantics"""
+
+    @pytest.mark.asyncio
+    async def test_unknown_ids_fall_through(self):
+        """Test that IDs without a verdict are never rejected"""
+        cache = MemoryInventoryCache()
+        assert await cache.is_unavailable(7) is False
+        assert await cache.is_unavailable(999999) is False
+
+    @pytest.mark.asyncio
+    async def test_transitions(self):
+        """Test reserve/release transitions flip the availability bit"""
+        cache = MemoryInventoryCache()
+        await cache.set_available(12, False)
+        assert await cache.is_unavailable(12) is True
+        assert await cache.is_unavailable(13) is False
+
+        await cache.set_available(12, True)
+        assert await cache.is_unavailable(12) is False
+
+    def test_bit_order_matches_redis(self):
+        """Test that bitmaps use Redis SETBIT ordering (MSB first)"""
+        known, available = build_bitmaps([(0, True), (9, False)])
+        assert known == bytearray([0x80, 0x40])
+        assert available == bytearray([0x80, 0x00])
+
+    @pytest.mark.asyncio
+    async def test_reconciliation_rebuilds_from_nfts_table(self, test_db, monkeypatch):
+        """Test that the reconciliation sweep replaces the cache with table state"""
+        for title, is_sold, is_reserved in [("Free", False, False), ("Sold", True, False), ("Held", False, True)]:
+            test_db.add(NFT(
+                title=title,
+                image_url="https://example.com/nft.png",
+                price_inr=1000.0,
+                price_usd=12.0,
+                is_sold=is_sold,
+                is_reserved=is_reserved
+            ))
+        test_db.commit()
+        ids = {nft.title: nft.id for nft in test_db.query(NFT).all()}
+
+        cache = MemoryInventoryCache()
+        await cache.set_available(ids["Free"], False)  # stale verdict to be corrected
+        monkeypatch.setattr(scheduler, "inventory", cache)
+        monkeypatch.setattr(scheduler, "JobSessionLocal", TestingSessionLocal)
+
+        await scheduler.reconcile_inventory_cache()
+
+        assert await cache.is_unavailable(ids["Free"]) is False
+        assert await cache.is_unavailable(ids["Sold"]) is True
+        assert await cache.is_unavailable(ids["Held"]) is True
+
+
+class TestFastReject:
+    """Test purchase routes reject known-unavailable NFTs up front"""
+
+    def test_unavailable_nft_rejected_before_auth_and_db(self, monkeypatch):
+        """Test that a sold NFT is rejected without authentication or a database session"""
+        cache = MemoryInventoryCache()
+        monkeypatch.setattr(purchase_routes, "inventory", cache)
+
+        def fail_get_db():
+            raise AssertionError("fast-rejected purchases must not reach the database")
+
+        app = FastAPI()
+        app.include_router(purchase_routes.router, prefix="/api")
+        app.dependency_overrides[get_db] = fail_get_db
+        client = TestClient(app)
+
+        asyncio.run(cache.set_available(5, False))
+
+        for currency in ("inr", "usd"):
+            response = client.post(f"/api/purchase/{currency}/5")
+            assert response.status_code == 400
+            assert "already sold" in response.json()["detail"]["error"]
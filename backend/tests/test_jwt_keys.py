@@ -0,0 +1,134 @@
+import pytest
+import json
+import time
+import logging
+import threading
+import jwt
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from config import Config
+from routes.auth import well_known_router
+from utils import auth
+from utils import jwt_keys
+from utils.auth import create_jwt_token, verify_jwt_token, token_cache
+from utils.jwt_keys import KeyStore, generate_key, retire_key
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def keys(tmp_path, monkeypatch):
+    """Fresh key directory used for signing, verification and the JWKS"""
+    store = KeyStore(str(tmp_path), "ES256", reload_seconds=0)
+    monkeypatch.setattr(auth, "key_store", store)
+    monkeypatch.setattr(jwt_keys, "key_store", store)
+    monkeypatch.setattr("routes.auth.key_store", store)
+    monkeypatch.setattr(Config, "JWT_ALGORITHM", "ES256")
+    token_cache.clear()
+    yield store
+    token_cache.clear()
+
+
+def jwks_client():
+    app = FastAPI()
+    app.include_router(well_known_router)
+    return TestClient(app)
+
+
+def verify_with_jwks(token: str, jwks: dict) -> dict:
+    """Verify a token the way another service would: only with the published JWKS"""
+    kid = jwt.get_unverified_header(token)["kid"]
+    jwk = next(key for key in jwks["keys"] if key["kid"] == kid)
+    key = jwt.PyJWK(jwk)
+    return jwt.decode(token, key.key, algorithms=[jwk["alg"]])
+
+
+class TestAsymmetricTokens:
+    """Test ES256/EdDSA signing, the JWKS endpoint and key rotation"""
+
+    @pytest.mark.parametrize("algorithm", ["ES256", "EdDSA"])
+    def test_tokens_verify_with_published_jwks(self, keys, algorithm):
+        """Test that a token verifies locally and with nothing but the JWKS"""
+        generate_key(keys.keys_dir, algorithm)
+        token = create_jwt_token(1, "buyer@example.com")
+        header = jwt.get_unverified_header(token)
+        assert header["alg"] == algorithm and header["kid"]
+
+        assert verify_jwt_token(token)["user_id"] == 1
+
+        response = jwks_client().get("/.well-known/jwks.json")
+        assert response.status_code == 200
+        assert "max-age" in response.headers["cache-control"]
+        assert verify_with_jwks(token, response.json())["user_id"] == 1
+        assert all("d" not in jwk for jwk in response.json()["keys"])
+
+    def test_rotation(self, keys):
+        """Test that tokens from a rotated-out key keep verifying until the key is removed"""
+        old_token = create_jwt_token(1, "buyer@example.com")
+        old_kid = jwt.get_unverified_header(old_token)["kid"]
+
+        time.sleep(1)  # Kids are ordered by creation second
+        new_kid = generate_key(keys.keys_dir, "ES256")
+        retire_key(keys.keys_dir, old_kid)
+        keys.load()
+
+        new_token = create_jwt_token(1, "buyer@example.com")
+        assert jwt.get_unverified_header(new_token)["kid"] == new_kid
+        token_cache.clear()
+        assert verify_jwt_token(old_token)["user_id"] == 1
+        assert verify_jwt_token(new_token)["user_id"] == 1
+        assert {jwk["kid"] for jwk in json.loads(keys.jwks())["keys"]} == {old_kid, new_kid}
+
+        # Another worker picks up a key it has not seen by reloading on the unknown kid
+        other_worker = KeyStore(keys.keys_dir, "ES256", reload_seconds=0)
+        other_worker.load()
+        newest_kid = generate_key(keys.keys_dir, "EdDSA")
+        assert other_worker.verification_key(newest_kid).algorithm == "EdDSA"
+
+    def test_workers_agree_on_first_key(self, tmp_path, monkeypatch):
+        """Test that workers starting on an empty directory generate one key and all sign with it"""
+        def slow_generate_key(keys_dir, algorithm):
+            time.sleep(0.2)  # Let every worker find the directory empty
+            return generate_key(keys_dir, algorithm)
+
+        monkeypatch.setattr(jwt_keys, "generate_key", slow_generate_key)
+        workers = [KeyStore(str(tmp_path), "ES256") for _ in range(8)]
+        barrier = threading.Barrier(len(workers))
+        kids = []
+
+        def first_signature(worker):
+            barrier.wait()
+            kids.append(worker.signing_key().kid)
+
+        threads = [threading.Thread(target=first_signature, args=(worker,)) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(kids) == len(workers) and len(set(kids)) == 1
+        assert [path.name for path in tmp_path.iterdir()] == [f"{kids[0]}.pem"]
+
+    def test_forged_tokens_rejected(self, keys, monkeypatch):
+        """Test unknown kids, algorithm confusion and legacy HS256 tokens once disabled"""
+        token = create_jwt_token(1, "buyer@example.com")
+        kid = jwt.get_unverified_header(token)["kid"]
+        forged = [
+            jwt.encode({"user_id": 1, "exp": time.time() + 60}, "secret", algorithm="HS256",
+                       headers={"kid": "unknown"}),
+            # HS256 keyed with the public key, a classic confusion attack
+            jwt.encode({"user_id": 1, "exp": time.time() + 60}, keys.jwks(), algorithm="HS256",
+                       headers={"kid": kid}),
+        ]
+        for forged_token in forged:
+            with pytest.raises(auth.HTTPException) as error:
+                verify_jwt_token(forged_token)
+            assert error.value.status_code == 401
+
+        legacy = jwt.encode({"user_id": 1, "exp": time.time() + 60}, Config.JWT_SECRET, algorithm="HS256")
+        assert verify_jwt_token(legacy)["user_id"] == 1
+        token_cache.clear()
+        monkeypatch.setattr(Config, "JWT_ACCEPT_HS256", False)
+        with pytest.raises(auth.HTTPException):
+            verify_jwt_token(legacy)
@@ -0,0 +1,214 @@
+import pytest
+import httpx
+import os
+import time
+import logging
+from datetime import datetime, timedelta
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from db.session import get_db, Base
+from models.user import User
+from models.nft import NFT, reservation_cutoff
+from models.transaction import Transaction, PaymentMethod, TransactionStatus
+from routes import nft as nft_routes
+from routes import purchase as purchase_routes
+from utils import scheduler
+from utils.auth import get_current_user
+from utils.inventory import MemoryInventoryCache
+
+logger = logging.getLogger(__name__)
+
+# Routes in routes/nft.py run on an AsyncSession, routes/purchase.py on a sync
+# Session; both are served from the same file
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_lazy_expiry.db"
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test_lazy_expiry.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+BUYER_ID = 1
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as session:
+        yield session
+
+
+def override_get_current_user():
+    return User(id=BUYER_ID, name="Buyer", email="buyer@example.com", google_id="buyer")
+
+
+class VerifiedPayPalClient:
+    """Stand-in for httpx.AsyncClient accepting every webhook signature"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def post(self, url, **kwargs):
+        return httpx.Response(200, json={"verification_status": "SUCCESS"})
+
+
+def paypal_sale_completed(txn_ref: str) -> dict:
+    return {"event_type": "PAYMENT.SALE.COMPLETED", "resource": {"custom": txn_ref, "amount": {"currency": "USD"}}}
+
+
+@pytest.fixture
+def test_db():
+    """NFT 1 free, 2 freshly reserved, 3 reserved long ago (lapsed, with a pending transaction), 4 sold"""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    db.add(User(id=BUYER_ID, name="Buyer", email="buyer@example.com", google_id="buyer"))
+    db.add(User(id=2, name="Earlier Buyer", email="earlier@example.com", google_id="earlier"))
+    states = {
+        1: dict(),
+        2: dict(is_reserved=True, reserved_at=datetime.utcnow()),
+        3: dict(is_reserved=True, reserved_at=datetime.utcnow() - timedelta(hours=1)),
+        4: dict(is_sold=True),
+    }
+    for nft_id, state in states.items():
+        db.add(NFT(id=nft_id, title=f"NFT {nft_id}", image_url="https://example.com/nft.png",
+                   price_inr=1000.0, price_usd=12.0, contract_address="0xabc", token_id=str(nft_id), **state))
+    db.add(Transaction(id=1, user_id=2, nft_id=3, payment_method=PaymentMethod.USD,
+                       status=TransactionStatus.PENDING, txn_ref="ref-3", amount=12, currency="USD"))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if os.path.exists("test_lazy_expiry.db"):
+            os.remove("test_lazy_expiry.db")
+
+
+@pytest.fixture
+def app(test_db, monkeypatch):
+    monkeypatch.setattr(purchase_routes, "inventory", MemoryInventoryCache())
+    monkeypatch.setattr(nft_routes, "inventory", MemoryInventoryCache())
+    monkeypatch.setattr(purchase_routes, "initiate_paypal_payment", lambda **kwargs: "https://paypal.example.com/approve")
+    monkeypatch.setattr(purchase_routes, "initiate_paypal_cart_payment", lambda **kwargs: "https://paypal.example.com/approve")
+    app = FastAPI()
+    app.include_router(purchase_routes.router, prefix="/api")
+    app.include_router(nft_routes.router, prefix="/api")
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = override_get_current_user
+    app.dependency_overrides[nft_routes.get_current_user] = override_get_current_user
+    return app
+
+
+class TestAvailabilityPredicate:
+    """Test that lapsed reservations count as available without a sweep"""
+
+    def test_sql_and_python_agree(self, test_db):
+        """Test the hybrid predicate in a query and on loaded rows"""
+        cutoff = reservation_cutoff()
+        in_sql = set(test_db.execute(select(NFT.id).where(NFT.is_available(cutoff))).scalars())
+        in_python = {nft.id for nft in test_db.query(NFT).all() if nft.is_available(cutoff)}
+        assert in_sql == in_python == {1, 3}
+
+    def test_listing_and_count(self, app):
+        """Test that the listing shows lapsed reservations as available and hides live ones"""
+        app.dependency_overrides[get_db] = override_get_async_db
+        response = TestClient(app).get("/api/nfts")
+        assert response.status_code == 200
+        body = response.json()
+        assert [(nft["id"], nft["is_reserved"]) for nft in body["data"]] == [(1, False), (3, False)]
+        assert body["pagination"]["total"] == 2
+
+    @pytest.mark.asyncio
+    async def test_inventory_reconciliation(self, test_db, monkeypatch):
+        """Test that the inventory cache treats lapsed reservations as available"""
+        cache = MemoryInventoryCache()
+        monkeypatch.setattr(scheduler, "inventory", cache)
+        monkeypatch.setattr(scheduler, "JobSessionLocal", TestingSessionLocal)
+        await scheduler.reconcile_inventory_cache()
+        assert [await cache.is_unavailable(i) for i in range(1, 5)] == [False, True, False, True]
+
+        # A reservation recorded by a purchase stops being rejected once it lapses
+        await cache.set_available(5, False, reserved_until=time.time() + 60)
+        await cache.set_available(6, False, reserved_until=time.time() - 1)
+        assert await cache.is_unavailable(5) is True
+        assert await cache.is_unavailable(6) is False
+
+
+class TestLapsedTakeover:
+    """Test buying an NFT whose reservation lapsed before the sweep ran"""
+
+    def test_single_purchase_takes_over(self, app, test_db):
+        """Test that a purchase re-reserves a lapsed NFT and expires the old transaction"""
+        http = TestClient(app)
+        response = http.post("/api/purchase/usd/3", headers=AUTH_HEADERS)
+        assert response.status_code == 200
+
+        test_db.expire_all()
+        nft = test_db.get(NFT, 3)
+        assert nft.is_reserved and nft.reserved_at > datetime.utcnow() - timedelta(minutes=1)
+        assert test_db.get(Transaction, 1).status == TransactionStatus.EXPIRED
+        pending = test_db.query(Transaction).filter(Transaction.status == TransactionStatus.PENDING).all()
+        assert [(t.user_id, t.nft_id) for t in pending] == [(BUYER_ID, 3)]
+
+        # A live reservation still blocks buyers
+        assert http.post("/api/purchase/usd/2", headers=AUTH_HEADERS).status_code == 400
+
+    def test_cart_takes_over(self, app, test_db):
+        """Test that a cart including a lapsed NFT succeeds and a live one fails"""
+        http = TestClient(app)
+        assert http.post("/api/purchase/cart", json={"nft_ids": [1, 2], "payment_method": "USD"}).status_code == 400
+        response = http.post("/api/purchase/cart", json={"nft_ids": [1, 3], "payment_method": "USD"})
+        assert response.status_code == 200
+
+        test_db.expire_all()
+        assert test_db.get(Transaction, 1).status == TransactionStatus.EXPIRED
+        assert test_db.get(NFT, 3).is_reserved is True
+
+    def test_late_webhook_keeps_new_owner(self, app, test_db, monkeypatch):
+        """Test that the previous holder paying after a takeover does not get the NFT"""
+        monkeypatch.setattr(httpx, "AsyncClient", VerifiedPayPalClient)
+        http = TestClient(app)
+        txn_ref = http.post("/api/purchase/usd/3", headers=AUTH_HEADERS).json()["data"]["txn_ref"]
+
+        # The new holder pays, then the old holder's payment comes in
+        assert http.post("/api/payment/paypal-webhook", json=paypal_sale_completed(txn_ref)).status_code == 200
+        assert http.post("/api/payment/paypal-webhook", json=paypal_sale_completed("ref-3")).status_code == 200
+
+        test_db.expire_all()
+        nft = test_db.get(NFT, 3)
+        assert nft.is_sold and nft.sold_to_user_id == BUYER_ID
+        assert test_db.get(Transaction, 1).status == TransactionStatus.EXPIRED
+
+    def test_late_webhook_before_new_payment(self, app, test_db, monkeypatch):
+        """Test that a late payment leaves a taken-over reservation with its new holder"""
+        monkeypatch.setattr(httpx, "AsyncClient", VerifiedPayPalClient)
+        http = TestClient(app)
+        txn_ref = http.post("/api/purchase/usd/3", headers=AUTH_HEADERS).json()["data"]["txn_ref"]
+
+        assert http.post("/api/payment/paypal-webhook", json=paypal_sale_completed("ref-3")).status_code == 200
+        test_db.expire_all()
+        nft = test_db.get(NFT, 3)
+        assert nft.is_reserved and not nft.is_sold and nft.sold_to_user_id is None
+        assert test_db.get(Transaction, 1).status == TransactionStatus.EXPIRED
+
+        assert http.post("/api/payment/paypal-webhook", json=paypal_sale_completed(txn_ref)).status_code == 200
+        test_db.expire_all()
+        assert test_db.get(NFT, 3).sold_to_user_id == BUYER_ID
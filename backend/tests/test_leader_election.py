@@ -0,0 +1,101 @@
+import pytest
+import asyncio
+import os
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.user import User  # noqa: F401 (resolves NFT relationships when run alone)
+from models.scheduler_lease import SchedulerLease
+from utils import scheduler
+from utils.leader import LeaderElection, release_lease, try_acquire_lease
+
+logger = logging.getLogger(__name__)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_leader_election.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def test_db():
+    """Create an empty scheduler_leases table"""
+    SchedulerLease.__table__.create(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        SchedulerLease.__table__.drop(bind=engine)
+        engine.dispose()
+        if os.path.exists("test_leader_election.db"):
+            os.remove("test_leader_election.db")
+
+
+class TestLease:
+    """Test the lease statements"""
+
+    def test_single_holder_until_expiry(self, test_db):
+        """Test that only one worker holds the lease and another takes over once it expires"""
+        assert try_acquire_lease(test_db, "scheduler", "a", 30, NOW)
+        assert not try_acquire_lease(test_db, "scheduler", "b", 30, NOW + timedelta(seconds=10))
+        assert try_acquire_lease(test_db, "scheduler", "a", 30, NOW + timedelta(seconds=20))
+        assert not try_acquire_lease(test_db, "scheduler", "b", 30, NOW + timedelta(seconds=45))
+        assert try_acquire_lease(test_db, "scheduler", "b", 30, NOW + timedelta(seconds=51))
+        test_db.commit()
+
+        lease = test_db.get(SchedulerLease, "scheduler")
+        assert lease.holder == "b"
+        assert lease.acquired_at == NOW + timedelta(seconds=51)
+
+    def test_release_hands_over_immediately(self, test_db):
+        """Test that a released lease can be taken before it would have expired"""
+        assert try_acquire_lease(test_db, "scheduler", "a", 30, NOW)
+        assert not release_lease(test_db, "scheduler", "b", NOW)
+        assert release_lease(test_db, "scheduler", "a", NOW + timedelta(seconds=1))
+        assert try_acquire_lease(test_db, "scheduler", "b", 30, NOW + timedelta(seconds=2))
+
+
+class TestLeaderElection:
+    """Test failover between election heartbeats"""
+
+    @pytest.mark.asyncio
+    async def test_failover_within_lease(self, test_db):
+        """Test that a follower is elected once the leader stops renewing"""
+        elected = []
+        first = LeaderElection("scheduler", lease_seconds=0.3, holder="a", session_factory=TestingSessionLocal)
+        second = LeaderElection("scheduler", lease_seconds=0.3, holder="b", session_factory=TestingSessionLocal)
+        second._on_elected = lambda: asyncio.sleep(0, elected.append("b"))
+
+        assert await first.heartbeat()
+        assert not await second.heartbeat()
+        assert second.to_dict()["is_leader"] is False
+
+        # The leader dies without releasing the lease
+        await asyncio.sleep(0.35)
+        assert await second.heartbeat()
+        assert elected == ["b"]
+        assert not await first.heartbeat()
+        assert first.is_leader is False
+
+    @pytest.mark.asyncio
+    async def test_jobs_run_on_leader_only(self, test_db, monkeypatch):
+        """Test that leader-only jobs are skipped by followers"""
+        calls = []
+
+        async def job():
+            calls.append(True)
+
+        election = LeaderElection("scheduler", lease_seconds=30, holder="a", session_factory=TestingSessionLocal)
+        monkeypatch.setattr(scheduler, "scheduler_election", election)
+        monkeypatch.setattr(scheduler.Config, "SCHEDULER_LEADER_ELECTION", True)
+
+        await scheduler.leader_only(job)()
+        assert calls == []
+
+        await election.heartbeat()
+        await scheduler.leader_only(job)()
+        assert calls == [True]
@@ -0,0 +1,137 @@
+import pytest
+import asyncio
+import json
+import logging
+import queue
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from config import Config
+from middleware.logging import LoggingMiddleware, SecurityHeadersMiddleware, SecurityLoggingMiddleware
+from utils.logging_setup import DroppingQueueHandler, configure_logging, stop_logging
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    # Replace any configuration made on import of main with one writing to tmp_path
+    stop_logging()
+    configure_logging(log_dir=str(tmp_path))
+    try:
+        yield tmp_path
+    finally:
+        stop_logging()
+
+
+@pytest.fixture
+def http():
+    app = FastAPI()
+    app.add_middleware(LoggingMiddleware)
+
+    @app.get("/work")
+    def work():
+        logging.getLogger("performance").info("Did some work", extra={"rows": 3})
+        return {"ok": True}
+
+    @app.get("/boom")
+    def boom():
+        raise RuntimeError("kaboom")
+
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def read_lines(log_dir, filename):
+    """Flush the writer thread and parse a log file"""
+    stop_logging()
+    with open(log_dir / filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class TestStructuredLogging:
+    """Test queued JSON logging with request correlation and sampling"""
+
+    def test_json_lines_share_the_request_id(self, log_dir, http):
+        """Test that every line logged for a request carries its id, supplied or generated"""
+        response = http.get("/work", headers={"X-Request-ID": "req-abc.123"})
+        assert response.headers["X-Request-ID"] == "req-abc.123"
+        generated = http.get("/work", headers={"X-Request-ID": "not an id\n"}).headers["X-Request-ID"]
+        assert generated != "not an id\n" and len(generated) == 32
+
+        access = read_lines(log_dir, "app.log")
+        assert [line["request_id"] for line in access] == ["req-abc.123", generated]
+        assert access[0]["status"] == 200 and access[0]["path"] == "/work" and access[0]["duration_ms"] >= 0
+        assert "User: Anonymous" in access[0]["message"]
+
+        work = read_lines(log_dir, "performance.log")
+        assert [(line["request_id"], line["rows"]) for line in work] == [("req-abc.123", 3), (generated, 3)]
+
+    def test_successful_requests_are_sampled(self, log_dir, http, monkeypatch):
+        """Test that 2xx lines follow LOG_SAMPLE_2XX_RATE while errors are always logged"""
+        monkeypatch.setattr(Config, "LOG_SAMPLE_2XX_RATE", 0.0)
+        for _ in range(5):
+            assert http.get("/work").status_code == 200
+        assert http.get("/missing").status_code == 404
+        response = http.get("/boom")
+        assert response.status_code == 500
+        assert response.json()["error_id"] == response.headers["X-Request-ID"]
+
+        access = read_lines(log_dir, "app.log")
+        assert [(line["level"], line["status"]) for line in access] == [("WARNING", 404), ("ERROR", 500)]
+        assert access[1]["request_id"] == response.headers["X-Request-ID"]
+        assert "RuntimeError: kaboom" in access[1]["exc"]
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test that a writer falling behind costs log lines, not request latency"""
+        handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+        record = logging.LogRecord("app_middleware", logging.INFO, __file__, 1, "line %s", (1,), None)
+        handler.handle(record)
+        handler.handle(record)
+        assert handler.dropped == 1
+        assert handler.queue.get_nowait().getMessage() == "line 1"
+
+
+class TestASGIStack:
+    """Test that the middleware stack streams responses instead of buffering them"""
+
+    @pytest.mark.asyncio
+    async def test_streaming_response_passes_through_unbuffered(self, log_dir):
+        """Test that each chunk reaches the server before the next is produced, with headers added"""
+        released = asyncio.Event()
+
+        async def events():
+            yield b"data: first\n\n"
+            await released.wait()  # Only produced once the first chunk went out
+            yield b"data: second\n\n"
+
+        app = FastAPI()
+
+        @app.get("/events")
+        async def stream():
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        stack = SecurityLoggingMiddleware(LoggingMiddleware(SecurityHeadersMiddleware(app)))
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+            if message.get("body") == b"data: first\n\n":
+                released.set()
+
+        async def receive():
+            await asyncio.sleep(3600)
+
+        scope = {
+            "type": "http", "method": "GET", "path": "/events", "raw_path": b"/events", "root_path": "",
+            "scheme": "http", "query_string": b"", "headers": [(b"x-request-id", b"stream-1")],
+            "client": ("127.0.0.1", 1234), "server": ("testserver", 80), "http_version": "1.1"
+        }
+        await asyncio.wait_for(stack(scope, receive, send), timeout=5)
+
+        headers = dict(sent[0]["headers"])
+        assert sent[0]["status"] == 200
+        assert headers[b"x-request-id"] == b"stream-1" and headers[b"x-frame-options"] == b"DENY"
+        assert [m.get("body") for m in sent[1:] if m.get("body")] == [b"data: first\n\n", b"data: second\n\n"]
+
+        access = read_lines(log_dir, "app.log")
+        assert [(line["request_id"], line["status"]) for line in access] == [("stream-1", 200)]
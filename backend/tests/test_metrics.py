@@ -0,0 +1,93 @@
+import pytest
+import os
+import subprocess
+import sys
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from middleware.metrics import MetricsMiddleware
+from utils.metrics import instrument_engine, observe_outbound, timed_pool
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestRequestMetrics:
+    """Test latency histograms by route template and status"""
+
+    def test_requests_are_labelled_by_route_template(self):
+        """Test that paths sharing a route share a series, and unmatched paths share one too"""
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/items/{item_id}")
+        def item(item_id: int):
+            if item_id == 0:
+                raise HTTPException(status_code=404, detail="Not Found")
+            return {"id": item_id}
+
+        labels = {"method": "GET", "route": "/items/{item_id}"}
+        before_ok = sample("http_request_duration_seconds_count", status="200", **labels)
+        before_missing = sample("http_request_duration_seconds_count", status="404", **labels)
+        before_unmatched = sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404")
+
+        http = TestClient(app)
+        for item_id in (1, 2, 3, 0):
+            http.get(f"/items/{item_id}")
+        http.get("/nowhere/at/all")
+
+        assert sample("http_request_duration_seconds_count", status="200", **labels) - before_ok == 3
+        assert sample("http_request_duration_seconds_count", status="404", **labels) - before_missing == 1
+        assert sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404") - before_unmatched == 1
+        assert sample("http_requests_in_flight") == 0
+
+
+class TestDependencyMetrics:
+    """Test outbound call, pool and multiprocess metrics"""
+
+    def test_outbound_calls_record_outcome(self):
+        """Test that a failing call is timed and labelled as an error"""
+        labels = {"service": "paypal", "operation": "test_call"}
+        with observe_outbound("paypal", "test_call"):
+            pass
+        with pytest.raises(ConnectionError):
+            with observe_outbound("paypal", "test_call"):
+                raise ConnectionError("gateway down")
+        assert sample("outbound_request_duration_seconds_count", outcome="ok", **labels) == 1
+        assert sample("outbound_request_duration_seconds_count", outcome="error", **labels) == 1
+
+    def test_pool_checkouts_and_wait_are_recorded(self, tmp_path):
+        """Test that each checkout is counted, timed and released"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=timed_pool(QueuePool, "test"))
+        instrument_engine(engine, "test")
+        for _ in range(3):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                assert sample("db_pool_connections_checked_out", engine="test") == 1
+        engine.dispose()
+
+        assert sample("db_pool_checkouts_total", engine="test") == 3
+        assert sample("db_pool_connections_checked_out", engine="test") == 0
+        assert sample("db_pool_wait_seconds_count", engine="test") == 3
+
+    def test_workers_are_aggregated_in_multiprocess_mode(self, tmp_path):
+        """Test that a scrape reports the sum of what separate worker processes recorded"""
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+        worker = (
+            "from utils.metrics import cache_lookups\n"
+            "cache_lookups.labels('user', 'hit').inc(5)\n"
+        )
+        for _ in range(2):
+            subprocess.run([sys.executable, "-c", worker], cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+        scrape = subprocess.run(
+            [sys.executable, "-c", "from utils.metrics import render; print(render().decode())"],
+            cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+        ).stdout
+        assert 'cache_lookups_total{cache="user",result="hit"} 10.0' in scrape
@@ -0,0 +1,255 @@
+import pytest
+import os
+import logging
+import time
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Form, HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from db.session import get_db, Base
+from models.user import User
+from models.nft import NFT  # noqa: F401 (resolves User relationships)
+from models.transaction import Transaction  # noqa: F401
+from routes import auth as auth_routes
+from utils.auth import verify_jwt_token
+from utils.oidc import OIDCError, OIDCProvider, code_challenge
+from utils.refresh_tokens import REFRESH_TOKEN_COOKIE
+from utils.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_oidc.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+ISSUER = "https://idp.test"
+CLIENT_ID = "marketplace-client"
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class StandInProvider:
+    """Local OpenID provider: discovery, JWKS, token endpoint and a userinfo endpoint that must stay unused"""
+
+    def __init__(self):
+        self.requests = {"discovery": 0, "jwks": 0, "token": 0, "userinfo": 0}
+        self.codes = {}
+        self.rotate_key()
+        self.app = self._build_app()
+
+    def rotate_key(self):
+        self.kid = f"key-{len(getattr(self, 'keys', {})) + 1}"
+        self.keys = {**getattr(self, "keys", {}), self.kid: rsa.generate_private_key(public_exponent=65537, key_size=2048)}
+
+    def authorize(self, authorization_url: str, sub: str = "google-123") -> str:
+        """Consent screen: remember what the code was issued for"""
+        params = {k: v[0] for k, v in parse_qs(urlparse(authorization_url).query).items()}
+        code = f"code-{len(self.codes)}"
+        self.codes[code] = {**params, "sub": sub}
+        return code, params["state"]
+
+    def id_token(self, grant: dict, private_key=None, kid=None, **overrides) -> str:
+        now = int(time.time())
+        claims = {
+            "iss": ISSUER, "aud": grant["client_id"], "sub": grant["sub"], "iat": now, "exp": now + 3600,
+            "nonce": grant["nonce"], "email": "oidc@example.com", "email_verified": True,
+            "name": "OIDC User", "picture": "https://example.com/me.png", **overrides
+        }
+        return jwt.encode(claims, private_key or self.keys[self.kid], algorithm="RS256", headers={"kid": kid or self.kid})
+
+    def _build_app(self):
+        app = FastAPI()
+
+        @app.get("/.well-known/openid-configuration")
+        async def discovery():
+            self.requests["discovery"] += 1
+            return {
+                "issuer": ISSUER,
+                "authorization_endpoint": f"{ISSUER}/authorize",
+                "token_endpoint": f"{ISSUER}/token",
+                "jwks_uri": f"{ISSUER}/jwks",
+                "userinfo_endpoint": f"{ISSUER}/userinfo"
+            }
+
+        @app.get("/jwks")
+        async def jwks():
+            self.requests["jwks"] += 1
+            keys = []
+            for kid, key in self.keys.items():
+                jwk = jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key(), as_dict=True)
+                keys.append({**jwk, "kid": kid, "alg": "RS256", "use": "sig"})
+            return {"keys": keys}
+
+        @app.post("/token")
+        async def token(code: str = Form(...), code_verifier: str = Form(...), client_id: str = Form(...)):
+            self.requests["token"] += 1
+            grant = self.codes.pop(code, None)
+            if grant is None or code_challenge(code_verifier) != grant["code_challenge"]:
+                raise HTTPException(status_code=400, detail="invalid_grant")
+            return {"access_token": "opaque", "token_type": "Bearer", "id_token": grant.get("id_token") or self.id_token(grant, **grant.get("claims", {}))}
+
+        @app.get("/userinfo")
+        async def userinfo():
+            self.requests["userinfo"] += 1
+            return {}
+
+        return app
+
+
+@pytest.fixture
+def idp(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    stand_in = StandInProvider()
+    client = httpx.AsyncClient(app=stand_in.app, base_url=ISSUER)
+    provider = OIDCProvider(
+        f"{ISSUER}/.well-known/openid-configuration", CLIENT_ID, "secret",
+        jwks_min_refresh_seconds=60, http=lambda: client
+    )
+    monkeypatch.setattr(auth_routes, "google_oidc", provider)
+    try:
+        yield stand_in, provider
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if os.path.exists("test_oidc.db"):
+            os.remove("test_oidc.db")
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.include_router(auth_routes.router, prefix="/auth")
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+async def login(app, stand_in, **grant):
+    """Walk through login-google, the consent screen and the callback; returns the final redirect"""
+    async with httpx.AsyncClient(app=app, base_url="https://testserver") as browser:
+        response = await browser.get("/auth/login-google")
+        assert response.status_code == 307
+        code, state = stand_in.authorize(response.headers["location"])
+        stand_in.codes[code].update(grant)
+        return await browser.get("/auth/callback", params={"code": code, "state": state})
+
+
+class TestOIDCLogin:
+    """Test Google login against a local OIDC stand-in"""
+
+    @pytest.mark.asyncio
+    async def test_login_verifies_id_token_locally(self, idp, app):
+        """Test that logins create the user from the ID token with one outbound request each"""
+        stand_in, provider = idp
+        for _ in range(3):
+            response = await login(app, stand_in)
+            location = response.headers["location"]
+            assert "/auth/success?" in location, location
+            query = parse_qs(urlparse(location).query)
+            assert verify_jwt_token(query["token"][0])["email"] == "oidc@example.com"
+            # The refresh token never appears in the URL, only in an HttpOnly cookie
+            assert "refresh_token" not in query
+            assert response.cookies[REFRESH_TOKEN_COOKIE]
+            set_cookie = response.headers.get_list("set-cookie")
+            assert any(c.startswith(f"{REFRESH_TOKEN_COOKIE}=") and "HttpOnly" in c and "Path=/auth" in c for c in set_cookie)
+
+        db = TestingSessionLocal()
+        user = db.query(User).one()
+        assert (user.google_id, user.name, user.profile_pic) == ("google-123", "OIDC User", "https://example.com/me.png")
+        db.close()
+
+        # Discovery and keys are cached; no userinfo round trip
+        logger.info(f"✓ Stand-in requests for 3 logins: {stand_in.requests}")
+        assert stand_in.requests == {"discovery": 1, "jwks": 1, "token": 3, "userinfo": 0}
+
+    @pytest.mark.asyncio
+    async def test_rejects_tokens_not_bound_to_the_login(self, idp, app):
+        """Test that foreign nonces, audiences and keys, and forged state, fail the login"""
+        stand_in, provider = idp
+        await provider.refresh()
+        forged_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+        grant = {"client_id": CLIENT_ID, "sub": "attacker", "nonce": "n"}
+        for id_token in (
+            stand_in.id_token(grant),  # nonce of another login
+            stand_in.id_token({**grant, "client_id": "other-client"}),
+            stand_in.id_token(grant, private_key=forged_key, kid="unknown-kid"),
+        ):
+            response = await login(app, stand_in, id_token=id_token)
+            assert response.headers["location"].endswith("/auth/error?error=oauth_failed")
+
+        async with httpx.AsyncClient(app=app, base_url="https://testserver") as browser:
+            response = await browser.get("/auth/login-google")
+            code, _ = stand_in.authorize(response.headers["location"])
+            response = await browser.get("/auth/callback", params={"code": code, "state": "forged"})
+            assert response.headers["location"].endswith("/auth/error?error=oauth_failed")
+
+        db = TestingSessionLocal()
+        assert db.query(User).count() == 0
+        db.close()
+        # The unknown kid did not cause a refetch within jwks_min_refresh_seconds
+        assert stand_in.requests["jwks"] == 1
+
+    @pytest.mark.asyncio
+    async def test_key_rotation(self, idp, app):
+        """Test that a token signed with a newly published key triggers one JWKS refetch"""
+        stand_in, provider = idp
+        await provider.refresh()
+        stand_in.rotate_key()
+
+        with pytest.raises(OIDCError):
+            await provider.verify_id_token(stand_in.id_token({"client_id": CLIENT_ID, "sub": "s", "nonce": "n"}), "n")
+        assert stand_in.requests["jwks"] == 1  # Fetched too recently
+
+        provider.jwks_min_refresh_seconds = 0
+        claims = await provider.verify_id_token(stand_in.id_token({"client_id": CLIENT_ID, "sub": "s", "nonce": "n"}), "n")
+        assert claims["sub"] == "s"
+        assert stand_in.requests["jwks"] == 2
+        assert provider.to_dict()["keys"] == ["key-1", "key-2"]
+
+    @pytest.mark.asyncio
+    async def test_returning_user_login_skips_unchanged_writes(self, idp, app):
+        """Test that the login upsert leaves an unchanged user row alone and updates a changed one"""
+        stand_in, provider = idp
+        await login(app, stand_in)
+        db = TestingSessionLocal()
+        user = db.query(User).one()
+        user.updated_at = datetime(2020, 1, 1)
+        db.commit()
+        user_cache.put(user)
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            await login(app, stand_in)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        db.expire_all()
+        assert db.query(User).one().updated_at.replace(tzinfo=None) == datetime(2020, 1, 1)
+        assert sum(statement.startswith("INSERT INTO users") for statement in statements) == 1
+        assert not any(statement.startswith("UPDATE users") for statement in statements)
+        assert user_cache.get(user.id) is not None
+
+        await login(app, stand_in, claims={"picture": "https://example.com/new.png"})
+        db.expire_all()
+        user = db.query(User).one()
+        assert user.profile_pic == "https://example.com/new.png"
+        assert user.updated_at.replace(tzinfo=None) > datetime(2020, 1, 1)
+        assert user_cache.get(user.id) is None
+        db.close()
+        user_cache.clear()
@@ -0,0 +1,216 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import os
+import logging
+
+# Import the FastAPI app and dependencies
+from main import app
+from db.session import get_db, Base
+from models.user import User
+from models.nft import NFT
+from models.transaction import Transaction, PaymentMethod, TransactionStatus
+from routes.auth import get_current_user
+
+logger = logging.getLogger(__name__)
+
+# Routes in routes/nft.py run on an AsyncSession, so the test database is
+# seeded through a sync engine and served through an async one on the same file
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_pagination.db"
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test_pagination.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+TEST_USER_ID = 1
+
+
+async def override_get_db():
+    async with AsyncTestingSessionLocal() as session:
+        yield session
+
+
+def override_get_current_user():
+    return User(
+        id=TEST_USER_ID,
+        name="Test User",
+        email="test@example.com",
+        google_id="test_google_id",
+        is_admin=False
+    )
+
+
+@contextmanager
+def count_queries():
+    """Collect every SQL statement the async engine sends to the database"""
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@pytest.fixture
+def test_db():
+    """Create a fresh schema and session for each test"""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    db.add(User(id=TEST_USER_ID, name="Test User", email="test@example.com", google_id="test_google_id"))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if os.path.exists("test_pagination.db"):
+            os.remove("test_pagination.db")
+
+
+@pytest.fixture
+def test_client(test_db):
+    """Test client wired to the async test database and a fixed user"""
+    previous_overrides = dict(app.dependency_overrides)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = override_get_current_user
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(previous_overrides)
+
+
+def seed_purchases(db, count, status=TransactionStatus.PAID):
+    """Create `count` NFTs with one transaction each for the test user"""
+    base_time = datetime(2026, 1, 1, 12, 0, 0)
+    for i in range(count):
+        nft = NFT(
+            title=f"Pagination NFT {i}",
+            image_url=f"https://example.com/{i}.png",
+            price_inr=1000.0 + i,
+            price_usd=12.0 + i,
+            is_sold=status == TransactionStatus.PAID,
+            is_reserved=False
+        )
+        db.add(nft)
+        db.flush()
+        db.add(Transaction(
+            user_id=TEST_USER_ID,
+            nft_id=nft.id,
+            payment_method=PaymentMethod.INR,
+            status=status,
+            amount=str(nft.price_inr),
+            currency="INR",
+            created_at=base_time + timedelta(minutes=i)
+        ))
+    db.commit()
+
+
+class TestMyPurchases:
+    """Test /api/my-purchases query shape and cursor pagination"""
+
+    def test_query_count_is_constant(self, test_client, test_db):
+        """Test that the number of queries does not grow with the number of purchases"""
+        seed_purchases(test_db, 2)
+        with count_queries() as small:
+            response = test_client.get("/api/my-purchases?limit=100")
+        assert response.status_code == 200
+        assert len(response.json()["data"]) == 2
+
+        seed_purchases(test_db, 40)
+        with count_queries() as large:
+            response = test_client.get("/api/my-purchases?limit=100")
+        assert response.status_code == 200
+        assert len(response.json()["data"]) == 42
+
+        assert len(large) == len(small)
+        logger.info(f"✓ /api/my-purchases issued {len(large)} queries for 2 and 42 purchases")
+
+    def test_cursor_walks_all_purchases(self, test_client, test_db):
+        """Test that following next_cursor returns every purchase exactly once, newest first"""
+        seed_purchases(test_db, 7)
+        seed_purchases(test_db, 3, status=TransactionStatus.PENDING)
+
+        seen = []
+        cursor = None
+        while True:
+            url = "/api/my-purchases?limit=3" + (f"&cursor={cursor}" if cursor else "")
+            body = test_client.get(url).json()
+            seen.extend(item["transaction"]["id"] for item in body["data"])
+            assert body["total_purchases"] == 7
+            cursor = body["pagination"]["next_cursor"]
+            if not body["pagination"]["has_more"]:
+                break
+
+        assert len(seen) == 7
+        assert len(set(seen)) == 7
+        assert seen == sorted(seen, reverse=True)
+
+    def test_invalid_cursor_rejected(self, test_client, test_db):
+        """Test that a malformed cursor returns 400"""
+        response = test_client.get("/api/my-purchases?cursor=not-a-cursor")
+        assert response.status_code == 400
+
+
+class TestMyTransactions:
+    """Test /api/my-transactions filters, projection and cursor pagination"""
+
+    def test_cursor_walks_all_transactions(self, test_client, test_db):
+        """Test that following next_cursor returns every transaction exactly once"""
+        seed_purchases(test_db, 5)
+        seed_purchases(test_db, 4, status=TransactionStatus.PENDING)
+
+        seen = []
+        cursor = None
+        while True:
+            url = "/api/my-transactions?limit=4" + (f"&cursor={cursor}" if cursor else "")
+            body = test_client.get(url).json()
+            assert len(body["data"]) <= 4
+            seen.extend(item["id"] for item in body["data"])
+            cursor = body["pagination"]["next_cursor"]
+            if not body["pagination"]["has_more"]:
+                break
+
+        assert len(seen) == 9
+        assert len(set(seen)) == 9
+
+    def test_date_range_and_status_filters(self, test_client, test_db):
+        """Test created_from/created_to bounds combined with a status filter"""
+        seed_purchases(test_db, 10)
+
+        response = test_client.get(
+            "/api/my-transactions?status=paid"
+            "&created_from=2026-01-01T12:03:00&created_to=2026-01-01T12:07:00"
+        )
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert len(data) == 4
+        assert all(item["status"] == "paid" for item in data)
+        assert set(data[0].keys()) == {"id", "nft_id", "payment_method", "status", "amount", "currency", "created_at"}
+
+        response = test_client.get(
+            "/api/my-transactions?created_from=2026-01-02T00:00:00&created_to=2026-01-01T00:00:00"
+        )
+        assert response.status_code == 400
+
+    def test_selects_only_public_columns(self, test_client, test_db):
+        """Test that the listing query does not load private columns"""
+        seed_purchases(test_db, 3)
+        with count_queries() as statements:
+            response = test_client.get("/api/my-transactions")
+        assert response.status_code == 200
+        listing = [s for s in statements if "FROM transactions" in s]
+        assert len(listing) == 1
+        assert "gateway_response" not in listing[0]
+        assert "txn_ref" not in listing[0]
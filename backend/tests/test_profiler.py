@@ -0,0 +1,105 @@
+import pytest
+import logging
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Import all models so User's relationships resolve
+from models.nft import NFT  # noqa: F401
+from models.transaction import Transaction  # noqa: F401
+from models.user import User
+from config import Config
+from middleware.auth import AuthContextMiddleware
+from middleware.profiling import ProfilingMiddleware
+from utils import profiler
+from utils.auth import create_jwt_token
+from utils.user_cache import user_cache
+
+
+def busy_async_work():
+    deadline = time.perf_counter() + 0.15
+    while time.perf_counter() < deadline:
+        pass
+
+
+def busy_sync_work():
+    deadline = time.perf_counter() + 0.15
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.fixture
+def http(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiler, "rolling", profiler.RollingProfiles(str(tmp_path / "rolling-1.folded"), 0))
+    for user_id, is_admin in ((901, True), (902, False)):
+        user_cache.put(User(id=user_id, name="User", email=f"{user_id}@example.com", google_id=str(user_id), is_admin=is_admin))
+
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+    app.add_middleware(AuthContextMiddleware)
+
+    @app.get("/work/{item_id}")
+    async def async_work(item_id: int):
+        busy_async_work()
+        return {"ok": True}
+
+    @app.get("/sync-work")
+    def sync_work():
+        busy_sync_work()
+        return {"ok": True}
+
+    try:
+        yield TestClient(app)
+    finally:
+        user_cache.invalidate(901)
+        user_cache.invalidate(902)
+
+
+def auth(user_id):
+    return {"Authorization": f"Bearer {create_jwt_token(user_id, f'{user_id}@example.com')}"}
+
+
+def read_folded(path):
+    with open(path) as f:
+        return {line.rpartition(" ")[0]: int(line.rpartition(" ")[2]) for line in f}
+
+
+class TestOnDemandProfiling:
+    """Test that flagged admin requests are sampled into folded-stack files"""
+
+    def test_admin_request_is_profiled(self, http, tmp_path):
+        """Test that an admin's flagged request gets a profile of its event loop and thread pool work"""
+        response = http.get("/work/7", headers={**auth(901), "X-Profile": "1"})
+        name = response.headers["X-Profile"]
+        stacks = read_folded(tmp_path / name)
+        assert all(stack.startswith("GET /work/{item_id};[event loop];") for stack in stacks)
+        busy = sum(count for stack, count in stacks.items() if "busy_async_work" in stack)
+        assert busy >= 5
+
+        name = http.get("/sync-work?profile=1", headers=auth(901)).headers["X-Profile"]
+        stacks = read_folded(tmp_path / name)
+        assert any(stack.startswith("GET /sync-work;[thread pool];") and "busy_sync_work" in stack for stack in stacks)
+
+    def test_flag_is_ignored_for_other_users(self, http, tmp_path, caplog):
+        """Test that non-admins and anonymous users are served normally and the attempt is logged"""
+        with caplog.at_level(logging.WARNING, logger="security"):
+            assert "X-Profile" not in http.get("/work/1", headers={**auth(902), "X-Profile": "1"}).headers
+            assert "X-Profile" not in http.get("/work/1?profile=1").headers
+        assert [record.event for record in caplog.records if record.name == "security"] == ["PROFILE_DENIED"] * 2
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestRollingProfiling:
+    """Test that one request in N is aggregated per route"""
+
+    def test_one_in_n_requests_is_aggregated_per_route(self, http, tmp_path, monkeypatch):
+        """Test that sampled requests of a route share a root frame in the rolling file"""
+        monkeypatch.setattr(Config, "PROFILE_EVERY_N", 2)
+        for item_id in range(4):
+            assert "X-Profile" not in http.get(f"/work/{item_id}").headers
+        assert profiler.rolling.requests == {"GET /work/{item_id}": 2}
+        stacks = read_folded(tmp_path / "rolling-1.folded")
+        assert stacks and all(stack.startswith("GET /work/{item_id};[event loop];") for stack in stacks)
+        assert sum(count for stack, count in stacks.items() if "busy_async_work" in stack) >= 10
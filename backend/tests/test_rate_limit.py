@@ -0,0 +1,103 @@
+import pytest
+import logging
+from fastapi import FastAPI, Depends
+from fastapi.testclient import TestClient
+
+from utils import rate_limit
+from utils.auth import create_jwt_token
+from utils.rate_limit import MemoryRateLimitBackend, RedisRateLimitBackend, RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMemoryBackend:
+    """Test the in-process GCRA limiter"""
+
+    @pytest.mark.asyncio
+    async def test_allows_burst_then_rejects(self, monkeypatch):
+        """Test that `times` requests pass and the next one gets a retry delay"""
+        clock = FakeClock()
+        monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+        backend = MemoryRateLimitBackend()
+
+        results = [await backend.hit("k", 5, 60) for _ in range(5)]
+        assert results == [0] * 5
+
+        retry_after = await backend.hit("k", 5, 60)
+        assert retry_after == pytest.approx(12.0)
+
+        # One emission interval later a single request is allowed again
+        clock.now += 12.0
+        assert await backend.hit("k", 5, 60) == 0
+        assert await backend.hit("k", 5, 60) > 0
+
+    @pytest.mark.asyncio
+    async def test_memory_is_bounded(self):
+        """Test that idle keys are evicted once max_keys is reached"""
+        backend = MemoryRateLimitBackend(max_keys=100)
+        for i in range(1000):
+            await backend.hit(f"ip:{i}", 10, 60)
+        assert len(backend._tats) == 100
+        assert "ip:999" in backend._tats
+        assert "ip:0" not in backend._tats
+
+    @pytest.mark.asyncio
+    async def test_redis_failure_falls_back_to_memory(self):
+        """Test that a Redis outage degrades to in-process limiting"""
+        import redis.asyncio as aioredis
+        client = aioredis.from_url("redis://127.0.0.1:1", socket_connect_timeout=0.1)
+        backend = RedisRateLimitBackend(client, fallback=MemoryRateLimitBackend())
+
+        assert await backend.hit("k", 1, 60) == 0
+        assert await backend.hit("k", 1, 60) > 0
+
+    @pytest.mark.asyncio
+    async def test_configure_without_redis_keeps_limiting(self, monkeypatch):
+        """Test that startup without Redis selects the in-process backend"""
+        monkeypatch.setattr(rate_limit.Config, "REDIS_URL", "redis://127.0.0.1:1")
+        monkeypatch.setattr(rate_limit.Config, "RATE_LIMIT_BACKEND", "redis")
+        selected = await rate_limit.configure_rate_limiting()
+        assert isinstance(selected, MemoryRateLimitBackend)
+
+
+class TestRateLimiterDependency:
+    """Test per-user and per-IP keys on a route"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        monkeypatch.setattr(rate_limit, "backend", MemoryRateLimitBackend())
+        app = FastAPI()
+
+        @app.post("/limited", dependencies=[Depends(RateLimiter(times=2, seconds=60, ip_times=3))])
+        async def limited():
+            return {"success": True}
+
+        return TestClient(app)
+
+    def test_user_limit_and_retry_after(self, client):
+        """Test that a user is limited independently of other users on the same IP"""
+        alice = {"Authorization": f"Bearer {create_jwt_token(1, 'alice@example.com')}"}
+        bob = {"Authorization": f"Bearer {create_jwt_token(2, 'bob@example.com')}"}
+
+        assert client.post("/limited", headers=alice).status_code == 200
+        assert client.post("/limited", headers=alice).status_code == 200
+        response = client.post("/limited", headers=alice)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+        # Bob has his own user budget but shares the IP budget (3 per window)
+        assert client.post("/limited", headers=bob).status_code == 200
+        assert client.post("/limited", headers=bob).status_code == 429
+
+    def test_anonymous_requests_limited_by_ip(self, client):
+        """Test that requests without a token are limited per IP"""
+        statuses = [client.post("/limited").status_code for _ in range(4)]
+        assert statuses == [200, 200, 200, 429]
@@ -0,0 +1,185 @@
+import pytest
+import io
+import os
+import logging
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db.session import get_db, Base
+from models.user import User
+from models.nft import NFT
+from models.transaction import Transaction, TransactionItem, PaymentMethod, TransactionStatus
+from routes import purchase as purchase_routes
+from utils.auth import get_current_user
+from utils.inventory import MemoryInventoryCache
+from utils.reconciliation import reconcile_statement, to_minor_units
+
+logger = logging.getLogger(__name__)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_reconciliation.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+REF_SINGLE = "11111111-1111-4111-8111-111111111111"
+REF_CART = "22222222-2222-4222-8222-222222222222"
+REF_SHORT = "33333333-3333-4333-8333-333333333333"
+REF_UNPAID = "44444444-4444-4444-8444-444444444444"
+
+
+@pytest.fixture
+def test_db():
+    """Create pending INR transactions: a single purchase, a cart, and two more"""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    db.add(User(id=1, name="Buyer", email="buyer@example.com", google_id="buyer"))
+    for i in range(1, 6):
+        db.add(NFT(id=i, title=f"NFT {i}", image_url="https://example.com/nft.png",
+                   price_inr=1000.0, price_usd=12.0, is_reserved=True))
+    db.add(Transaction(id=1, user_id=1, nft_id=1, payment_method=PaymentMethod.INR,
+                       status=TransactionStatus.PENDING, txn_ref=REF_SINGLE, amount="1000.0", currency="INR"))
+    db.add(Transaction(id=2, user_id=1, nft_id=None, payment_method=PaymentMethod.INR,
+                       status=TransactionStatus.PENDING, txn_ref=REF_CART, amount="2000.00", currency="INR",
+                       items=[TransactionItem(nft_id=2, amount="1000.0"), TransactionItem(nft_id=3, amount="1000.0")]))
+    db.add(Transaction(id=3, user_id=1, nft_id=4, payment_method=PaymentMethod.INR,
+                       status=TransactionStatus.PENDING, txn_ref=REF_SHORT, amount="1000.0", currency="INR"))
+    db.add(Transaction(id=4, user_id=1, nft_id=5, payment_method=PaymentMethod.INR,
+                       status=TransactionStatus.PENDING, txn_ref=REF_UNPAID, amount="1000.0", currency="INR"))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if os.path.exists("test_reconciliation.db"):
+            os.remove("test_reconciliation.db")
+
+
+STATEMENT = "\n".join([
+    "Date,Narration,Amount,Balance",
+    f"2024-01-01,UPI/CR/{REF_SINGLE}/buyer@okbank,\"1,000.00\",5000",
+    f"2024-01-01,{REF_CART},2000,7000",
+    f"2024-01-02,{REF_SHORT},999.00,7999",
+    f"2024-01-02,{REF_SINGLE},1000.00,8999",
+    "2024-01-03,SALARY CREDIT,50000,58999",
+    "2024-01-03,broken row",
+])
+
+
+class TestReconciliation:
+    """Test statement matching against pending INR transactions"""
+
+    def test_amount_parsing(self):
+        """Test that amounts are compared exactly in paise"""
+        assert to_minor_units("1,000.50") == 100050
+        assert to_minor_units("1000.0") == 100000
+        assert to_minor_units("abc") is None
+
+    def test_matches_and_mismatch_report(self, test_db):
+        """Test that matches are marked paid and everything else is reported"""
+        report = reconcile_statement(test_db, io.StringIO(STATEMENT), batch_size=1)
+
+        assert report.lines == 6
+        assert report.matched == 2
+        assert report.amount_mismatch_count == 1
+        assert report.amount_mismatches[0]["transaction_id"] == 3
+        assert report.amount_mismatches[0]["received"] == "999.00"
+        assert report.duplicate_count == 1
+        assert report.unmatched_count == 1
+        assert report.invalid_count == 1
+        assert report.unpaid_transaction_ids == [3, 4]
+        assert sorted(report.sold_nft_ids) == [1, 2, 3]
+
+        test_db.expire_all()
+        statuses = {t.id: t.status for t in test_db.query(Transaction).all()}
+        assert statuses == {
+            1: TransactionStatus.PAID,
+            2: TransactionStatus.PAID,
+            3: TransactionStatus.PENDING,
+            4: TransactionStatus.PENDING,
+        }
+        sold = {nft.id for nft in test_db.query(NFT).filter(NFT.is_sold == True).all()}
+        assert sold == {1, 2, 3}
+
+    def test_payments_for_lost_nfts_reported_late(self, test_db):
+        """Test that a payment never overwrites a sale or another buyer's reservation"""
+        # A second pending transaction for NFT 1 (the newer reservation), and NFT 4 sold elsewhere
+        ref_newer = "55555555-5555-4555-8555-555555555555"
+        test_db.add(Transaction(id=5, user_id=1, nft_id=1, payment_method=PaymentMethod.INR,
+                                status=TransactionStatus.PENDING, txn_ref=ref_newer, amount="1000.0", currency="INR"))
+        test_db.query(NFT).filter(NFT.id == 4).update({"is_sold": True, "is_reserved": False})
+        test_db.commit()
+
+        statement = f"reference,amount\n{REF_SINGLE},1000\n{ref_newer},1000\n{REF_SHORT},1000\n"
+        report = reconcile_statement(test_db, io.StringIO(statement))
+
+        assert report.matched == 3
+        assert sorted(report.late_payment_transaction_ids) == [1, 3]
+        assert report.sold_nft_ids == [1]
+        assert report.to_dict()["late_payment_count"] == 2
+
+        test_db.expire_all()
+        assert test_db.get(Transaction, 5).status == TransactionStatus.PAID
+        assert test_db.get(Transaction, 1).status == TransactionStatus.PENDING
+        assert test_db.get(Transaction, 3).status == TransactionStatus.PENDING
+        assert test_db.get(NFT, 4).sold_to_user_id is None
+
+    def test_dry_run_does_not_update(self, test_db):
+        """Test that a dry run reports matches without changing any rows"""
+        report = reconcile_statement(test_db, io.StringIO(STATEMENT), dry_run=True)
+
+        assert report.matched == 2
+        test_db.expire_all()
+        assert test_db.query(Transaction).filter(Transaction.status == TransactionStatus.PAID).count() == 0
+
+    def test_missing_columns_rejected(self, test_db):
+        """Test that a statement without an amount column is rejected"""
+        with pytest.raises(ValueError):
+            reconcile_statement(test_db, io.StringIO("Date,Narration\n2024-01-01,x\n"))
+
+
+class TestReconcileEndpoint:
+    """Test the admin statement upload endpoint"""
+
+    def make_client(self, monkeypatch, is_admin):
+        monkeypatch.setattr(purchase_routes, "inventory", MemoryInventoryCache())
+
+        def override_get_db():
+            db = TestingSessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app = FastAPI()
+        app.include_router(purchase_routes.router, prefix="/api")
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_current_user] = lambda: User(
+            id=1, name="Buyer", email="buyer@example.com", google_id="buyer", is_admin=is_admin
+        )
+        return TestClient(app)
+
+    def test_upload_reconciles(self, test_db, monkeypatch):
+        """Test that an admin upload confirms payments and updates the inventory cache"""
+        client = self.make_client(monkeypatch, is_admin=True)
+        response = client.post(
+            "/api/admin/reconcile-statement",
+            files={"statement": ("statement.csv", STATEMENT.encode(), "text/csv")}
+        )
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["matched"] == 2
+        assert data["matched_amount"] == "3000.00"
+        assert data["unpaid_count"] == 2
+
+    def test_upload_requires_admin(self, test_db, monkeypatch):
+        """Test that non-admins cannot reconcile statements"""
+        client = self.make_client(monkeypatch, is_admin=False)
+        response = client.post(
+            "/api/admin/reconcile-statement",
+            files={"statement": ("statement.csv", STATEMENT.encode(), "text/csv")}
+        )
+        assert response.status_code == 403
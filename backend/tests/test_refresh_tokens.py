@@ -0,0 +1,177 @@
+import pytest
+import os
+import logging
+from datetime import datetime, timedelta
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db.session import get_db, Base
+from models.user import User
+from models.nft import NFT  # noqa: F401 (resolves User relationships)
+from models.transaction import Transaction  # noqa: F401
+from models.auth_token import RefreshToken, RevokedToken
+from middleware.auth import AuthContextMiddleware
+from routes import auth as auth_routes
+from utils import auth, scheduler
+from utils.auth import create_jwt_token, token_cache
+from utils.refresh_tokens import REFRESH_TOKEN_COOKIE, hash_token, issue_refresh_token
+from utils.revocation import BloomFilter, RevocationFilter
+from utils.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_refresh_tokens.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+USER_ID = 1
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def test_db(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    db.add(User(id=USER_ID, name="Buyer", email="buyer@example.com", google_id="buyer"))
+    db.commit()
+    # Each test starts as a worker with an empty filter
+    revocations = RevocationFilter(capacity=1000)
+    monkeypatch.setattr(auth, "revocation_filter", revocations)
+    monkeypatch.setattr(auth_routes, "revocation_filter", revocations)
+    monkeypatch.setattr(scheduler, "revocation_filter", revocations)
+    monkeypatch.setattr(scheduler, "JobSessionLocal", TestingSessionLocal)
+    token_cache.clear()
+    user_cache.clear()
+    try:
+        yield db
+    finally:
+        db.close()
+        token_cache.clear()
+        user_cache.clear()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if os.path.exists("test_refresh_tokens.db"):
+            os.remove("test_refresh_tokens.db")
+
+
+@pytest.fixture
+def http(test_db):
+    app = FastAPI()
+    app.add_middleware(AuthContextMiddleware)
+    app.include_router(auth_routes.router, prefix="/auth")
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
+
+
+def login(db):
+    """Tokens as handed out by the OAuth callback"""
+    refresh_token, _ = issue_refresh_token(db, USER_ID)
+    db.commit()
+    return create_jwt_token(USER_ID, "buyer@example.com"), refresh_token
+
+
+def refresh_cookie(refresh_token):
+    """Headers carrying the refresh token cookie the way a browser sends it to /auth"""
+    return {"Cookie": f"{REFRESH_TOKEN_COOKIE}={refresh_token}"}
+
+
+class TestBloomFilter:
+    """Test the revocation Bloom filter"""
+
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        """Test that added jtis are always found and others rarely are"""
+        bloom = BloomFilter(capacity=10000, error_rate=1e-3)
+        for i in range(10000):
+            bloom.add(f"revoked-{i}")
+        assert all(f"revoked-{i}" in bloom for i in range(10000))
+        false_positives = sum(f"valid-{i}" in bloom for i in range(100000))
+        logger.info(f"✓ {false_positives} false positives in 100000 lookups")
+        assert false_positives < 300
+
+    def test_overlap_rereads_do_not_trigger_rebuild(self):
+        """Test that jtis merged again by every sync's overlap window are counted once"""
+        revocations = RevocationFilter(capacity=100)
+        now = datetime.utcnow()
+        revocations.rebuild([], now)
+        jtis = [f"revoked-{i}" for i in range(60)]
+        for minute in range(12):
+            revocations.merge(jtis, now + timedelta(minutes=minute))
+        assert revocations.to_dict()["entries"] == 60
+        assert not revocations.needs_rebuild(now + timedelta(minutes=5))
+
+
+class TestRefreshTokens:
+    """Test rotation and reuse detection of refresh tokens"""
+
+    def test_rotation(self, http, test_db):
+        """Test that a refresh returns working tokens and only the hash is stored"""
+        _, refresh_token = login(test_db)
+        assert test_db.query(RefreshToken).one().token_hash == hash_token(refresh_token)
+
+        response = http.post("/auth/refresh", headers=refresh_cookie(refresh_token))
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert "refresh_token" not in data
+        assert response.cookies[REFRESH_TOKEN_COOKIE] != refresh_token
+        set_cookie = response.headers["set-cookie"]
+        assert "HttpOnly" in set_cookie and "Path=/auth" in set_cookie and "Secure" in set_cookie
+        assert http.get("/auth/me", headers={"Authorization": f"Bearer {data['access_token']}"}).status_code == 200
+
+        test_db.expire_all()
+        old, new = test_db.query(RefreshToken).order_by(RefreshToken.id).all()
+        assert old.revoked_at is not None and old.replaced_by_id == new.id
+        assert old.family_id == new.family_id and new.revoked_at is None
+
+    def test_reuse_revokes_family(self, http, test_db):
+        """Test that presenting a rotated token again locks out its whole family"""
+        _, refresh_token = login(test_db)
+        successor = http.post("/auth/refresh", headers=refresh_cookie(refresh_token)).cookies[REFRESH_TOKEN_COOKIE]
+
+        response = http.post("/auth/refresh", headers=refresh_cookie(refresh_token))
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Refresh token reused"
+        assert http.post("/auth/refresh", headers=refresh_cookie(successor)).status_code == 401
+        assert http.post("/auth/refresh", headers=refresh_cookie("made-up")).status_code == 401
+        assert http.post("/auth/refresh").status_code == 401
+
+
+class TestLogout:
+    """Test server-side logout"""
+
+    @pytest.mark.asyncio
+    async def test_logout_revokes_tokens(self, http, test_db):
+        """Test that logout revokes the access token here and, after a sync, in other workers"""
+        access_token, refresh_token = login(test_db)
+        headers = {"Authorization": f"Bearer {access_token}"}
+        assert http.get("/auth/me", headers=headers).status_code == 200
+
+        response = http.post("/auth/logout", headers={**headers, **refresh_cookie(refresh_token)})
+        assert response.status_code == 200
+        assert f'{REFRESH_TOKEN_COOKIE}=""' in response.headers["set-cookie"]
+
+        response = http.get("/auth/me", headers=headers)
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Token has been revoked"
+        assert http.post("/auth/refresh", headers=refresh_cookie(refresh_token)).status_code == 401
+        jti = test_db.query(RevokedToken.jti).scalar()
+
+        # Another worker learns of it from revoked_tokens: full rebuild, then increments
+        other_worker = RevocationFilter(capacity=1000)
+        scheduler.revocation_filter = other_worker
+        assert await scheduler.sync_revoked_tokens() == 1
+        assert other_worker.is_revoked(jti)
+
+        second_access, _ = login(test_db)
+        http.post("/auth/logout", headers={"Authorization": f"Bearer {second_access}"})
+        assert await scheduler.sync_revoked_tokens() == 2  # Overlap window re-reads the first
+        assert len({jti for (jti,) in test_db.query(RevokedToken.jti)}) == 2
+        assert all(other_worker.is_revoked(jti) for (jti,) in test_db.query(RevokedToken.jti))
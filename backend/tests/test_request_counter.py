@@ -0,0 +1,88 @@
+import pytest
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from config import Config
+from middleware.logging import SecurityLoggingMiddleware
+from utils import request_counter
+from utils.request_counter import MemoryRequestCounter, RedisRequestCounter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMemoryRequestCounter:
+    """Test the bucketed sliding window and its LRU cap"""
+
+    @pytest.mark.asyncio
+    async def test_window_slides_by_bucket(self):
+        """Test that hits count for one window and then drop out bucket by bucket"""
+        clock = Clock()
+        counter = MemoryRequestCounter(window_seconds=60, buckets=6, clock=clock)
+        for _ in range(5):
+            assert await counter.hit("1.2.3.4") <= 5
+        clock.now += 30
+        assert await counter.hit("1.2.3.4") == 6
+        clock.now += 35  # First five are now more than a window old
+        assert await counter.hit("1.2.3.4") == 2
+        clock.now += 3600  # Idle for longer than a window
+        assert await counter.hit("1.2.3.4") == 1
+        assert await counter.hit("5.6.7.8") == 1
+
+    @pytest.mark.asyncio
+    async def test_tracked_keys_are_capped(self):
+        """Test that the least recently seen keys are evicted beyond max_keys"""
+        counter = MemoryRequestCounter(max_keys=100, clock=Clock())
+        for i in range(1000):
+            await counter.hit(f"10.0.{i // 256}.{i % 256}")
+        await counter.hit("10.0.3.231")  # Most recent key survives and keeps its count
+        assert len(counter) == 100
+        assert await counter.hit("10.0.3.231") == 3
+        assert await counter.hit("10.0.0.0") == 1
+
+
+class TestRedisRequestCounter:
+    """Test the Redis backend against an in-memory Redis"""
+
+    @pytest.mark.asyncio
+    async def test_counts_are_shared_and_bounded(self):
+        """Test that workers share counts and old buckets are deleted"""
+        fakeredis = pytest.importorskip("fakeredis")
+        client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        workers = [RedisRequestCounter(client, MemoryRequestCounter(window_seconds=60, buckets=12)) for _ in range(2)]
+        counts = [await workers[i % 2].hit("1.2.3.4") for i in range(10)]
+        assert counts == list(range(1, 11))
+        assert await client.ttl("reqcount:1.2.3.4") > 60
+        assert len(await client.hgetall("reqcount:1.2.3.4")) <= 2
+
+
+class TestSecurityLoggingMiddleware:
+    """Test that request floods are reported through the security logger"""
+
+    def test_violations_logged_once_per_limit(self, monkeypatch, caplog):
+        """Test that a client over the limit is reported once, then once per further limit"""
+        monkeypatch.setattr(Config, "SECURITY_REQUEST_LIMIT", 10)
+        monkeypatch.setattr(request_counter, "counter", MemoryRequestCounter())
+        app = FastAPI()
+        app.add_middleware(SecurityLoggingMiddleware)
+
+        @app.get("/ping")
+        def ping():
+            return {"ok": True}
+
+        http = TestClient(app)
+        with caplog.at_level(logging.WARNING, logger="security"):
+            for _ in range(35):
+                assert http.get("/ping").status_code == 200
+
+        violations = [record for record in caplog.records if record.name == "security"]
+        assert [record.requests for record in violations] == [11, 21, 31]
+        assert violations[0].event == "RATE_LIMIT_VIOLATION"
+        assert "Requests in last 60s: 11" in violations[0].getMessage()
@@ -0,0 +1,233 @@
+import pytest
+import asyncio
+import os
+import time
+import logging
+import httpx
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from db.session import Base
+from models.user import User
+from models.nft import NFT
+from models.transaction import Transaction, TransactionItem, PaymentMethod, TransactionStatus
+from utils import scheduler
+from utils.inventory import MemoryInventoryCache
+from utils.reservation_expiry import ReservationExpiryEngine
+
+logger = logging.getLogger(__name__)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_reservation_expiry.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@contextmanager
+def count_queries():
+    """Collect every SQL statement sent to the test database"""
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@pytest.fixture
+def test_db(monkeypatch):
+    """Create NFTs 1-10 reserved an hour ago, 11 reserved just now and 12 sold"""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    stale = datetime.utcnow() - timedelta(hours=1)
+    db.add(User(id=1, name="Buyer", email="buyer@example.com", google_id="buyer"))
+    for i in range(1, 13):
+        db.add(NFT(
+            id=i,
+            title=f"NFT {i}",
+            image_url="https://example.com/nft.png",
+            price_inr=1000.0,
+            price_usd=12.0,
+            is_reserved=i != 12,
+            is_sold=i == 12,
+            reserved_at=datetime.utcnow() if i == 11 else stale
+        ))
+    for i in range(1, 9):
+        db.add(Transaction(id=i, user_id=1, nft_id=i, payment_method=PaymentMethod.INR,
+                           status=TransactionStatus.PENDING, txn_ref=f"ref-{i}", amount=1000, currency="INR"))
+    # Cart holding NFTs 9 and 10
+    db.add(Transaction(id=9, user_id=1, nft_id=None, payment_method=PaymentMethod.USD,
+                       status=TransactionStatus.PENDING, txn_ref="ref-cart", amount=24, currency="USD",
+                       items=[TransactionItem(nft_id=9, amount=12), TransactionItem(nft_id=10, amount=12)]))
+    # Reservation still fresh
+    db.add(Transaction(id=10, user_id=1, nft_id=11, payment_method=PaymentMethod.INR,
+                       status=TransactionStatus.PENDING, txn_ref="ref-11", amount=1000, currency="INR"))
+    db.commit()
+
+    monkeypatch.setattr(scheduler, "JobSessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(scheduler, "inventory", MemoryInventoryCache())
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if os.path.exists("test_reservation_expiry.db"):
+            os.remove("test_reservation_expiry.db")
+
+
+class TestReservationExpiry:
+    """Test the set-based expiry sweep"""
+
+    @pytest.mark.asyncio
+    async def test_expires_stale_reservations_only(self, test_db):
+        """Test that stale reservations are released and their transactions expired"""
+        await scheduler.check_expired_reservations(batch_size=4)
+
+        test_db.expire_all()
+        reserved = {nft.id for nft in test_db.query(NFT).filter(NFT.is_reserved == True).all()}
+        assert reserved == {11}
+        assert test_db.get(NFT, 12).is_sold
+
+        statuses = {t.id: t.status for t in test_db.query(Transaction).all()}
+        assert all(statuses[i] == TransactionStatus.EXPIRED for i in range(1, 10))
+        assert statuses[10] == TransactionStatus.PENDING
+
+        assert await scheduler.inventory.is_unavailable(1) is False
+
+    @pytest.mark.asyncio
+    async def test_statements_per_chunk_not_per_row(self, test_db):
+        """Test that the sweep issues two statements per chunk regardless of row count"""
+        with count_queries() as statements:
+            await scheduler.check_expired_reservations(batch_size=4)
+
+        updates = [s for s in statements if s.lstrip().upper().startswith("UPDATE")]
+        # Chunks of 4, 4 and 2 stale NFTs: one NFT and one transaction UPDATE each
+        assert len(updates) == 6
+        assert not any(s.lstrip().upper().startswith("SELECT") for s in statements)
+
+
+class TestReservationExpiryEngine:
+    """Test the in-memory expiry timers"""
+
+    def test_due_timers_pop_in_deadline_order(self):
+        """Test that arming, re-arming and cancelling keep only the latest deadline"""
+        engine = ReservationExpiryEngine(ttl_seconds=60)
+        base = datetime(2024, 1, 1, 12, 0, 0)
+        engine.arm(1, base + timedelta(seconds=3))
+        engine.arm(2, base + timedelta(seconds=1, microseconds=200))
+        engine.arm(3, base + timedelta(seconds=1, microseconds=900))
+        engine.arm(4, base)
+        engine.arm(4, base + timedelta(seconds=10))
+        engine.cancel(1)
+
+        start = engine.deadline_for(base)
+        assert engine.pop_due(start) == []
+        # 2 and 3 fall within the same second and fire together
+        assert engine.pop_due(start + 2) == [2, 3]
+        assert engine.pop_due(start + 5) == []
+        assert engine.next_deadline() == start + 10
+        assert engine.pop_due(start + 10) == [4]
+        assert len(engine) == 0 and engine.next_deadline() is None
+
+    @pytest.mark.asyncio
+    async def test_rebuilds_from_reserved_at_and_releases(self, test_db):
+        """Test that the engine reloads active reservations and releases the stale ones"""
+        engine = ReservationExpiryEngine(ttl_seconds=30 * 60)
+        engine.start(release=scheduler.release_due_reservations, load=scheduler.load_active_reservations)
+        try:
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if len(engine) == 1 and 11 in engine:
+                    break
+        finally:
+            engine.stop()
+
+        assert 11 in engine and len(engine) == 1
+        test_db.expire_all()
+        reserved = {nft.id for nft in test_db.query(NFT).filter(NFT.is_reserved == True).all()}
+        assert reserved == {11}
+        assert test_db.get(Transaction, 9).status == TransactionStatus.EXPIRED
+
+    @pytest.mark.asyncio
+    async def test_release_rechecks_reservation(self, test_db):
+        """Test that a fired timer leaves fresh reservations and sold NFTs alone"""
+        released = await scheduler.release_due_reservations([1, 11, 12])
+
+        assert released == [1]
+        test_db.expire_all()
+        assert test_db.get(NFT, 11).is_reserved is True
+        assert test_db.get(Transaction, 10).status == TransactionStatus.PENDING
+
+
+class TestSweepDoesNotBlock:
+    """Test that the expiry sweep leaves the event loop free for requests"""
+
+    STALE = 20000
+
+    @pytest.fixture
+    def large_db(self, monkeypatch):
+        """Create STALE reservations, each with a pending transaction"""
+        Base.metadata.create_all(bind=engine)
+        db = TestingSessionLocal()
+        stale = datetime.utcnow() - timedelta(hours=1)
+        db.add(User(id=1, name="Buyer", email="buyer@example.com", google_id="buyer"))
+        db.execute(insert(NFT), [
+            {"id": i, "title": f"NFT {i}", "image_url": "https://example.com/nft.png", "price_inr": 1000.0,
+             "price_usd": 12.0, "is_reserved": True, "reserved_at": stale}
+            for i in range(1, self.STALE + 1)
+        ])
+        db.execute(insert(Transaction), [
+            {"id": i, "user_id": 1, "nft_id": i, "payment_method": PaymentMethod.INR,
+             "status": TransactionStatus.PENDING, "txn_ref": f"ref-{i}", "amount": 1000, "currency": "INR"}
+            for i in range(1, self.STALE + 1)
+        ])
+        db.commit()
+        db.execute(text("ANALYZE"))
+        db.commit()
+
+        monkeypatch.setattr(scheduler, "JobSessionLocal", TestingSessionLocal)
+        monkeypatch.setattr(scheduler, "inventory", MemoryInventoryCache())
+        try:
+            yield db
+        finally:
+            db.close()
+            Base.metadata.drop_all(bind=engine)
+            engine.dispose()
+            if os.path.exists("test_reservation_expiry.db"):
+                os.remove("test_reservation_expiry.db")
+
+    @pytest.mark.asyncio
+    async def test_api_latency_during_sweep(self, large_db):
+        """Test that requests are served promptly while a large sweep runs"""
+        app = FastAPI()
+
+        @app.get("/health")
+        async def health():
+            return {"status": "healthy"}
+
+        latencies = []
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            sweep = asyncio.create_task(scheduler.check_expired_reservations(batch_size=5000))
+            start = time.perf_counter()
+            while not sweep.done():
+                # A request every 5ms; time spent beyond that is time the loop was blocked
+                request_start = time.perf_counter()
+                await asyncio.sleep(0.005)
+                response = await client.get("/health")
+                latencies.append(time.perf_counter() - request_start - 0.005)
+                assert response.status_code == 200
+            sweep_seconds = time.perf_counter() - start
+            released = await sweep
+
+        assert released == self.STALE
+        logger.info(f"Sweep took {sweep_seconds:.2f}s; {len(latencies)} requests, max latency {max(latencies) * 1000:.1f}ms")
+        # Requests keep flowing throughout, none waiting on a whole chunk
+        assert len(latencies) > 20
+        assert max(latencies) < sweep_seconds / 4
@@ -0,0 +1,210 @@
+import pytest
+import httpx
+import io
+import os
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from db.session import get_db, Base
+from models.user import User
+from models.nft import NFT
+from models.transaction import Transaction, TransactionItem, PaymentMethod, TransactionStatus, to_amount
+from models.sales_rollup import DailySalesRollup
+from routes import nft as nft_routes
+from routes import purchase as purchase_routes
+from utils.auth import get_current_user
+from utils.inventory import MemoryInventoryCache
+from utils.reconciliation import reconcile_statement
+from utils.sales_rollup import record_paid_transactions
+
+logger = logging.getLogger(__name__)
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_sales_rollup.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Routes in routes/nft.py run on an AsyncSession over the same file
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_sales_rollup.db", poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+CONTRACT = "0x1234567890123456789012345678901234567890"
+PAID_AT = datetime(2024, 3, 1, 12, 0)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as session:
+        yield session
+
+
+@contextmanager
+def count_queries():
+    """Collect every SQL statement sent to the test database"""
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+class VerifiedPayPalClient:
+    """Stand-in for httpx.AsyncClient accepting every webhook signature"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def post(self, url, **kwargs):
+        return httpx.Response(200, json={"verification_status": "SUCCESS"})
+
+
+@pytest.fixture
+def test_db():
+    """Create NFTs on two contracts (and one without) reserved by pending transactions"""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    db.add(User(id=1, name="Admin", email="admin@example.com", google_id="admin", is_admin=True))
+    # Reserved for the pending transactions below
+    reserved = dict(is_reserved=True, reserved_at=datetime.utcnow())
+    db.add(NFT(id=1, title="A", image_url="x", price_inr=1000.10, price_usd=12.0, contract_address=CONTRACT, **reserved))
+    db.add(NFT(id=2, title="B", image_url="x", price_inr=2000.20, price_usd=24.0, contract_address=CONTRACT, **reserved))
+    db.add(NFT(id=3, title="C", image_url="x", price_inr=3000.30, price_usd=36.0, **reserved))
+    db.add(Transaction(id=1, user_id=1, nft_id=1, payment_method=PaymentMethod.INR, txn_ref="ref-1",
+                       status=TransactionStatus.PENDING, amount=to_amount(1000.10), currency="INR"))
+    db.add(Transaction(id=2, user_id=1, nft_id=None, payment_method=PaymentMethod.INR, txn_ref="ref-2",
+                       status=TransactionStatus.PENDING, amount=to_amount(5000.50), currency="INR",
+                       items=[TransactionItem(nft_id=2, amount=to_amount(2000.20)),
+                              TransactionItem(nft_id=3, amount=to_amount(3000.30))]))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if os.path.exists("test_sales_rollup.db"):
+            os.remove("test_sales_rollup.db")
+
+
+class TestSalesRollup:
+    """Test incremental maintenance of daily_sales_rollup"""
+
+    def test_amounts_are_exact(self, test_db):
+        """Test that amounts round-trip as exact decimals"""
+        transaction = test_db.get(Transaction, 2)
+        assert transaction.amount == Decimal("5000.50")
+        assert sum(item.amount for item in transaction.items) == transaction.amount
+        assert transaction.to_public_dict()["amount"] == "5000.50"
+
+    def test_paid_transactions_accumulate(self, test_db):
+        """Test that single and cart transactions are added per currency and contract"""
+        record_paid_transactions(test_db, [1], PAID_AT)
+        record_paid_transactions(test_db, [2], PAID_AT)
+        test_db.commit()
+
+        rows = {row.contract_address: row for row in test_db.query(DailySalesRollup).all()}
+        assert set(rows) == {CONTRACT, ""}
+        assert rows[CONTRACT].sale_count == 2
+        assert rows[CONTRACT].gross_amount == Decimal("3000.30")
+        assert rows[""].sale_count == 1
+        assert rows[""].gross_amount == Decimal("3000.30")
+        assert all(row.day == PAID_AT.date() and row.currency == "INR" for row in rows.values())
+
+    def test_reconciliation_rolls_up_once(self, test_db):
+        """Test that statement reconciliation rolls up each payment exactly once"""
+        statement = "reference,amount\nref-1,1000.10\nref-1,1000.10\nref-2,5000.50\n"
+        reconcile_statement(test_db, io.StringIO(statement))
+        reconcile_statement(test_db, io.StringIO(statement))
+
+        total = sum(row.sale_count for row in test_db.query(DailySalesRollup).all())
+        assert total == 3
+
+
+class TestSalesAnalyticsEndpoint:
+    """Test the admin analytics endpoint"""
+
+    @pytest.fixture
+    def client(self, test_db, monkeypatch):
+        monkeypatch.setattr(purchase_routes, "inventory", MemoryInventoryCache())
+        app = FastAPI()
+        app.include_router(purchase_routes.router, prefix="/api")
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_current_user] = lambda: User(
+            id=1, name="Admin", email="admin@example.com", google_id="admin", is_admin=True
+        )
+        return TestClient(app)
+
+    def test_verification_feeds_analytics(self, client):
+        """Test that an admin-verified payment shows up in GMV, count and average"""
+        assert client.post("/api/admin/verify-transaction/2").status_code == 200
+
+        response = client.get("/api/admin/analytics/sales", params={"group_by": "currency"})
+        assert response.status_code == 200
+        assert response.json()["data"]["rows"] == [
+            {"currency": "INR", "sale_count": 2, "gmv": "5000.50", "average_sale": "2500.25"}
+        ]
+
+    def test_reads_only_the_rollup(self, client, test_db):
+        """Test that analytics never touch the transactions table"""
+        record_paid_transactions(test_db, [1, 2], PAID_AT)
+        test_db.commit()
+
+        with count_queries() as statements:
+            response = client.get("/api/admin/analytics/sales", params={"date_from": "2024-03-01"})
+
+        rows = response.json()["data"]["rows"]
+        assert {(row["day"], row["contract"]) for row in rows} == {("2024-03-01", CONTRACT), ("2024-03-01", None)}
+        assert statements and all("transactions" not in statement for statement in statements)
+
+    def test_retried_webhook_rolls_up_once(self, client, monkeypatch):
+        """Test that a PayPal webhook delivered twice counts the sale once"""
+        monkeypatch.setattr(httpx, "AsyncClient", VerifiedPayPalClient)
+        event = {"event_type": "PAYMENT.SALE.COMPLETED", "resource": {"custom": "ref-1", "amount": {"currency": "INR"}}}
+        for _ in range(2):
+            assert client.post("/api/payment/paypal-webhook", json=event).status_code == 200
+
+        response = client.get("/api/admin/analytics/sales", params={"group_by": "currency"})
+        assert response.json()["data"]["rows"][0]["sale_count"] == 1
+
+    def test_buyer_completion_not_rolled_up(self, client):
+        """Test that a buyer completing their own transaction claims it once and adds no revenue"""
+        client.app.include_router(nft_routes.router, prefix="/api")
+        client.app.dependency_overrides[get_db] = override_get_async_db
+        client.app.dependency_overrides[nft_routes.get_current_user] = lambda: User(
+            id=1, name="Admin", email="admin@example.com", google_id="admin", is_admin=True
+        )
+        assert client.post("/api/transactions/1/complete", params={"txn_ref": "gw-1"}).status_code == 200
+        assert client.post("/api/transactions/1/complete", params={"txn_ref": "gw-1"}).status_code == 400
+
+        client.app.dependency_overrides[get_db] = override_get_db
+        response = client.get("/api/admin/analytics/sales", params={"group_by": "currency"})
+        assert response.json()["data"]["rows"] == []
+
+    def test_mixed_currency_totals_rejected(self, client):
+        """Test that GMV is never summed across currencies"""
+        response = client.get("/api/admin/analytics/sales", params={"group_by": "day"})
+        assert response.status_code == 400
@@ -0,0 +1,79 @@
+import pytest
+import logging
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from config import Config
+from middleware.logging import SecurityLoggingMiddleware
+from utils import suspicious
+from utils.suspicious import PatternMatcher, SUSPICIOUS_PATTERNS
+
+
+class TestPatternMatcher:
+    """Test the precompiled suspicious-pattern matcher"""
+
+    def test_subsumed_patterns_are_dropped(self):
+        """Test that patterns containing another pattern are not searched separately"""
+        matcher = PatternMatcher(SUSPICIOUS_PATTERNS)
+        assert "script" in matcher.patterns
+        assert "<script" not in matcher.patterns and "javascript:" not in matcher.patterns
+        assert matcher.search("/x?next=javascript:alert(1)") == "script"
+        assert matcher.search("/api/nfts?sort=price&page=2") is None
+
+    def test_scan_reports_location_and_counts_hits(self):
+        """Test that one scan covers every part and attributes the hit to the right one"""
+        matcher = PatternMatcher(["union select", "../"])
+        assert matcher.scan([("url", "/api/nfts"), ("header", "Mozilla/5.0")]) is None
+        assert matcher.scan([("url", "/api/nfts"), ("header", "x' UNION SELECT 1")]) == ("union select", "header")
+        # No match across the boundary of two parts
+        assert matcher.scan([("url", "/a/.."), ("header", "/b")]) is None
+        assert matcher.to_dict()["hits"] == {"union select": 1}
+        assert matcher.to_dict()["locations"] == {"header": 1}
+        assert matcher.scanned == 3
+
+
+class TestSuspiciousRequestLogging:
+    """Test that SecurityLoggingMiddleware reports signatures in URLs, headers and bodies"""
+
+    @pytest.fixture
+    def http(self, monkeypatch):
+        monkeypatch.setattr(suspicious, "matcher", PatternMatcher(SUSPICIOUS_PATTERNS))
+        app = FastAPI()
+        app.add_middleware(SecurityLoggingMiddleware)
+
+        @app.get("/nfts")
+        def nfts():
+            return {"ok": True}
+
+        @app.post("/echo")
+        async def echo(request: Request):
+            return {"length": len(await request.body())}
+
+        return TestClient(app)
+
+    def reports(self, caplog):
+        return [
+            (record.pattern, record.location) for record in caplog.records
+            if getattr(record, "event", None) == "SUSPICIOUS_REQUEST"
+        ]
+
+    def test_encoded_query_is_decoded_before_matching(self, http, caplog):
+        """Test that percent- and plus-encoded signatures in the query are found"""
+        with caplog.at_level(logging.WARNING, logger="app_middleware"):
+            http.get("/nfts?q=1%27%20UNION+SELECT+password")
+            http.get("/nfts?q=art")
+        assert self.reports(caplog) == [("union select", "url")]
+        assert suspicious.matcher.to_dict()["scanned"] == 2
+
+    def test_headers_and_body_prefix_are_opt_in(self, http, caplog, monkeypatch):
+        """Test that headers (but not credentials) and the start of bodies are scanned when enabled"""
+        with caplog.at_level(logging.WARNING, logger="app_middleware"):
+            http.get("/nfts", headers={"Referer": "http://x/../etc/passwd"})
+            monkeypatch.setattr(Config, "SECURITY_SCAN_HEADERS", True)
+            monkeypatch.setattr(Config, "SECURITY_SCAN_BODY_BYTES", 64)
+            http.get("/nfts", headers={"Referer": "http://x/../etc/passwd"})
+            http.get("/nfts", headers={"Cookie": "session=<script>"})
+            assert http.post("/echo", content=b"name=" + b"a" * 100 + b"<script>").json() == {"length": 113}
+            assert http.post("/echo", content=b"bio=<script>alert(1)</script>").status_code == 200
+        assert self.reports(caplog) == [("../", "header"), ("script", "body")]
@@ -0,0 +1,150 @@
+import pytest
+import os
+import time
+import logging
+from contextlib import contextmanager
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from db.session import get_db, Base
+from models.user import User
+from routes import nft as nft_routes
+from routes import purchase as purchase_routes
+from routes.auth import create_jwt_token
+from utils.user_cache import UserCache, UserSnapshot, user_cache
+
+logger = logging.getLogger(__name__)
+
+# routes/nft.py authenticates through routes.auth on an AsyncSession,
+# routes/purchase.py through utils.auth on a sync Session
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_user_cache.db"
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test_user_cache.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+USER_ID = 1
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as session:
+        yield session
+
+
+@contextmanager
+def count_user_queries():
+    """Collect every SQL statement reading the users table, on either engine"""
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for target in (engine, async_engine.sync_engine):
+            event.remove(target, "before_cursor_execute", _before_cursor_execute)
+
+
+@pytest.fixture
+def test_db():
+    Base.metadata.create_all(bind=engine)
+    user_cache.clear()
+    db = TestingSessionLocal()
+    db.add(User(id=USER_ID, name="Buyer", email="buyer@example.com", google_id="buyer"))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        user_cache.clear()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if os.path.exists("test_user_cache.db"):
+            os.remove("test_user_cache.db")
+
+
+@pytest.fixture
+def http(test_db):
+    app = FastAPI()
+    app.include_router(nft_routes.router, prefix="/api")
+    app.include_router(purchase_routes.router, prefix="/api")
+    return TestClient(app)
+
+
+def auth_headers():
+    return {"Authorization": f"Bearer {create_jwt_token(USER_ID, 'buyer@example.com')}"}
+
+
+class TestUserCache:
+    """Test the bounded TTL cache of user snapshots"""
+
+    def test_ttl_and_lru_bounds(self):
+        """Test that entries expire after the TTL and the least recently used entry is evicted"""
+        cache = UserCache(max_entries=2, ttl_seconds=0.05)
+        for user_id in (1, 2):
+            cache.put(User(id=user_id, name="U", email=f"{user_id}@example.com", google_id=str(user_id)))
+        assert isinstance(cache.get(1), UserSnapshot)
+
+        cache.put(User(id=3, name="U", email="3@example.com", google_id="3"))
+        assert cache.get(2) is None
+        assert cache.get(1).email == "1@example.com"
+
+        time.sleep(0.06)
+        assert cache.get(1) is None and len(cache) == 1
+
+    def test_repeat_requests_skip_user_query(self, http, test_db):
+        """Test that only the first authenticated request loads the user, on both auth paths"""
+        http.app.dependency_overrides[get_db] = override_get_async_db
+        with count_user_queries() as first:
+            assert http.get("/api/my-transactions", headers=auth_headers()).status_code == 200
+        with count_user_queries() as repeat:
+            assert http.get("/api/my-transactions", headers=auth_headers()).status_code == 200
+        assert len(first) == 1
+        assert repeat == []
+
+        # utils.auth shares the cache, so the sync routes skip the query as well
+        http.app.dependency_overrides[get_db] = override_get_db
+        with count_user_queries() as sync_repeat:
+            assert http.get("/api/admin/transactions", headers=auth_headers()).status_code == 403
+        assert sync_repeat == []
+        logger.info(f"✓ cache stats {user_cache.to_dict()}")
+
+    def test_admin_flag_change_invalidates(self, http, test_db):
+        """Test that committing a change of the admin flag takes effect on the next request"""
+        http.app.dependency_overrides[get_db] = override_get_db
+        assert http.get("/api/admin/transactions", headers=auth_headers()).status_code == 403
+
+        test_db.get(User, USER_ID).is_admin = True
+        test_db.flush()
+        # Not dropped before the change is committed
+        assert user_cache.get(USER_ID) is not None
+        test_db.commit()
+        assert user_cache.get(USER_ID) is None
+
+        assert http.get("/api/admin/transactions", headers=auth_headers()).status_code == 200
+        assert user_cache.get(USER_ID).is_admin is True
+
+    def test_deleted_user_rejected(self, http, test_db):
+        """Test that a deleted user stops authenticating"""
+        http.app.dependency_overrides[get_db] = override_get_async_db
+        assert http.get("/api/my-transactions", headers=auth_headers()).status_code == 200
+        test_db.delete(test_db.get(User, USER_ID))
+        test_db.commit()
+        assert http.get("/api/my-transactions", headers=auth_headers()).status_code == 401
@@ -0,0 +1,172 @@
+import pytest
+import asyncio
+import logging
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from db.session import get_db
+from routes import purchase as purchase_routes
+from utils.auth import create_jwt_token
+from utils.waiting_room import MemoryWaitingRoom, RedisWaitingRoom, parse_nft_ids
+
+logger = logging.getLogger(__name__)
+
+DROP_NFT_ID = 42
+
+
+def make_room(**overrides):
+    settings = {"admission_ttl": 30, "eta_per_ticket": 2.0, "grace": 15}
+    settings.update(overrides)
+    return MemoryWaitingRoom(**settings)
+
+
+class TestMemoryWaitingRoom:
+    """Test FIFO ticketing and head-only admission"""
+
+    @pytest.mark.asyncio
+    async def test_fifo_positions_and_single_admission(self):
+        """Test that tickets are FIFO and only the head is admitted"""
+        room = make_room()
+        first = await room.join(DROP_NFT_ID, "user-1")
+        second = await room.join(DROP_NFT_ID, "user-2")
+        third = await room.join(DROP_NFT_ID, "user-3")
+
+        assert (first.position, first.admitted) == (0, True)
+        assert (second.position, second.admitted) == (1, False)
+        assert (third.position, third.admitted) == (2, False)
+        assert third.eta_seconds == 4.0
+
+        # Polling again keeps the same ticket and does not double-admit the head
+        assert (await room.join(DROP_NFT_ID, "user-2")).ticket == second.ticket
+        assert (await room.join(DROP_NFT_ID, "user-1")).admitted is False
+
+    @pytest.mark.asyncio
+    async def test_leave_admits_next_in_line(self):
+        """Test that the next ticket is admitted once the head finishes"""
+        room = make_room()
+        await room.join(DROP_NFT_ID, "user-1")
+        await room.join(DROP_NFT_ID, "user-2")
+
+        await room.leave(DROP_NFT_ID, "user-1")
+        status = await room.join(DROP_NFT_ID, "user-2")
+        assert (status.position, status.admitted) == (0, True)
+
+    @pytest.mark.asyncio
+    async def test_close_turns_away_queue_until_reopened(self):
+        """Test that a closed drop rejects everyone until reopened"""
+        room = make_room()
+        await room.enable(DROP_NFT_ID)
+        await room.join(DROP_NFT_ID, "user-1")
+        await room.join(DROP_NFT_ID, "user-2")
+
+        await room.close(DROP_NFT_ID)
+        assert (await room.join(DROP_NFT_ID, "user-2")).closed is True
+
+        await room.reopen(DROP_NFT_ID)
+        status = await room.join(DROP_NFT_ID, "user-2")
+        assert status.closed is False
+        assert status.admitted is True
+
+    @pytest.mark.asyncio
+    async def test_close_lapses_with_reservation(self):
+        """Test that a drop closed until the reservation lapses reopens without a sweep"""
+        room = make_room()
+        await room.close(DROP_NFT_ID, until=time.time() + 60)
+        assert (await room.join(DROP_NFT_ID, "user-1")).closed is True
+
+        await room.close(DROP_NFT_ID, until=time.time() - 1)
+        assert (await room.join(DROP_NFT_ID, "user-1")).admitted is True
+        assert (await room.stats(DROP_NFT_ID))["closed"] is False
+
+    @pytest.mark.asyncio
+    async def test_redis_close_lapses_with_reservation(self):
+        """Test that the Redis closed flag expires when the reservation lapses"""
+        fakeredis = pytest.importorskip("fakeredis")
+        room = RedisWaitingRoom(fakeredis.aioredis.FakeRedis(decode_responses=True),
+                                admission_ttl=30, eta_per_ticket=2.0, grace=15)
+        await room.close(DROP_NFT_ID, until=time.time() + 60)
+        assert (await room.join(DROP_NFT_ID, "user-1")).closed is True
+
+        await room.close(DROP_NFT_ID, until=time.time() + 0.05)
+        await asyncio.sleep(0.1)
+        assert (await room.join(DROP_NFT_ID, "user-1")).admitted is True
+
+    @pytest.mark.asyncio
+    async def test_redis_disable_applies_to_every_worker(self):
+        """Test that disabling a configured drop in one worker disables it in the others"""
+        fakeredis = pytest.importorskip("fakeredis")
+        client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        workers = [
+            RedisWaitingRoom(client, admission_ttl=30, eta_per_ticket=2.0, grace=15, initial_nft_ids=[DROP_NFT_ID])
+            for _ in range(2)
+        ]
+        await workers[0].disable(DROP_NFT_ID)
+        assert [await worker.is_active(DROP_NFT_ID) for worker in workers] == [False, False]
+
+        await workers[1].enable(DROP_NFT_ID)
+        assert [await worker.is_active(DROP_NFT_ID) for worker in workers] == [True, True]
+
+    @pytest.mark.asyncio
+    async def test_abandoned_tickets_do_not_block_queue(self):
+        """Test that expired tickets and timed-out admissions are skipped"""
+        room = make_room(admission_ttl=0, eta_per_ticket=0, grace=0)
+        await room.join(DROP_NFT_ID, "user-1")  # admitted, then never finishes
+        await room.join(DROP_NFT_ID, "user-2")  # never polls again
+
+        status = await room.join(DROP_NFT_ID, "user-3")
+        assert (status.position, status.admitted) == (0, True)
+
+    def test_parse_nft_ids(self):
+        """Test parsing of DROP_MODE_NFT_IDS"""
+        assert parse_nft_ids("") == set()
+        assert parse_nft_ids("1, 2,3,") == {1, 2, 3}
+
+
+class TestDropAdmissionDependency:
+    """Test the purchase routes answer queued buyers without the database"""
+
+    @pytest.fixture
+    def drop_client(self, monkeypatch):
+        room = make_room()
+        asyncio.run(room.enable(DROP_NFT_ID))
+        monkeypatch.setattr(purchase_routes, "waiting_room", room)
+        monkeypatch.setattr(purchase_routes.Config, "DROP_MODE_ENABLED", True)
+
+        def fail_get_db():
+            raise AssertionError("queued buyers must not reach the database")
+
+        app = FastAPI()
+        app.include_router(purchase_routes.router, prefix="/api")
+        app.dependency_overrides[get_db] = fail_get_db
+        return TestClient(app), room
+
+    def test_queued_buyer_gets_position_without_db(self, drop_client):
+        """Test that a buyer behind the head gets a 202 with position and ETA"""
+        client, room = drop_client
+        asyncio.run(room.join(DROP_NFT_ID, "1"))  # user 1 holds the head
+
+        token = create_jwt_token(2, "buyer2@example.com")
+        response = client.post(
+            f"/api/purchase/inr/{DROP_NFT_ID}",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+
+        assert response.status_code == 202
+        data = response.json()["detail"]["data"]
+        assert data["position"] == 1
+        assert data["admitted"] is False
+        assert response.headers["Retry-After"] == "2"
+
+    def test_closed_drop_rejected_without_db(self, drop_client):
+        """Test that buyers of a closed drop are rejected without the database"""
+        client, room = drop_client
+        asyncio.run(room.close(DROP_NFT_ID))
+
+        token = create_jwt_token(3, "buyer3@example.com")
+        response = client.post(
+            f"/api/purchase/usd/{DROP_NFT_ID}",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+
+        assert response.status_code == 400
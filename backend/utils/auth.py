@@ -1,13 +1,22 @@
-from fastapi import HTTPException, Depends, status
+from fastapi import HTTPException, Depends, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 import jwt
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
 import logging
 
 from config import Config
 from db.session import get_db
 from models.user import User
+from utils.jwt_keys import ASYMMETRIC_ALGORITHMS, key_store
+from utils.revocation import revocation_filter
+from utils.user_cache import UserSnapshot, user_cache
 
 logger = logging.getLogger(__name__)
 
@@ -15,45 +24,190 @@ logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
 def create_jwt_token(user_id: int, email: str) -> str:
-    """Create JWT token for user authentication"""
+    """Create a short-lived access token (renewed through /auth/refresh)"""
     
+    now = datetime.utcnow()
     payload = {
         "user_id": user_id,
         "email": email,
-        "exp": datetime.utcnow() + timedelta(days=7),  # Token expires in 7 days
-        "iat": datetime.utcnow()
+        "jti": uuid.uuid4().hex,  # Identifies the token for revocation
+        "exp": now + timedelta(minutes=Config.ACCESS_TOKEN_MINUTES),
+        "iat": now,
+        "iss": "nft-marketplace"
     }
     
-    token = jwt.encode(payload, Config.JWT_SECRET, algorithm="HS256")
-    return token
+    return encode_jwt(payload)
+
+def encode_jwt(payload: dict) -> str:
+    """Sign claims with the configured algorithm (ES256/EdDSA with a kid header, or legacy HS256)"""
+    
+    if Config.JWT_ALGORITHM in ASYMMETRIC_ALGORITHMS:
+        key = key_store.signing_key()
+        return jwt.encode(payload, key.private_key, algorithm=key.algorithm, headers={"kid": key.kid})
+    return jwt.encode(payload, Config.JWT_SECRET, algorithm="HS256")
+
+def _decode_jwt(token: str) -> dict:
+    """Verify a token's signature and expiry with the key named by its kid"""
+    
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is not None:
+        key = key_store.verification_key(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key {kid}")
+        # The algorithm comes from our key, never from the token header
+        return jwt.decode(token, key.public_key, algorithms=[key.algorithm])
+    if Config.JWT_ALGORITHM == "HS256" or Config.JWT_ACCEPT_HS256:
+        return jwt.decode(token, Config.JWT_SECRET, algorithms=["HS256"])
+    raise jwt.InvalidTokenError("HS256 tokens are no longer accepted")
+
+class VerifiedTokenCache:
+    """
+    LRU of recently verified tokens, keyed by their SHA-256 digest
+    
+    Each entry holds the token's claims until its exp, so a client repeating
+    the same bearer token skips signature verification and claim parsing.
+    Only successfully verified tokens are cached, and tokens without an exp
+    are never cached.
+    """
+    
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+    
+    def get(self, token: str) -> Optional[dict]:
+        """Claims of a token verified earlier, or None if unknown or expired"""
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+    
+    def put(self, token: str, claims: dict):
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)) or self.max_entries <= 0:
+            return
+        key = self._key(token)
+        self._entries[key] = (exp, claims)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        self._entries.clear()
+
+
+# Tokens verified by this worker
+token_cache = VerifiedTokenCache(max_entries=Config.JWT_CACHE_MAX_ENTRIES)
 
 def verify_jwt_token(token: str) -> dict:
-    """Verify JWT token and return payload"""
+    """Verify JWT token and return payload (cached until the token expires)"""
     
-    try:
-        payload = jwt.decode(token, Config.JWT_SECRET, algorithms=["HS256"])
-        return payload
-    except jwt.ExpiredSignatureError:
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = _decode_jwt(token)
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has expired"
+            )
+        except jwt.InvalidTokenError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid token"
+            )
+        token_cache.put(token, payload)
+    
+    # In-memory filter, see utils.revocation
+    if revocation_filter.is_revoked(payload.get("jti")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token has expired"
+            detail="Token has been revoked"
         )
-    except jwt.InvalidTokenError:
+    return payload
+
+@dataclass
+class AuthContext:
+    """Outcome of verifying a request's bearer token, shared by every layer serving the request"""
+    token: Optional[str] = None
+    claims: Optional[dict] = None
+    error: Optional[str] = None
+    
+    @property
+    def user_id(self):
+        return self.claims.get("user_id") if self.claims else None
+    
+    @classmethod
+    def from_token(cls, token: Optional[str]) -> "AuthContext":
+        if not token:
+            return cls()
+        try:
+            return cls(token=token, claims=verify_jwt_token(token))
+        except HTTPException as e:
+            return cls(token=token, error=e.detail)
+    
+    @classmethod
+    def from_header(cls, authorization: Optional[str]) -> "AuthContext":
+        """Verify the token of an Authorization header, if it carries a bearer token"""
+        if authorization:
+            scheme, _, token = authorization.partition(" ")
+            if scheme.lower() == "bearer":
+                return cls.from_token(token.strip())
+        return cls()
+
+def request_auth(request: Request) -> AuthContext:
+    """
+    Auth context of a request, verified once per request
+    
+    Normally set by middleware.auth.AuthContextMiddleware before the request
+    reaches any other layer; computed and stored here otherwise.
+    """
+    context = getattr(request.state, "auth", None)
+    if context is None:
+        context = AuthContext.from_header(request.headers.get("authorization"))
+        request.state.auth = context
+    return context
+
+def request_claims(request: Request, token: str) -> dict:
+    """
+    Verified claims of the request's bearer token
+    
+    Raises:
+        HTTPException: 401 if the token is invalid or expired
+    """
+    context = request_auth(request)
+    if context.token != token:
+        context = AuthContext.from_token(token)
+        request.state.auth = context
+    if context.error is not None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
+            detail=context.error
         )
+    return context.claims
 
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user from JWT token"""
+) -> UserSnapshot:
+    """Get current authenticated user from JWT token (a cached snapshot, see utils.user_cache)"""
     
     token = credentials.credentials
     
     try:
-        payload = verify_jwt_token(token)
+        payload = request_claims(request, token)
         user_id = payload.get("user_id")
         
         if user_id is None:
@@ -62,6 +216,10 @@ def get_current_user(
                 detail="Invalid token payload"
             )
         
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
         # Get user from database
         user = db.query(User).filter(User.id == user_id).first()
         
@@ -71,7 +229,7 @@ def get_current_user(
                 detail="User not found"
             )
         
-        return user
+        return user_cache.put(user)
         
     except HTTPException:
         raise
@@ -83,8 +241,8 @@ def get_current_user(
         )
 
 def get_current_admin_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: UserSnapshot = Depends(get_current_user)
+) -> UserSnapshot:
     """Get current authenticated admin user"""
     
     if not current_user.is_admin:
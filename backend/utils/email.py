@@ -5,7 +5,6 @@ Uses Gmail SMTP with HTML templates and embedded images.
 
 import smtplib
 import logging
-import os
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
@@ -16,24 +15,10 @@ import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
 from config import Config
+from utils.metrics import observe_outbound
 
-# Set up logging
-def setup_email_logging():
-    """Set up email logging"""
-    log_dir = "logs"
-    os.makedirs(log_dir, exist_ok=True)
-    
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(f'{log_dir}/email.log'),
-            logging.StreamHandler()
-        ]
-    )
-    return logging.getLogger(__name__)
-
-logger = setup_email_logging()
+# Written to logs/email.log by the queued handlers of utils.logging_setup
+logger = logging.getLogger(__name__)
 
 def create_upi_email_template(
     recipient_name: str,
@@ -330,7 +315,7 @@ def _send_email_sync(
         msg.attach(html_part)
         
         # Connect and send email
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
+        with observe_outbound("smtp", "upi_qr_email"), smtplib.SMTP('smtp.gmail.com', 587) as server:
             server.starttls()
             server.login(Config.GMAIL_EMAIL, Config.GMAIL_APP_PASSWORD)
             server.send_message(msg)
@@ -432,7 +417,7 @@ def _send_confirmation_email_sync(
         msg.attach(html_part)
         
         # Send email
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
+        with observe_outbound("smtp", "confirmation_email"), smtplib.SMTP('smtp.gmail.com', 587) as server:
             server.starttls()
             server.login(Config.GMAIL_EMAIL, Config.GMAIL_APP_PASSWORD)
             server.send_message(msg)
@@ -474,5 +459,8 @@ async def test_email_sending():
         return False
 
 if __name__ == "__main__":
+    from utils.logging_setup import configure_logging
+    configure_logging()
+    
     # Run async test
     asyncio.run(test_email_sending())
@@ -0,0 +1,39 @@
+"""
+Shared HTTP client for outbound calls.
+
+Opening an httpx.AsyncClient per call pays for a new connection pool, TCP
+handshake and TLS handshake every time. Outbound calls go through one client
+per worker instead, which keeps up to HTTP_MAX_KEEPALIVE connections to each
+upstream alive between requests. It is created on first use and closed on
+shutdown (see main.lifespan).
+"""
+from typing import Optional
+
+import httpx
+
+from config import Config
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Pooled client of this worker, created on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(Config.HTTP_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=Config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=30.0
+            )
+        )
+    return _client
+
+
+async def close_http_client():
+    """Close the pooled client and its connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,172 @@
+"""
+Inventory availability cache used to fast-reject purchases of unavailable NFTs.
+
+Two bitmaps indexed by NFT ID are kept: "known" (the cache has a verdict for
+this ID) and "available" (not sold and not reserved). Purchase routes reject an
+ID that is known and unavailable before authenticating the user or opening a
+database transaction; unknown IDs fall through to the database as before.
+
+Every state transition (reserve, sell, release) updates the bitmaps, and a
+periodic reconciliation sweep rebuilds them from the nfts table so missed
+updates (other processes, manual SQL) cannot linger. Bit order matches Redis
+(most significant bit first), so the Redis backend stores the same bytes.
+
+Reservations lapse without a state transition (availability is computed at
+read time), so a reserved NFT's verdict carries the epoch second its
+reservation lapses; past it the cache stops rejecting and the database decides.
+"""
+import logging
+import time
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _bit_position(nft_id: int) -> Tuple[int, int]:
+    """Byte index and bit mask of an NFT ID in a Redis-ordered bitmap"""
+    return nft_id >> 3, 0x80 >> (nft_id & 7)
+
+
+def build_bitmaps(rows: Iterable[Sequence]) -> Tuple[bytearray, bytearray]:
+    """
+    Build (known, available) bitmaps from (nft_id, available, ...) rows
+
+    Args:
+        rows: Iterable of NFT ID and availability pairs
+
+    Returns:
+        Tuple of known and available bitmaps
+    """
+    known = bytearray()
+    available = bytearray()
+    for nft_id, is_available, *_ in rows:
+        index, mask = _bit_position(nft_id)
+        if index >= len(known):
+            grow = index + 1 - len(known)
+            known.extend(bytes(grow))
+            available.extend(bytes(grow))
+        known[index] |= mask
+        if is_available:
+            available[index] |= mask
+    return known, available
+
+
+def _lapse_times(rows: Sequence[Sequence]) -> Dict[int, float]:
+    """NFT ID -> reservation lapse time for the reserved rows of a rebuild"""
+    return {row[0]: row[2] for row in rows if len(row) > 2 and row[2] is not None and not row[1]}
+
+
+class MemoryInventoryCache:
+    """In-process availability bitmaps (per worker, rebuilt by the reconciliation sweep)"""
+
+    def __init__(self):
+        self._known = bytearray()
+        self._available = bytearray()
+        self._lapses_at: Dict[int, float] = {}
+
+    def _ensure(self, index: int):
+        if index >= len(self._known):
+            grow = index + 1 - len(self._known)
+            self._known.extend(bytes(grow))
+            self._available.extend(bytes(grow))
+
+    async def set_available(self, nft_id: int, available: bool, reserved_until: Optional[float] = None):
+        """
+        Record the availability of an NFT after a state transition
+
+        Args:
+            nft_id: NFT ID
+            available: Whether the NFT can be bought
+            reserved_until: For a reservation, epoch seconds when it lapses
+        """
+        index, mask = _bit_position(nft_id)
+        self._ensure(index)
+        self._known[index] |= mask
+        if available:
+            self._available[index] |= mask
+        else:
+            self._available[index] &= ~mask & 0xFF
+        if reserved_until is None or available:
+            self._lapses_at.pop(nft_id, None)
+        else:
+            self._lapses_at[nft_id] = reserved_until
+
+    async def is_unavailable(self, nft_id: int) -> bool:
+        """True only if the NFT is known to be sold or held by a reservation that has not lapsed"""
+        index, mask = _bit_position(nft_id)
+        if index >= len(self._known) or not self._known[index] & mask:
+            return False
+        if self._available[index] & mask:
+            return False
+        lapses_at = self._lapses_at.get(nft_id)
+        return lapses_at is None or time.time() < lapses_at
+
+    async def rebuild(self, rows: Iterable[Sequence]) -> int:
+        """Replace the cache with (nft_id, available[, reserved_until]) rows"""
+        rows = list(rows)
+        known, available = build_bitmaps(rows)
+        self._known, self._available = known, available
+        self._lapses_at = _lapse_times(rows)
+        return len(known)
+
+
+class RedisInventoryCache:
+    """Availability bitmaps stored in Redis and shared by all workers"""
+
+    KNOWN_KEY = "inventory:known"
+    AVAILABLE_KEY = "inventory:available"
+    LAPSES_KEY = "inventory:reserved_until"
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+
+    async def set_available(self, nft_id: int, available: bool, reserved_until: Optional[float] = None):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.setbit(self.KNOWN_KEY, nft_id, 1)
+            pipe.setbit(self.AVAILABLE_KEY, nft_id, 1 if available else 0)
+            if reserved_until is None or available:
+                pipe.hdel(self.LAPSES_KEY, nft_id)
+            else:
+                pipe.hset(self.LAPSES_KEY, nft_id, reserved_until)
+            await pipe.execute()
+
+    async def is_unavailable(self, nft_id: int) -> bool:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.getbit(self.KNOWN_KEY, nft_id)
+            pipe.getbit(self.AVAILABLE_KEY, nft_id)
+            pipe.hget(self.LAPSES_KEY, nft_id)
+            known, available, lapses_at = await pipe.execute()
+        if not known or available:
+            return False
+        return lapses_at is None or time.time() < float(lapses_at)
+
+    async def rebuild(self, rows: Iterable[Sequence]) -> int:
+        rows = list(rows)
+        known, available = build_bitmaps(rows)
+        lapses_at = _lapse_times(rows)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.KNOWN_KEY, bytes(known))
+            pipe.set(self.AVAILABLE_KEY, bytes(available))
+            pipe.delete(self.LAPSES_KEY)
+            if lapses_at:
+                pipe.hset(self.LAPSES_KEY, mapping=lapses_at)
+            await pipe.execute()
+        return len(known)
+
+
+def create_inventory_cache():
+    """Create the inventory cache backend selected by INVENTORY_CACHE_BACKEND"""
+    if Config.INVENTORY_CACHE_BACKEND.lower() == "redis":
+        import redis.asyncio as aioredis
+        # Bitmaps are raw bytes, so responses are not decoded
+        client = aioredis.from_url(Config.REDIS_URL)
+        logger.info("Inventory cache using Redis backend")
+        return RedisInventoryCache(client)
+
+    return MemoryInventoryCache()
+
+
+# Global inventory cache instance
+inventory = create_inventory_cache()
@@ -0,0 +1,103 @@
+"""
+Execution and instrumentation of background jobs.
+
+Jobs are coroutines on the event loop, but their database work is synchronous
+and runs on a small dedicated thread pool (with its own engine, see
+db.session.job_engine), so a long sweep never stalls request handling.
+Every instrumented job records its duration and the number of rows it
+touched, logs them to the performance log and keeps running totals for
+monitoring (/health/scheduler, and a histogram at /metrics).
+"""
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from config import Config
+from utils.metrics import job_duration
+
+logger = logging.getLogger(__name__)
+perf_logger = logging.getLogger('performance')
+
+# Thread pool running the blocking database work of background jobs
+job_executor = ThreadPoolExecutor(max_workers=Config.SCHEDULER_THREADS, thread_name_prefix="scheduler-job")
+
+
+async def run_in_job_thread(func: Callable, *args, **kwargs):
+    """Run blocking work on the job thread pool and wait for it without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(job_executor, functools.partial(func, *args, **kwargs))
+
+
+@dataclass
+class JobStats:
+    """Running totals of one job"""
+    runs: int = 0
+    errors: int = 0
+    rows: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    last_seconds: float = 0.0
+    last_rows: int = 0
+    last_run_at: Optional[datetime] = None
+
+    def record(self, seconds: float, rows: int, failed: bool = False):
+        self.runs += 1
+        self.errors += failed
+        self.rows += rows
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.last_seconds = seconds
+        self.last_rows = rows
+        self.last_run_at = datetime.utcnow()
+
+    def to_dict(self):
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "rows": self.rows,
+            "avg_seconds": round(self.total_seconds / self.runs, 6) if self.runs else None,
+            "max_seconds": round(self.max_seconds, 6),
+            "last_seconds": round(self.last_seconds, 6),
+            "last_rows": self.last_rows,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+# Stats per job name, for monitoring
+job_stats: Dict[str, JobStats] = {}
+
+
+def instrumented(name: str):
+    """
+    Record duration and row count of a job coroutine
+
+    The job returns the number of rows it touched, or the list of affected
+    IDs (None counts as 0). Exceptions are logged, counted and re-raised.
+    """
+    def decorator(job):
+        stats = job_stats.setdefault(name, JobStats())
+
+        @functools.wraps(job)
+        async def run(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await job(*args, **kwargs)
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                stats.record(elapsed, 0, failed=True)
+                job_duration.labels(name, "error").observe(elapsed)
+                logger.error(f"Error in job {name}: {str(e)}")
+                raise
+            elapsed = time.perf_counter() - start
+            rows = result if isinstance(result, int) else len(result or ())
+            stats.record(elapsed, rows)
+            job_duration.labels(name, "ok").observe(elapsed)
+            perf_logger.info(f"Job {name} took {elapsed * 1000:.1f}ms, {rows} rows")
+            return result
+        return run
+    return decorator
@@ -0,0 +1,270 @@
+"""
+Asymmetric signing keys for access tokens, published as a JWKS.
+
+Tokens are signed with ES256 (P-256) or EdDSA (Ed25519) and carry the key's
+kid in their header, so any service can verify them locally with the public
+keys from /.well-known/jwks.json instead of sharing a secret or calling back
+into this API.
+
+Keys live as PEM files in JWT_KEYS_DIR, named <kid>.pem. Kids start with a
+UTC timestamp, so the newest private key signs (unless JWT_ACTIVE_KID pins
+one) and every key in the directory is published and accepted. Rotation:
+
+1. python rotate_jwt_key.py           # new key; signs once workers reload
+2. python rotate_jwt_key.py --retire <old kid>
+                                      # keeps only the public half, still verifiable
+3. delete <old kid>.pub.pem once tokens signed with it have expired
+
+When the directory has no private key, the first worker to sign creates one.
+Workers coordinate through a lock file created with O_EXCL: the one that
+creates it generates the key, the others wait and re-read the directory, so
+every worker signs with the same kid.
+
+A deployment without a persistent disk can pass the signing key as PEM in
+JWT_SIGNING_KEY (kid JWT_SIGNING_KID) instead. Public keys are cached
+in-process by kid; a token with an unknown kid triggers a reload of the
+directory (at most every JWT_KEYS_RELOAD_SECONDS) so keys rotated in by
+another worker are picked up without a restart.
+"""
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from jwt.algorithms import ECAlgorithm, OKPAlgorithm
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = ("ES256", "EdDSA")
+
+# Held while a worker generates the first key (not *.pem, so never loaded as a key)
+GENERATE_LOCK = ".generate.lock"
+# Seconds to wait for another worker's key before treating its lock as stale
+GENERATE_TIMEOUT_SECONDS = 10.0
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    """One key of the key set; private_key is None for retired keys"""
+    kid: str
+    algorithm: str
+    public_key: object
+    private_key: Optional[object] = None
+
+    def to_jwk(self) -> dict:
+        """Public JWK of the key"""
+        to_jwk = ECAlgorithm.to_jwk if self.algorithm == "ES256" else OKPAlgorithm.to_jwk
+        jwk = to_jwk(self.public_key, as_dict=True)
+        jwk.update({"kid": self.kid, "alg": self.algorithm, "use": "sig"})
+        return jwk
+
+
+def _algorithm_of(key) -> str:
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)):
+        if not isinstance(key.curve, ec.SECP256R1):
+            raise ValueError(f"Unsupported curve {key.curve.name}; ES256 requires P-256")
+        return "ES256"
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "EdDSA"
+    raise ValueError(f"Unsupported key type {type(key).__name__}")
+
+
+def load_pem(kid: str, pem: bytes) -> SigningKey:
+    """Parse a private or public PEM key"""
+    if b"PRIVATE KEY" in pem:
+        private_key = serialization.load_pem_private_key(pem, password=None)
+        return SigningKey(kid, _algorithm_of(private_key), private_key.public_key(), private_key)
+    public_key = serialization.load_pem_public_key(pem)
+    return SigningKey(kid, _algorithm_of(public_key), public_key)
+
+
+def generate_key(keys_dir: str, algorithm: str) -> str:
+    """
+    Create a new private key file in keys_dir
+
+    Args:
+        keys_dir: Key directory
+        algorithm: ES256 or EdDSA
+
+    Returns:
+        kid of the new key
+    """
+    if algorithm == "ES256":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    elif algorithm == "EdDSA":
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        raise ValueError(f"Unsupported signing algorithm {algorithm}")
+
+    kid = f"{time.strftime('%Y%m%d%H%M%S', time.gmtime())}-{secrets.token_hex(4)}"
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    os.makedirs(keys_dir, exist_ok=True)
+    path = os.path.join(keys_dir, f"{kid}.pem")
+    partial = f"{path}.tmp"
+    fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(pem)
+    # link() fails rather than overwrite, and readers never see a half-written key
+    try:
+        os.link(partial, path)
+    finally:
+        os.unlink(partial)
+    return kid
+
+
+def retire_key(keys_dir: str, kid: str):
+    """Replace a private key file with its public half, so it verifies but no longer signs"""
+    path = Path(keys_dir) / f"{kid}.pem"
+    key = load_pem(kid, path.read_bytes())
+    public_pem = key.public_key.public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    (Path(keys_dir) / f"{kid}.pub.pem").write_bytes(public_pem)
+    path.unlink()
+
+
+class KeyStore:
+    """Key set loaded from a directory, with an in-process cache of public keys by kid"""
+
+    def __init__(
+        self,
+        keys_dir: str,
+        algorithm: str,
+        active_kid: Optional[str] = None,
+        env_key: Optional[str] = None,
+        env_kid: str = "env",
+        reload_seconds: float = 30.0
+    ):
+        self.keys_dir = keys_dir
+        self.algorithm = algorithm
+        self.active_kid = active_kid
+        self.env_key = env_key
+        self.env_kid = env_kid
+        self.reload_seconds = reload_seconds
+        self._keys: Dict[str, SigningKey] = {}
+        self._signing: Optional[SigningKey] = None
+        self._jwks: Optional[bytes] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """(Re)read the key set"""
+        keys = {}
+        directory = Path(self.keys_dir)
+        if directory.is_dir():
+            for path in sorted(directory.glob("*.pem")):
+                kid = path.name[:-len(".pub.pem")] if path.name.endswith(".pub.pem") else path.stem
+                try:
+                    keys[kid] = load_pem(kid, path.read_bytes())
+                except Exception as e:
+                    logger.error(f"Skipping unreadable JWT key {path}: {str(e)}")
+        if self.env_key:
+            keys[self.env_kid] = load_pem(self.env_kid, self.env_key.encode())
+
+        signing = None
+        if self.env_key:
+            signing = keys[self.env_kid]
+        elif self.active_kid:
+            signing = keys.get(self.active_kid)
+        else:
+            candidates = [kid for kid, key in keys.items() if key.private_key is not None]
+            signing = keys[max(candidates)] if candidates else None
+
+        self._keys = keys
+        self._signing = signing
+        self._jwks = json.dumps({"keys": [key.to_jwk() for key in keys.values()]}).encode()
+        self._loaded_at = time.monotonic()
+
+    def keys(self) -> Dict[str, SigningKey]:
+        """Loaded keys by kid"""
+        return dict(self._keys)
+
+    @property
+    def active_kid_loaded(self) -> Optional[str]:
+        """kid of the loaded signing key, if any (never generates one)"""
+        return self._signing.kid if self._signing else None
+
+    def signing_key(self) -> SigningKey:
+        """Key new tokens are signed with, creating the first key if the set is empty"""
+        if self._signing is None:
+            with self._lock:
+                if self._signing is None:
+                    self.load()
+                if self._signing is None:
+                    if self.active_kid:
+                        raise RuntimeError(f"JWT_ACTIVE_KID {self.active_kid} not found in {self.keys_dir}")
+                    self._generate_first_key()
+        return self._signing
+
+    def _generate_first_key(self):
+        """Create the first signing key once across processes (see the module docstring)"""
+        os.makedirs(self.keys_dir, exist_ok=True)
+        lock_path = os.path.join(self.keys_dir, GENERATE_LOCK)
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+            except FileExistsError:
+                # Another worker is generating it
+                time.sleep(0.05)
+                self.load()
+                if self._signing is not None:
+                    return
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > GENERATE_TIMEOUT_SECONDS:
+                        logger.warning(f"Removing stale JWT key lock {lock_path}")
+                        os.unlink(lock_path)
+                except FileNotFoundError:
+                    pass
+                continue
+            try:
+                # A worker may have finished between our load() and taking the lock
+                self.load()
+                if self._signing is None:
+                    kid = generate_key(self.keys_dir, self.algorithm)
+                    logger.warning(f"Generated JWT signing key {kid} in {self.keys_dir}")
+                    self.load()
+            finally:
+                os.unlink(lock_path)
+            return
+
+    def verification_key(self, kid: str) -> Optional[SigningKey]:
+        """Public key for a kid, reloading the set (rate limited) when the kid is unknown"""
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._loaded_at >= self.reload_seconds:
+            with self._lock:
+                if kid not in self._keys:
+                    self.load()
+            key = self._keys.get(kid)
+        return key
+
+    def jwks(self) -> bytes:
+        """Serialized JWKS of every key in the set"""
+        if self._jwks is None:
+            with self._lock:
+                self.load()
+        return self._jwks
+
+
+# Global key store for access tokens
+key_store = KeyStore(
+    Config.JWT_KEYS_DIR,
+    Config.JWT_ALGORITHM,
+    active_kid=Config.JWT_ACTIVE_KID or None,
+    env_key=Config.JWT_SIGNING_KEY or None,
+    env_kid=Config.JWT_SIGNING_KID,
+    reload_seconds=Config.JWT_KEYS_RELOAD_SECONDS
+)
@@ -0,0 +1,233 @@
+"""
+Leader election for background jobs across worker processes.
+
+Every worker starts the scheduler, but only the holder of a named lease in the
+scheduler_leases table runs its jobs. The leader renews the lease every third
+of its length; any worker may take it over once it has expired, so failover
+happens within SCHEDULER_LEASE_SECONDS of a leader dying. Taking and renewing
+are a single conditional UPDATE (plus an INSERT ... ON CONFLICT DO NOTHING for
+the first claim), which works the same on PostgreSQL and SQLite.
+
+Lease times use the application clock, so the lease should comfortably exceed
+clock skew between hosts.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import and_, case, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from db.session import JobSessionLocal
+from models.scheduler_lease import SchedulerLease
+from utils.jobs import run_in_job_thread
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _insert(db: Session):
+    """INSERT construct supporting ON CONFLICT for the session's dialect"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(SchedulerLease)
+    return sqlite.insert(SchedulerLease)
+
+
+def try_acquire_lease(db: Session, name: str, holder: str, lease_seconds: float, now: datetime) -> bool:
+    """
+    Take or renew a lease; the caller commits
+
+    Succeeds when the lease is free, expired or already held by holder.
+
+    Args:
+        db: Database session
+        name: Lease name
+        holder: Identifier of the calling worker
+        lease_seconds: Lease length from now
+        now: Current UTC time
+
+    Returns:
+        True if holder owns the lease until now + lease_seconds
+    """
+    expires_at = now + timedelta(seconds=lease_seconds)
+    renewed = db.execute(
+        update(SchedulerLease)
+        .where(
+            and_(
+                SchedulerLease.name == name,
+                or_(SchedulerLease.holder == holder, SchedulerLease.expires_at < now)
+            )
+        )
+        .values(
+            holder=holder,
+            acquired_at=case((SchedulerLease.holder == holder, SchedulerLease.acquired_at), else_=now),
+            renewed_at=now,
+            expires_at=expires_at
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if renewed:
+        return True
+
+    # First claim of this lease name
+    inserted = db.execute(
+        _insert(db)
+        .values(name=name, holder=holder, acquired_at=now, renewed_at=now, expires_at=expires_at)
+        .on_conflict_do_nothing(index_elements=[SchedulerLease.name])
+    ).rowcount
+    return inserted == 1
+
+
+def release_lease(db: Session, name: str, holder: str, now: datetime) -> bool:
+    """
+    Give up a lease so another worker can take it immediately; the caller commits
+
+    Returns:
+        True if holder was holding the lease
+    """
+    return db.execute(
+        update(SchedulerLease)
+        .where(and_(SchedulerLease.name == name, SchedulerLease.holder == holder))
+        .values(expires_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+class LeaderElection:
+    """
+    Heartbeat task competing for one named lease
+
+    on_elected and on_demoted are awaited on every change of leadership.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        lease_seconds: float,
+        holder: Optional[str] = None,
+        session_factory=None
+    ):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.renew_interval = lease_seconds / 3
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.session_factory = session_factory or JobSessionLocal
+        self.is_leader = False
+        self.leader_since: Optional[datetime] = None
+        self.lease_expires_at: Optional[datetime] = None
+        self.last_heartbeat: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._on_elected: Optional[Callable[[], Awaitable[None]]] = None
+        self._on_demoted: Optional[Callable[[], Awaitable[None]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def to_dict(self):
+        """Leadership state for monitoring"""
+        return {
+            "lease": self.name,
+            "holder": self.holder,
+            "is_leader": self.is_leader,
+            "leader_since": self.leader_since.isoformat() if self.leader_since else None,
+            "lease_expires_at": self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            "last_heartbeat": self.last_heartbeat.isoformat() if self.last_heartbeat else None,
+            "lease_seconds": self.lease_seconds,
+            "last_error": self.last_error,
+        }
+
+    async def heartbeat(self) -> bool:
+        """
+        Try to take or renew the lease once and apply the outcome
+
+        Returns:
+            Whether this worker is the leader afterwards
+        """
+        now = datetime.utcnow()
+        try:
+            acquired = await run_in_job_thread(self._acquire, now)
+            self.last_heartbeat = now
+            self.last_error = None
+        except Exception as e:
+            logger.error(f"Error renewing lease {self.name}: {str(e)}")
+            self.last_error = str(e)
+            # Without a renewal the lease may pass to another worker once it expires
+            acquired = self.is_leader and self.lease_expires_at is not None and now < self.lease_expires_at
+            if acquired:
+                return True
+
+        if acquired:
+            self.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+            if not self.is_leader:
+                self.is_leader = True
+                self.leader_since = now
+                logger.info(f"Worker {self.holder} elected leader for {self.name}")
+                if self._on_elected:
+                    await self._on_elected()
+        elif self.is_leader:
+            await self._demote()
+        return self.is_leader
+
+    def _acquire(self, now: datetime) -> bool:
+        db: Session = self.session_factory()
+        try:
+            acquired = try_acquire_lease(db, self.name, self.holder, self.lease_seconds, now)
+            db.commit()
+            return acquired
+        finally:
+            db.close()
+
+    def start(
+        self,
+        on_elected: Optional[Callable[[], Awaitable[None]]] = None,
+        on_demoted: Optional[Callable[[], Awaitable[None]]] = None
+    ):
+        """Start competing for the lease on the running event loop"""
+        if self._task is not None and not self._task.done():
+            return
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        """Stop heartbeating and hand the lease over if held"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.is_leader:
+            try:
+                db: Session = self.session_factory()
+                try:
+                    release_lease(db, self.name, self.holder, datetime.utcnow())
+                    db.commit()
+                finally:
+                    db.close()
+                logger.info(f"Worker {self.holder} released lease {self.name}")
+            except Exception as e:
+                logger.error(f"Error releasing lease {self.name}: {str(e)}")
+            self.is_leader = False
+            self.leader_since = None
+            self.lease_expires_at = None
+
+    async def _demote(self):
+        self.is_leader = False
+        self.leader_since = None
+        self.lease_expires_at = None
+        logger.warning(f"Worker {self.holder} lost lease {self.name}")
+        if self._on_demoted:
+            await self._on_demoted()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.error(f"Error in leader election for {self.name}: {str(e)}")
+            await asyncio.sleep(self.renew_interval)
+
+
+# Global election for the scheduler (started by utils.scheduler.start_scheduler)
+scheduler_election = LeaderElection("scheduler", lease_seconds=Config.SCHEDULER_LEASE_SECONDS)
@@ -0,0 +1,247 @@
+"""
+Non-blocking structured logging.
+
+Every handler that touches a file or the console runs on one background
+thread. The root logger gets a single QueueHandler; records from the app,
+security, performance and email loggers (and anything else) propagate to it
+and are appended to a bounded in-memory queue. A listener thread formats
+them as JSON lines and writes them in batches to each logger's file
+(LOG_FILES) and to stderr. Logging from a request therefore costs a
+getMessage() and a queue put on the event loop, never a write() or a
+rotation.
+
+If the queue fills up (the disk cannot keep up), records are dropped and
+counted rather than blocking requests; see dropped_records().
+
+Each record carries the id of the request it was logged from (request_id_var,
+set by middleware.logging.LoggingMiddleware), so all lines of one request can
+be correlated.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+from config import Config
+
+# Request being served by the current task, if any
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Logger name -> file in LOG_DIR (child loggers go to their parent's file)
+LOG_FILES = {
+    "app_middleware": "app.log",
+    "security": "security.log",
+    "performance": "performance.log",
+    "utils.email": "email.log",
+}
+
+# Attributes every LogRecord has; anything else was passed via extra= and is emitted as a field
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, request_id and any extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        # A record goes to a file and the console; serialize it once
+        line = record.__dict__.get("_json")
+        if line is not None:
+            return line
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = record.__dict__.get("request_id")
+        if request_id:
+            entry["request_id"] = request_id
+        for key in record.__dict__.keys() - _RESERVED:
+            if not key.startswith("_"):
+                entry[key] = record.__dict__[key]
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        record._json = line = json.dumps(entry, default=str)
+        return line
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request id (runs on the logging thread's caller)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id_var.get()
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of raising when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback here (the record crosses threads) but leave the JSON to the listener
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingQueueListener(QueueListener):
+    """
+    QueueListener writing records in batches: each file receives one write()
+    and flush() per batch instead of per record, and the thread wakes (and
+    takes the GIL) once per LINGER_SECONDS under load rather than per record
+    """
+
+    LINGER_SECONDS = 0.02
+
+    def __init__(self, log_queue: queue.Queue, files: Dict[str, logging.Handler], console: logging.Handler):
+        super().__init__(log_queue, console, *files.values())
+        self.files = files
+        self.console = console
+
+    def _file_for(self, name: str) -> Optional[logging.Handler]:
+        while name:
+            handler = self.files.get(name)
+            if handler is not None:
+                return handler
+            name = name.rpartition(".")[0]
+        return None
+
+    def _monitor(self):
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            time.sleep(self.LINGER_SECONDS)
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if self._sentinel in batch:
+                stopping = True
+                batch = [record for record in batch if record is not self._sentinel]
+            self.write(batch)
+
+    def write(self, records):
+        """Write records to their files and the console"""
+        by_file: Dict[logging.Handler, list] = {}
+        for record in records:
+            handler = self._file_for(record.name)
+            if handler is not None:
+                by_file.setdefault(handler, []).append(record)
+        by_file[self.console] = records
+        for handler, batch in by_file.items():
+            if batch:
+                try:
+                    _write_batch(handler, batch)
+                except Exception:
+                    handler.handleError(batch[0])
+
+
+def _write_batch(handler: logging.StreamHandler, records):
+    text = "".join(handler.format(record) + "\n" for record in records)
+    handler.acquire()
+    try:
+        if isinstance(handler, RotatingFileHandler):
+            if handler.stream is None:
+                handler.stream = handler._open()
+            if handler.maxBytes > 0 and handler.stream.tell() + len(text) >= handler.maxBytes:
+                handler.doRollover()
+        handler.stream.write(text)
+        handler.stream.flush()
+    finally:
+        handler.release()
+
+
+def configure_logging(log_dir: Optional[str] = None, level: Optional[str] = None) -> QueueListener:
+    """
+    Route all logging through a queue to a background writer thread (idempotent)
+
+    Args:
+        log_dir: Directory of the LOG_FILES (default LOG_DIR)
+        level: Root level name (default LOG_LEVEL)
+
+    Returns:
+        The running QueueListener
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    log_dir = log_dir or Config.LOG_DIR
+    os.makedirs(log_dir, exist_ok=True)
+    formatter = JsonFormatter()
+
+    files = {}
+    for name, filename in LOG_FILES.items():
+        handler = RotatingFileHandler(
+            os.path.join(log_dir, filename),
+            maxBytes=10*1024*1024,  # 10MB
+            backupCount=5
+        )
+        handler.setFormatter(formatter)
+        files[name] = handler
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(formatter)
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=Config.LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(RequestIdFilter())
+
+    # Handlers installed earlier (e.g. logging.basicConfig) would write synchronously
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level or Config.LOG_LEVEL)
+
+    logging.getLogger("app_middleware").setLevel(logging.INFO)
+    logging.getLogger("security").setLevel(logging.WARNING)
+    logging.getLogger("performance").setLevel(logging.INFO)
+
+    _listener = BatchingQueueListener(_queue_handler.queue, files, console)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener = None
+    _queue_handler = None
+
+
+def dropped_records() -> int:
+    """Records dropped because the queue was full"""
+    return _queue_handler.dropped if _queue_handler is not None else 0
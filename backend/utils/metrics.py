@@ -0,0 +1,148 @@
+"""
+Prometheus metrics of the API, served as text at /metrics.
+
+Metrics are kept in-process by prometheus_client and cost a lock and an
+addition to update; nothing is computed until a scrape. They cover:
+
+- http_request_duration_seconds: latency by method, route template (e.g.
+  /api/purchase/{nft_id}, never the raw path, to keep the series bounded)
+  and status; its _count is the request rate. http_requests_in_flight.
+- db_pool_*: connection checkouts, connections in use and the time spent
+  waiting for a pooled connection.
+- scheduler_job_duration_seconds: background jobs (see utils.jobs).
+- outbound_request_duration_seconds: calls to PayPal, thirdweb and SMTP.
+- cache_lookups_total: hits and misses of the user and inventory caches.
+
+Under gunicorn each worker has its own registry. With PROMETHEUS_MULTIPROC_DIR
+set before prometheus_client is imported (gunicorn.conf.py does so), every
+worker writes its values to memory-mapped files in that directory and a scrape
+of any worker aggregates all of them: counters and histograms are summed, and
+gauges summed over live workers.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Seconds; requests and outbound calls range from sub-millisecond cache hits to slow gateways
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being served",
+    multiprocess_mode="livesum",
+)
+
+db_pool_checkouts = Counter(
+    "db_pool_checkouts_total",
+    "Connections checked out of the pool",
+    ["engine"],
+)
+db_pool_checked_out = Gauge(
+    "db_pool_connections_checked_out",
+    "Connections currently checked out of the pool",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+db_pool_wait = Histogram(
+    "db_pool_wait_seconds",
+    "Time to obtain a pooled connection, including opening one",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+
+job_duration = Histogram(
+    "scheduler_job_duration_seconds",
+    "Background job run time",
+    ["job", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+outbound_duration = Histogram(
+    "outbound_request_duration_seconds",
+    "Latency of calls to external services",
+    ["service", "operation", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+cache_lookups = Counter(
+    "cache_lookups_total",
+    "Cache lookups by result",
+    ["cache", "result"],
+)
+
+
+@contextmanager
+def observe_outbound(service: str, operation: str):
+    """Time a call to an external service; outcome is "error" if the block raises"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        outbound_duration.labels(service, operation, outcome).observe(time.perf_counter() - start)
+
+
+def timed_pool(pool_class, engine_name: str):
+    """Subclass of a SQLAlchemy pool class recording how long each checkout waits"""
+    wait = db_pool_wait.labels(engine_name)
+
+    class TimedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                wait.observe(time.perf_counter() - start)
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+def instrument_engine(engine: Engine, engine_name: str):
+    """Count checkouts and connections in use of an engine's pool"""
+    checkouts = db_pool_checkouts.labels(engine_name)
+    checked_out = db_pool_checked_out.labels(engine_name)
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.inc()
+        checked_out.inc()
+
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+
+    event.listen(engine, "checkout", on_checkout)
+    event.listen(engine, "checkin", on_checkin)
+
+
+def render() -> bytes:
+    """Current metrics in the Prometheus text format, aggregated over workers in multiprocess mode"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
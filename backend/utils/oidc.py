@@ -0,0 +1,289 @@
+"""
+OpenID Connect login against Google without per-login metadata or userinfo calls.
+
+The provider's discovery document and signing keys (JWKS) are fetched once per
+worker, kept in memory and refreshed in the background every
+OIDC_REFRESH_SECONDS; a token signed with an unknown kid triggers an early,
+rate-limited JWKS refetch, which is how key rotation is picked up. A login
+then costs exactly one outbound request, the code exchange at the token
+endpoint, over the shared pooled client (utils.http_client).
+
+The ID token returned by that exchange is verified locally (signature,
+issuer, audience, expiry and the nonce bound to the login) and its claims
+replace the userinfo request: with the "openid email profile" scopes Google
+includes sub, email, email_verified, name and picture in the ID token.
+
+state, nonce and the PKCE verifier of a pending login travel in a short-lived
+HttpOnly cookie signed with JWT_SECRET (see login_state / read_login_state),
+so no server-side session store is needed.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+import httpx
+import jwt
+
+from config import Config
+from utils.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+# Only asymmetric keys are accepted from a JWKS (never "none" or a shared secret)
+_KEY_ALGORITHMS = {"RSA": "RS256", "EC": "ES256", "OKP": "EdDSA"}
+
+LOGIN_STATE_COOKIE = "oauth_state"
+
+
+class OIDCError(Exception):
+    """Login failed: provider unreachable, code rejected or ID token invalid"""
+
+
+class OIDCProvider:
+    """Cached discovery document and JWKS of an OpenID provider, with code exchange and ID-token verification"""
+
+    def __init__(
+        self,
+        discovery_url: str,
+        client_id: str,
+        client_secret: str,
+        scope: str = "openid email profile",
+        refresh_seconds: float = 3600.0,
+        jwks_min_refresh_seconds: float = 60.0,
+        leeway_seconds: float = 60.0,
+        http: Callable[[], httpx.AsyncClient] = get_http_client
+    ):
+        self.discovery_url = discovery_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scope = scope
+        self.refresh_seconds = refresh_seconds
+        self.jwks_min_refresh_seconds = jwks_min_refresh_seconds
+        self.leeway_seconds = leeway_seconds
+        self.http = http
+        self._metadata: Optional[dict] = None
+        self._keys: Dict[str, Tuple[str, object]] = {}
+        self._jwks_fetched_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _get_json(self, url: str) -> dict:
+        try:
+            response = await self.http().get(url)
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise OIDCError(f"Failed to fetch {url}: {str(e)}")
+
+    async def _fetch_jwks(self, metadata: dict):
+        document = await self._get_json(metadata["jwks_uri"])
+        keys = {}
+        for jwk in document.get("keys", []):
+            algorithm = _KEY_ALGORITHMS.get(jwk.get("kty"))
+            if algorithm is None or jwk.get("use", "sig") != "sig":
+                continue
+            try:
+                keys[jwk.get("kid")] = (jwk.get("alg", algorithm), jwt.PyJWK(jwk, jwk.get("alg", algorithm)).key)
+            except jwt.PyJWTError as e:
+                logger.warning(f"Skipping unusable key {jwk.get('kid')} from {metadata['jwks_uri']}: {str(e)}")
+        self._keys = keys
+        self._jwks_fetched_at = time.monotonic()
+
+    async def refresh(self):
+        """Refetch the discovery document and the JWKS"""
+        async with self._lock:
+            metadata = await self._get_json(self.discovery_url)
+            for field in ("issuer", "authorization_endpoint", "token_endpoint", "jwks_uri"):
+                if field not in metadata:
+                    raise OIDCError(f"Discovery document lacks {field}")
+            await self._fetch_jwks(metadata)
+            self._metadata = metadata
+
+    async def metadata(self) -> dict:
+        """Discovery document, fetched on first use if the background refresh has not run yet"""
+        if self._metadata is None:
+            await self.refresh()
+        return self._metadata
+
+    async def _signing_key(self, kid: Optional[str]) -> Tuple[str, object]:
+        metadata = await self.metadata()
+        if kid not in self._keys:
+            # Rotated keys show up here first; refetch, but not on every forged kid
+            async with self._lock:
+                stale = time.monotonic() - (self._jwks_fetched_at or 0) >= self.jwks_min_refresh_seconds
+                if kid not in self._keys and stale:
+                    await self._fetch_jwks(metadata)
+        if kid not in self._keys:
+            raise OIDCError(f"Unknown signing key {kid}")
+        return self._keys[kid]
+
+    async def authorization_url(self, redirect_uri: str, state: str, nonce: str, code_challenge: str) -> str:
+        """URL of the provider's consent screen for one login"""
+        metadata = await self.metadata()
+        query = urlencode({
+            "response_type": "code",
+            "client_id": self.client_id,
+            "redirect_uri": redirect_uri,
+            "scope": self.scope,
+            "state": state,
+            "nonce": nonce,
+            "code_challenge": code_challenge,
+            "code_challenge_method": "S256"
+        })
+        return f"{metadata['authorization_endpoint']}?{query}"
+
+    async def exchange_code(self, code: str, redirect_uri: str, code_verifier: str) -> dict:
+        """
+        Redeem an authorization code at the token endpoint
+
+        Returns:
+            Token response (access_token, id_token, ...)
+        """
+        metadata = await self.metadata()
+        try:
+            response = await self.http().post(
+                metadata["token_endpoint"],
+                data={
+                    "grant_type": "authorization_code",
+                    "code": code,
+                    "redirect_uri": redirect_uri,
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "code_verifier": code_verifier
+                },
+                headers={"Accept": "application/json"}
+            )
+        except httpx.HTTPError as e:
+            raise OIDCError(f"Token endpoint unreachable: {str(e)}")
+        if response.status_code != 200:
+            raise OIDCError(f"Code exchange failed ({response.status_code}): {response.text[:200]}")
+        return response.json()
+
+    async def verify_id_token(self, id_token: Optional[str], nonce: str) -> dict:
+        """
+        Verify an ID token locally against the cached JWKS
+
+        Args:
+            id_token: Compact JWT from the token response
+            nonce: Nonce sent with the authorization request
+
+        Raises:
+            OIDCError: If the token is missing, forged, expired, for another
+                client or from another login
+
+        Returns:
+            Verified claims
+        """
+        if not id_token:
+            raise OIDCError("Token response lacks an id_token")
+        try:
+            kid = jwt.get_unverified_header(id_token).get("kid")
+        except jwt.PyJWTError as e:
+            raise OIDCError(f"Malformed ID token: {str(e)}")
+
+        algorithm, key = await self._signing_key(kid)
+        try:
+            claims = jwt.decode(
+                id_token,
+                key,
+                algorithms=[algorithm],
+                audience=self.client_id,
+                leeway=self.leeway_seconds,
+                options={"require": ["iss", "sub", "aud", "exp", "iat"]}
+            )
+        except jwt.PyJWTError as e:
+            raise OIDCError(f"Invalid ID token: {str(e)}")
+
+        # Google documents both forms of its issuer
+        issuer = self._metadata["issuer"]
+        if claims["iss"] not in (issuer, issuer.removeprefix("https://")):
+            raise OIDCError(f"Unexpected ID token issuer {claims['iss']}")
+        if not hmac.compare_digest(str(claims.get("nonce", "")), nonce):
+            raise OIDCError("ID token nonce does not match this login")
+        return claims
+
+    def start(self):
+        """Keep the discovery document and JWKS fresh on the running event loop"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        """Stop the background refresh"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            delay = self.refresh_seconds
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Keep serving the cached documents; retry sooner
+                logger.error(f"Error refreshing OIDC metadata from {self.discovery_url}: {str(e)}")
+                delay = min(delay, self.jwks_min_refresh_seconds)
+            await asyncio.sleep(delay)
+
+    def to_dict(self):
+        """Cache state for monitoring"""
+        return {
+            "issuer": self._metadata.get("issuer") if self._metadata else None,
+            "keys": sorted(kid for kid in self._keys if kid),
+            "jwks_age_seconds": round(time.monotonic() - self._jwks_fetched_at, 1) if self._jwks_fetched_at else None
+        }
+
+
+def login_state() -> Tuple[dict, str]:
+    """
+    Fresh state, nonce and PKCE verifier for a login
+
+    Returns:
+        (state dict, signed cookie value carrying it)
+    """
+    state = {
+        "state": secrets.token_urlsafe(24),
+        "nonce": secrets.token_urlsafe(24),
+        "code_verifier": secrets.token_urlsafe(48),
+        "exp": int(time.time()) + Config.OIDC_LOGIN_STATE_SECONDS
+    }
+    return state, jwt.encode(state, Config.JWT_SECRET, algorithm="HS256")
+
+
+def read_login_state(cookie: Optional[str], state: Optional[str]) -> dict:
+    """
+    Verify the login-state cookie against the state returned by the provider
+
+    Raises:
+        OIDCError: If the cookie is missing, tampered with, expired or from another login
+    """
+    if not cookie or not state:
+        raise OIDCError("Missing login state")
+    try:
+        stored = jwt.decode(cookie, Config.JWT_SECRET, algorithms=["HS256"])
+    except jwt.PyJWTError as e:
+        raise OIDCError(f"Invalid login state: {str(e)}")
+    if not hmac.compare_digest(str(stored.get("state", "")), state):
+        raise OIDCError("State does not match this login")
+    return stored
+
+
+def code_challenge(code_verifier: str) -> str:
+    """PKCE S256 challenge of a verifier"""
+    digest = hashlib.sha256(code_verifier.encode()).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+# Google as configured for this deployment (refreshed by main.lifespan)
+google_oidc = OIDCProvider(
+    discovery_url="https://accounts.google.com/.well-known/openid-configuration",
+    client_id=Config.GOOGLE_CLIENT_ID,
+    client_secret=Config.GOOGLE_CLIENT_SECRET,
+    refresh_seconds=Config.OIDC_REFRESH_SECONDS
+)
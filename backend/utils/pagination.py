@@ -0,0 +1,54 @@
+"""
+Cursor (keyset) pagination helpers for list endpoints.
+Cursors are opaque to clients and encode the (created_at, id) of the last row served.
+"""
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    Encode the sort key of the last row on a page into an opaque cursor
+
+    Args:
+        created_at: Creation timestamp of the last row
+        row_id: Primary key of the last row (tie-breaker for equal timestamps)
+
+    Returns:
+        URL-safe cursor string
+    """
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string from a previous page
+
+    Returns:
+        Tuple of (created_at, row_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at_str, row_id_str = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at_str), int(row_id_str)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+
+def cursor_pagination(rows: list, limit: int, next_cursor: Optional[str]) -> dict:
+    """Build the pagination block returned alongside a cursor-paginated page"""
+    return {
+        "limit": limit,
+        "count": len(rows),
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    }
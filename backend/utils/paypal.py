@@ -1,8 +1,9 @@
 import paypalrestsdk
 import logging
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from config import Config
+from utils.metrics import observe_outbound
 
 logger = logging.getLogger(__name__)
 
@@ -36,9 +37,58 @@ def initiate_paypal_payment(
     Returns:
         Approval URL for PayPal payment or None if failed
     """
+    return _create_paypal_payment(
+        items=[(nft_id, amount)],
+        description=f"Purchase of NFT #{nft_id}",
+        transaction_id=transaction_id,
+        buyer_currency=buyer_currency,
+        return_url=return_url,
+        cancel_url=cancel_url
+    )
+
+def initiate_paypal_cart_payment(
+    items: List[Tuple[int, float]],
+    transaction_id: str,
+    buyer_currency: str,
+    return_url: str,
+    cancel_url: str
+) -> Optional[str]:
+    """
+    Initiate a single PayPal payment covering several NFTs
+    
+    Args:
+        items: (nft_id, price) pairs in the cart
+        transaction_id: Transaction reference ID of the parent cart transaction
+        buyer_currency: Currency code (USD, EUR, etc.)
+        return_url: URL to redirect after successful payment
+        cancel_url: URL to redirect after cancelled payment
+    
+    Returns:
+        Approval URL for PayPal payment or None if failed
+    """
+    return _create_paypal_payment(
+        items=items,
+        description=f"Purchase of {len(items)} NFTs",
+        transaction_id=transaction_id,
+        buyer_currency=buyer_currency,
+        return_url=return_url,
+        cancel_url=cancel_url
+    )
+
+def _create_paypal_payment(
+    items: List[Tuple[int, float]],
+    description: str,
+    transaction_id: str,
+    buyer_currency: str,
+    return_url: str,
+    cancel_url: str
+) -> Optional[str]:
+    """Create a PayPal sale for one or more NFTs and return its approval URL"""
     try:
         configure_paypal()
         
+        total = sum(amount for _, amount in items)
+        
         payment = paypalrestsdk.Payment({
             "intent": "sale",
             "payer": {
@@ -50,24 +100,30 @@ def initiate_paypal_payment(
             },
             "transactions": [{
                 "item_list": {
-                    "items": [{
-                        "name": f"NFT #{nft_id}",
-                        "sku": f"nft_{nft_id}",
-                        "price": str(amount),
-                        "currency": buyer_currency,
-                        "quantity": 1
-                    }]
+                    "items": [
+                        {
+                            "name": f"NFT #{nft_id}",
+                            "sku": f"nft_{nft_id}",
+                            "price": f"{amount:.2f}",
+                            "currency": buyer_currency,
+                            "quantity": 1
+                        }
+                        for nft_id, amount in items
+                    ]
                 },
                 "amount": {
-                    "total": str(amount),
+                    "total": f"{total:.2f}",
                     "currency": buyer_currency
                 },
-                "description": f"Purchase of NFT #{nft_id}",
+                "description": description,
                 "custom": transaction_id  # Store transaction reference
             }]
         })
         
-        if payment.create():
+        with observe_outbound("paypal", "create_payment"):
+            created = payment.create()
+        
+        if created:
             logger.info(f"PayPal payment created: {payment.id} for transaction {transaction_id}")
             
             # Find approval URL
@@ -100,9 +156,11 @@ def execute_paypal_payment(payment_id: str, payer_id: str) -> bool:
     try:
         configure_paypal()
         
-        payment = paypalrestsdk.Payment.find(payment_id)
+        with observe_outbound("paypal", "execute_payment"):
+            payment = paypalrestsdk.Payment.find(payment_id)
+            executed = payment.execute({"payer_id": payer_id})
         
-        if payment.execute({"payer_id": payer_id}):
+        if executed:
             logger.info(f"PayPal payment executed successfully: {payment_id}")
             return True
         else:
@@ -126,7 +184,8 @@ def get_payment_details(payment_id: str) -> Optional[dict]:
     try:
         configure_paypal()
         
-        payment = paypalrestsdk.Payment.find(payment_id)
+        with observe_outbound("paypal", "find_payment"):
+            payment = paypalrestsdk.Payment.find(payment_id)
         
         if payment:
             return {
@@ -0,0 +1,207 @@
+"""
+Sampling profiler for requests served in production.
+
+A profiled request is observed from outside: while it runs, a background
+thread wakes every PROFILE_INTERVAL_MS, reads the current stacks of the
+other threads (sys._current_frames()) and counts the stack of the event loop
+thread whenever the profiled request's task is the one running. The request
+itself executes untouched (no tracing hook, no per-call cost), and the sampler
+only exists while some request is being profiled. A thread busy running Python
+hands over the GIL only every sys.getswitchinterval() (5ms), so CPU-bound code
+is sampled about every 10ms at the default interval.
+
+Sync endpoints and dependencies run on the request thread pool. While the
+profiled task is suspended, the stacks of busy pool threads are counted
+under a "[thread pool]" root frame; with other requests in flight these may
+include their sync work too.
+
+Profiles are written in the folded (collapsed) stack format, one
+"frame;frame;frame count" line per distinct stack, read by flamegraph.pl,
+inferno and speedscope. Frames are "function (file:first line)", so samples
+aggregate per function rather than per line.
+
+Two ways in (middleware.profiling.ProfilingMiddleware):
+- On demand: an admin sends X-Profile: 1 or ?profile=1 and gets the profile
+  name back in X-Profile; the file is request-<request id>.folded in
+  PROFILE_DIR.
+- Rolling: with PROFILE_EVERY_N set, one request in N is profiled and its
+  stacks are added under a root frame naming the route. The totals are
+  rewritten to rolling-<pid>.folded every PROFILE_FLUSH_SECONDS.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Dict, List, Optional, Set
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOOP_ROOT = "[event loop]"
+THREAD_POOL_ROOT = "[thread pool]"
+
+# Files of the interpreter and installed packages are shown relative to these
+_PATH_PREFIXES = sorted(
+    {os.path.join(os.path.abspath(path), "") for path in sys.path if path and os.path.isdir(path)},
+    key=len, reverse=True
+)
+
+
+class Profile:
+    """Sampled stacks of one request"""
+
+    def __init__(self, task: asyncio.Task, loop: asyncio.AbstractEventLoop):
+        self.task = task
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def folded(self, root: Optional[str] = None) -> str:
+        """Stacks in the folded format, optionally below an extra root frame"""
+        prefix = f"{root};" if root else ""
+        return "".join(f"{prefix}{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class StackSampler:
+    """Background thread sampling the stacks of profiled requests while any are active"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._profiles: Set[Profile] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict[CodeType, str] = {}
+
+    def start(self) -> Profile:
+        """Start profiling the current task (must be called on the event loop)"""
+        profile = Profile(asyncio.current_task(), asyncio.get_running_loop())
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        return profile
+
+    def stop(self, profile: Profile) -> Profile:
+        with self._lock:
+            self._profiles.discard(profile)
+        profile.seconds = time.perf_counter() - profile.started
+        return profile
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval_seconds)
+            with self._lock:
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._thread = None
+                    return
+            try:
+                self._sample(profiles)
+            except Exception as e:
+                logger.warning(f"Profiler sample failed: {e}")
+
+    def _sample(self, profiles: List[Profile]):
+        frames = sys._current_frames()
+        own = threading.get_ident()
+        pool_stacks = None
+        for profile in profiles:
+            if asyncio.current_task(profile.loop) is profile.task:
+                frame = frames.get(profile.loop_thread)
+                if frame is not None:
+                    profile.stacks[f"{EVENT_LOOP_ROOT};{self._collapse(frame)}"] += 1
+                    profile.samples += 1
+                continue
+            # Suspended: count what the request thread pool is busy with
+            if pool_stacks is None:
+                pool_stacks = [
+                    stack for thread_id, frame in frames.items()
+                    if thread_id != own and thread_id != profile.loop_thread
+                    for stack in [self._pool_stack(frame)] if stack
+                ]
+            for stack in pool_stacks:
+                profile.stacks[f"{THREAD_POOL_ROOT};{stack}"] += 1
+            profile.samples += 1
+
+    def _pool_stack(self, frame: FrameType) -> Optional[str]:
+        """Collapsed stack of a busy request pool (anyio worker) thread, else None"""
+        code = frame.f_code
+        if code.co_filename.endswith(("threading.py", "queue.py")):
+            return None  # Idle, waiting for work
+        stack = self._collapse(frame)
+        return stack if "anyio" in stack else None
+
+    def _collapse(self, frame: FrameType) -> str:
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = _label(code)
+            labels.append(label)
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+
+def _label(code: CodeType) -> str:
+    filename = code.co_filename
+    for prefix in _PATH_PREFIXES:
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):]
+            break
+    # ";" separates frames and " " the count in the folded format
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class RollingProfiles:
+    """Stacks of the 1-in-N sampled requests, aggregated per route and flushed to a file"""
+
+    def __init__(self, path: str, flush_seconds: float):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.stacks: Counter = Counter()
+        self.requests: Counter = Counter()
+        self._flushed_at = time.monotonic()
+
+    def add(self, route: str, profile: Profile):
+        self.requests[route] += 1
+        for stack, count in profile.stacks.items():
+            self.stacks[f"{route};{stack}"] += count
+
+    def due(self) -> bool:
+        return bool(self.stacks) and time.monotonic() - self._flushed_at >= self.flush_seconds
+
+    def flush(self):
+        """Rewrite the file with the totals so far (blocking; run off the event loop)"""
+        self._flushed_at = time.monotonic()
+        # dict() copies in one step, so requests finishing meanwhile cannot change it under us
+        stacks = Counter(dict(self.stacks))
+        if not stacks:
+            return
+        write_profile(self.path, "".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+
+
+def write_profile(path: str, folded: str):
+    """Write a folded profile atomically, so a reader never sees half a file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    partial = f"{path}.tmp"
+    with open(partial, "w") as f:
+        f.write(folded)
+    os.replace(partial, path)
+
+
+def profile_path(name: str) -> str:
+    return os.path.join(Config.PROFILE_DIR, name)
+
+
+sampler = StackSampler(Config.PROFILE_INTERVAL_MS / 1000)
+rolling = RollingProfiles(profile_path(f"rolling-{os.getpid()}.folded"), Config.PROFILE_FLUSH_SECONDS)
@@ -9,6 +9,9 @@ import base64
 from typing import Optional
 from config import Config
 
+# Largest amount accepted in a single UPI payment request (INR)
+UPI_MAX_AMOUNT = 100000
+
 def generate_upi_qr(user_email: str, amount: float, transaction_id: str) -> str:
     """
     Generate a UPI QR code for payment
@@ -36,7 +39,7 @@ def generate_upi_qr(user_email: str, amount: float, transaction_id: str) -> str:
     if amount <= 0:
         raise ValueError("Amount must be greater than 0")
     
-    if amount > 100000:  # Reasonable upper limit
+    if amount > UPI_MAX_AMOUNT:  # Reasonable upper limit
         raise ValueError("Amount cannot exceed ₹1,00,000")
     
     # Get UPI ID from configuration
@@ -89,7 +92,7 @@ def validate_upi_payment_data(amount: float, transaction_id: str) -> bool:
         if not isinstance(amount, (int, float)) or amount <= 0:
             return False
         
-        if amount > 100000:  # Upper limit
+        if amount > UPI_MAX_AMOUNT:  # Upper limit
             return False
         
         # Check transaction ID format
@@ -0,0 +1,162 @@
+"""
+Rate limiting with a pluggable backend.
+
+Limits are enforced with GCRA (generic cell rate algorithm): each key stores a
+single "theoretical arrival time", so a check is O(1) in time and memory. The
+in-process backend keeps keys in a bounded LRU; the Redis backend runs the same
+algorithm in a Lua script so limits are shared across workers. If Redis is
+unreachable at startup or fails mid-request, limiting falls back to the
+in-process backend instead of being switched off.
+"""
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+from config import Config
+from utils.auth import request_auth
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryRateLimitBackend:
+    """In-process GCRA limiter with LRU eviction of idle keys"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+
+    async def hit(self, key: str, times: int, seconds: float) -> float:
+        """
+        Record a request against a key
+
+        Args:
+            key: Limiter key (e.g. route and client identity)
+            times: Requests allowed per window
+            seconds: Window length in seconds
+
+        Returns:
+            0 if the request is allowed, otherwise seconds until it would be
+        """
+        now = time.monotonic()
+        interval = seconds / times
+        tat = self._tats.get(key, now)
+        new_tat = max(tat, now) + interval
+        retry_after = new_tat - now - seconds
+        if retry_after > 0:
+            return retry_after
+
+        self._tats[key] = new_tat
+        self._tats.move_to_end(key)
+        if len(self._tats) > self.max_keys:
+            self._tats.popitem(last=False)
+        return 0
+
+
+# KEYS: limiter key
+# ARGV: now (ms), emission interval (ms), window (ms)
+_GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+local new_tat = math.max(tat, now) + interval
+local retry_after = new_tat - now - window
+if retry_after > 0 then
+    return retry_after
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return 0
+"""
+
+
+class RedisRateLimitBackend:
+    """GCRA limiter shared across workers through Redis"""
+
+    KEY_PREFIX = "ratelimit"
+
+    def __init__(self, redis_client, fallback: MemoryRateLimitBackend):
+        self.redis = redis_client
+        self.fallback = fallback
+        self._gcra = redis_client.register_script(_GCRA_SCRIPT)
+
+    async def hit(self, key: str, times: int, seconds: float) -> float:
+        try:
+            retry_after_ms = await self._gcra(
+                keys=[f"{self.KEY_PREFIX}:{key}"],
+                args=[int(time.time() * 1000), int(seconds * 1000 / times), int(seconds * 1000)]
+            )
+            return int(retry_after_ms) / 1000
+        except Exception as e:
+            logger.warning(f"Redis rate limiting failed, using in-process limiter: {e}")
+            return await self.fallback.hit(key, times, seconds)
+
+
+# Active backend; replaced by configure_rate_limiting() at startup
+backend = MemoryRateLimitBackend(max_keys=Config.RATE_LIMIT_MAX_KEYS)
+
+
+async def configure_rate_limiting():
+    """Select the rate limit backend, falling back to in-process limiting if Redis is unreachable"""
+    global backend
+    memory_backend = MemoryRateLimitBackend(max_keys=Config.RATE_LIMIT_MAX_KEYS)
+
+    if Config.RATE_LIMIT_BACKEND.lower() == "redis":
+        try:
+            import redis.asyncio as aioredis
+            client = aioredis.from_url(Config.REDIS_URL, decode_responses=True)
+            await client.ping()
+            backend = RedisRateLimitBackend(client, fallback=memory_backend)
+            logging.info("Redis rate limiter initialized")
+            return backend
+        except Exception as e:
+            logging.warning(f"Redis not available, using in-process rate limiter: {e}")
+
+    backend = memory_backend
+    return backend
+
+
+def client_identity(request: Request) -> tuple[Optional[str], str]:
+    """Return the (user id, client IP) a request is attributed to"""
+    client_ip = request.client.host if request.client else "unknown"
+
+    # An invalid token counts as anonymous; the route's own auth will reject it
+    user_id = request_auth(request).user_id
+
+    return (str(user_id) if user_id else None), client_ip
+
+
+class RateLimiter:
+    """
+    FastAPI dependency enforcing a per-route request limit
+
+    Authenticated requests are limited per user; every request is also
+    limited per client IP with a separate (usually larger) budget so users
+    behind a shared NAT are not throttled as one.
+    """
+
+    def __init__(self, times: int, seconds: int, ip_times: Optional[int] = None):
+        self.times = times
+        self.seconds = seconds
+        self.ip_times = ip_times or times
+
+    async def __call__(self, request: Request):
+        route = request.scope.get("route")
+        path = route.path if route else request.url.path
+        user_id, client_ip = client_identity(request)
+
+        checks = [(f"ip:{client_ip}:{path}", self.ip_times)]
+        if user_id:
+            checks.insert(0, (f"user:{user_id}:{path}", self.times))
+
+        for key, times in checks:
+            retry_after = await backend.hit(key, times, self.seconds)
+            if retry_after > 0:
+                raise HTTPException(
+                    status_code=429,
+                    detail={"success": False, "data": None, "error": "Too many requests"},
+                    headers={"Retry-After": str(math.ceil(retry_after))}
+                )
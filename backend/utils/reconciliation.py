@@ -0,0 +1,329 @@
+"""
+Streaming reconciliation of bank/UPI statements against pending INR payments.
+
+Pending INR transactions are loaded once per run into a dict keyed by txn_ref
+(the `tid` carried in the UPI QR code), so each statement line costs one hash
+lookup. Statement lines are read one at a time and only matched transaction
+IDs are buffered before a bulk UPDATE, so memory stays proportional to the
+number of pending transactions, not to the size of the statement. Amounts are
+compared in integer paise to avoid float rounding. A payment whose NFTs are no
+longer reserved for its transaction (sold or re-reserved meanwhile) is not
+marked paid but reported as a late payment to refund.
+"""
+import csv
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, select, update
+from sqlalchemy.orm import Session
+
+from models.nft import NFT
+from models.transaction import Transaction, TransactionItem, PaymentMethod, TransactionStatus
+from utils.sales_rollup import record_paid_transactions
+
+logger = logging.getLogger(__name__)
+
+# Header names recognised for the reference and amount columns (lowercase)
+REFERENCE_COLUMNS = ("txn_ref", "reference", "ref", "tid", "remarks", "narration", "description")
+AMOUNT_COLUMNS = ("amount", "credit", "credit_amount", "deposit")
+
+# txn_refs are UUID4 strings; narration columns embed them in free text
+_TXN_REF_PATTERN = re.compile(r"[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}")
+
+
+def to_minor_units(value) -> Optional[int]:
+    """Convert an amount such as "1,000.50" to integer paise, or None if unparsable"""
+    try:
+        amount = Decimal(str(value).replace(",", "").strip())
+    except (InvalidOperation, ValueError):
+        return None
+    if not amount.is_finite():
+        return None
+    return int((amount * 100).to_integral_value())
+
+
+@dataclass
+class ReconciliationReport:
+    """Outcome of a statement run; per-category lists are capped at max_rows"""
+
+    max_rows: int = 1000
+    dry_run: bool = False
+    lines: int = 0
+    matched: int = 0
+    matched_amount: int = 0  # paise
+    amount_mismatches: List[dict] = field(default_factory=list)
+    amount_mismatch_count: int = 0
+    duplicates: List[dict] = field(default_factory=list)
+    duplicate_count: int = 0
+    unmatched: List[dict] = field(default_factory=list)
+    unmatched_count: int = 0
+    invalid: List[dict] = field(default_factory=list)
+    invalid_count: int = 0
+    unpaid_transaction_ids: List[int] = field(default_factory=list)
+    late_payment_transaction_ids: List[int] = field(default_factory=list)  # Paid, but NFTs no longer held
+    sold_nft_ids: List[int] = field(default_factory=list)
+
+    def _record(self, rows: List[dict], entry: dict):
+        if len(rows) < self.max_rows:
+            rows.append(entry)
+
+    def to_dict(self) -> dict:
+        return {
+            "dry_run": self.dry_run,
+            "lines": self.lines,
+            "matched": self.matched,
+            "matched_amount": f"{Decimal(self.matched_amount) / 100:.2f}",
+            "amount_mismatch_count": self.amount_mismatch_count,
+            "duplicate_count": self.duplicate_count,
+            "unmatched_count": self.unmatched_count,
+            "invalid_count": self.invalid_count,
+            "unpaid_count": len(self.unpaid_transaction_ids),
+            "late_payment_count": len(self.late_payment_transaction_ids),
+            "amount_mismatches": self.amount_mismatches,
+            "duplicates": self.duplicates,
+            "unmatched": self.unmatched,
+            "invalid": self.invalid,
+            "unpaid_transaction_ids": self.unpaid_transaction_ids[:self.max_rows],
+            "late_payment_transaction_ids": self.late_payment_transaction_ids[:self.max_rows],
+        }
+
+
+def build_pending_index(db: Session) -> Dict[str, Tuple[int, Optional[int]]]:
+    """
+    Load pending INR transactions keyed by txn_ref
+
+    Returns:
+        Mapping of txn_ref to (transaction ID, expected amount in paise)
+    """
+    rows = db.execute(
+        select(Transaction.id, Transaction.txn_ref, Transaction.amount).where(
+            Transaction.payment_method == PaymentMethod.INR,
+            Transaction.status == TransactionStatus.PENDING,
+            Transaction.txn_ref.isnot(None)
+        )
+    )
+    return {txn_ref: (transaction_id, to_minor_units(amount)) for transaction_id, txn_ref, amount in rows}
+
+
+def _find_column(header: List[str], candidates: Iterable[str], override: Optional[str]) -> int:
+    names = [name.strip().lower() for name in header]
+    for candidate in ([override.lower()] if override else candidates):
+        if candidate in names:
+            return names.index(candidate)
+    raise ValueError(f"Statement header has no {'/'.join([override] if override else candidates)} column")
+
+
+def _fulfillable(db: Session, transaction_ids: List[int]) -> Tuple[List[int], List[int]]:
+    """
+    Split transactions into those whose NFTs are all still reserved and unsold, and the rest
+
+    An NFT held by several of the transactions goes to the newest one, which made
+    the current reservation. The NFT rows stay locked until the caller commits
+    (PostgreSQL), so the answer holds for the UPDATEs that follow.
+    """
+    rows = []
+    # Single-NFT purchases, then cart line items
+    for nft_of_transaction in (
+        select(Transaction.id, NFT.id, NFT.is_reserved, NFT.is_sold)
+        .where(NFT.id == Transaction.nft_id, Transaction.id.in_(transaction_ids)),
+        select(TransactionItem.transaction_id, NFT.id, NFT.is_reserved, NFT.is_sold)
+        .where(NFT.id == TransactionItem.nft_id, TransactionItem.transaction_id.in_(transaction_ids)),
+    ):
+        rows += db.execute(nft_of_transaction.with_for_update(of=NFT)).all()
+
+    holder: Dict[int, int] = {}
+    for transaction_id, nft_id, _, _ in rows:
+        holder[nft_id] = max(holder.get(nft_id, transaction_id), transaction_id)
+
+    held = {transaction_id: True for transaction_id, _, _, _ in rows}
+    for transaction_id, nft_id, is_reserved, is_sold in rows:
+        if not is_reserved or is_sold or holder[nft_id] != transaction_id:
+            held[transaction_id] = False
+
+    fulfillable = [transaction_id for transaction_id in transaction_ids if held.get(transaction_id)]
+    return fulfillable, [transaction_id for transaction_id in transaction_ids if not held.get(transaction_id)]
+
+
+def _mark_paid(db: Session, transaction_ids: List[int], paid_at: datetime) -> Tuple[List[int], List[int]]:
+    """
+    Mark a batch of transactions paid and their NFTs sold
+
+    Transactions whose NFTs are no longer reserved for them are left pending
+    and returned as late payments to refund, rather than overwriting a sale.
+
+    Returns:
+        Tuple of (sold NFT IDs, late payment transaction IDs)
+    """
+    transaction_ids, late_ids = _fulfillable(db, transaction_ids)
+    for transaction_id in late_ids:
+        logger.error(
+            f"Late payment for transaction {transaction_id} (NFTs no longer reserved for it); refund required",
+            extra={"event": "LATE_PAYMENT", "transaction_id": transaction_id}
+        )
+
+    # Only rows still pending are moved (and rolled up), in case of a concurrent verification
+    if transaction_ids:
+        transaction_ids = db.execute(
+            update(Transaction)
+            .where(Transaction.id.in_(transaction_ids), Transaction.status == TransactionStatus.PENDING)
+            .values(status=TransactionStatus.PAID, updated_at=paid_at, completed_at=paid_at)
+            .returning(Transaction.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+    if not transaction_ids:
+        db.commit()
+        return [], late_ids
+
+    sold_values = dict(is_sold=True, is_reserved=False, sold_to_user_id=Transaction.user_id, sold_at=paid_at)
+    # Same guard as routes.purchase.mark_transaction_nfts_sold: never overwrite a sale
+    unsold = and_(NFT.is_sold == False, NFT.is_reserved == True)
+    # Single-NFT purchases
+    sold = db.execute(
+        update(NFT)
+        .where(NFT.id == Transaction.nft_id, Transaction.id.in_(transaction_ids), unsold)
+        .values(**sold_values)
+        .returning(NFT.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    # Cart line items
+    sold += db.execute(
+        update(NFT)
+        .where(
+            NFT.id == TransactionItem.nft_id,
+            TransactionItem.transaction_id == Transaction.id,
+            Transaction.id.in_(transaction_ids),
+            unsold
+        )
+        .values(**sold_values)
+        .returning(NFT.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+    record_paid_transactions(db, transaction_ids, paid_at)
+    db.commit()
+    return list(sold), late_ids
+
+
+def _apply(report: ReconciliationReport, outcome: Tuple[List[int], List[int]]):
+    sold_nft_ids, late_ids = outcome
+    report.sold_nft_ids.extend(sold_nft_ids)
+    report.late_payment_transaction_ids.extend(late_ids)
+
+
+def reconcile_statement(
+    db: Session,
+    lines: Iterable[str],
+    reference_column: Optional[str] = None,
+    amount_column: Optional[str] = None,
+    batch_size: int = 1000,
+    max_report_rows: int = 1000,
+    dry_run: bool = False
+) -> ReconciliationReport:
+    """
+    Match a CSV statement against pending INR transactions and mark matches paid
+
+    Args:
+        db: Database session
+        lines: Statement lines, header first (a file object or any line iterator)
+        reference_column: Header of the column holding the txn_ref (auto-detected if None)
+        amount_column: Header of the credited amount column (auto-detected if None)
+        batch_size: Matched transactions per bulk UPDATE
+        max_report_rows: Cap on rows listed per report category
+        dry_run: Report matches without updating the database
+
+    Returns:
+        ReconciliationReport
+
+    Raises:
+        ValueError: If the statement is empty or its columns cannot be found
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if not header:
+        raise ValueError("Statement is empty")
+    ref_index = _find_column(header, REFERENCE_COLUMNS, reference_column)
+    amount_index = _find_column(header, AMOUNT_COLUMNS, amount_column)
+    width = max(ref_index, amount_index) + 1
+
+    index = build_pending_index(db)
+    matched_refs = set()
+    batch: List[int] = []
+    report = ReconciliationReport(max_rows=max_report_rows, dry_run=dry_run)
+    paid_at = datetime.utcnow()
+
+    for line_number, row in enumerate(reader, start=2):
+        if not row:
+            continue
+        report.lines += 1
+
+        if len(row) < width:
+            report.invalid_count += 1
+            report._record(report.invalid, {"line": line_number, "error": "Missing columns"})
+            continue
+
+        reference = row[ref_index].strip()
+        entry = index.get(reference)
+        # Narration columns embed the txn_ref; only search text that could hold a UUID
+        if entry is None and reference not in matched_refs and reference.count("-") >= 4:
+            found = _TXN_REF_PATTERN.search(reference)
+            if found:
+                reference = found.group(0)
+                entry = index.get(reference)
+
+        # Amounts are only parsed for lines that can match, most lines are unrelated credits
+        if entry is None:
+            if reference in matched_refs:
+                report.duplicate_count += 1
+                report._record(report.duplicates, {"line": line_number, "txn_ref": reference})
+            else:
+                report.unmatched_count += 1
+                if len(report.unmatched) < max_report_rows:
+                    report.unmatched.append({"line": line_number, "reference": reference, "amount": row[amount_index].strip()})
+            continue
+
+        amount = to_minor_units(row[amount_index])
+        if amount is None:
+            report.invalid_count += 1
+            report._record(report.invalid, {"line": line_number, "error": "Invalid amount"})
+            continue
+
+        transaction_id, expected = entry
+        if expected != amount:
+            report.amount_mismatch_count += 1
+            report._record(report.amount_mismatches, {
+                "line": line_number,
+                "txn_ref": reference,
+                "transaction_id": transaction_id,
+                "expected": f"{Decimal(expected) / 100:.2f}" if expected is not None else None,
+                "received": f"{Decimal(amount) / 100:.2f}"
+            })
+            continue
+
+        del index[reference]
+        matched_refs.add(reference)
+        report.matched += 1
+        report.matched_amount += amount
+        batch.append(transaction_id)
+
+        if len(batch) >= batch_size:
+            if not dry_run:
+                _apply(report, _mark_paid(db, batch, paid_at))
+            batch = []
+
+    if batch and not dry_run:
+        _apply(report, _mark_paid(db, batch, paid_at))
+
+    # Whatever is left in the index was not paid in this statement
+    report.unpaid_transaction_ids = sorted(transaction_id for transaction_id, _ in index.values())
+
+    logger.info(
+        f"Reconciled {report.lines} statement lines: {report.matched} matched, "
+        f"{report.amount_mismatch_count} amount mismatches, {report.unmatched_count} unmatched, "
+        f"{report.duplicate_count} duplicates, {report.invalid_count} invalid, "
+        f"{len(report.late_payment_transaction_ids)} late payments"
+    )
+    return report
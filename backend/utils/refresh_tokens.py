@@ -0,0 +1,139 @@
+"""
+Rotating refresh tokens.
+
+Clients get an opaque refresh token alongside each short-lived access token.
+Only its SHA-256 hash is stored, so a leaked table cannot be replayed. Every
+refresh revokes the presented token and issues its successor in the same
+family, with a single conditional UPDATE so concurrent refreshes cannot both
+succeed. Presenting an already-rotated token means it was copied; the whole
+family is revoked and that login has to start over.
+
+The token only travels in an HttpOnly cookie scoped to /auth, so page scripts
+never see it and it is not sent with other API requests.
+"""
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, select, update
+from sqlalchemy.orm import Session
+
+from config import Config
+from models.auth_token import RefreshToken
+
+REFRESH_TOKEN_COOKIE = "refresh_token"
+
+
+class InvalidRefreshToken(ValueError):
+    """Refresh token is unknown, expired or revoked"""
+
+
+def hash_token(token: str) -> str:
+    """Stored form of a refresh token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_refresh_token(db: Session, user_id: int, family_id: Optional[str] = None) -> Tuple[str, RefreshToken]:
+    """
+    Create a refresh token; the caller commits
+
+    Args:
+        db: Database session
+        user_id: Token owner
+        family_id: Family of the token being rotated (a new family per login)
+
+    Returns:
+        The token to hand to the client and its row
+    """
+    token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    row = RefreshToken(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4().hex,
+        token_hash=hash_token(token),
+        created_at=now,
+        expires_at=now + timedelta(days=Config.REFRESH_TOKEN_DAYS)
+    )
+    db.add(row)
+    db.flush()
+    return token, row
+
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[int, str]:
+    """
+    Exchange a refresh token for its successor; the caller commits
+
+    Raises:
+        InvalidRefreshToken: If the token is unknown, expired or already used
+            (in which case its family is revoked; commit to persist that)
+
+    Returns:
+        (user_id, new refresh token)
+    """
+    now = datetime.utcnow()
+    token_hash = hash_token(token)
+    used = db.execute(
+        update(RefreshToken)
+        .where(
+            and_(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.revoked_at.is_(None),
+                RefreshToken.expires_at > now
+            )
+        )
+        .values(revoked_at=now)
+        .returning(RefreshToken.id, RefreshToken.user_id, RefreshToken.family_id)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+    if used is None:
+        family_id = db.execute(
+            select(RefreshToken.family_id).where(
+                and_(RefreshToken.token_hash == token_hash, RefreshToken.revoked_at.is_not(None))
+            )
+        ).scalar()
+        if family_id is not None:
+            revoke_refresh_family(db, family_id)
+            raise InvalidRefreshToken("Refresh token reused")
+        raise InvalidRefreshToken("Invalid or expired refresh token")
+
+    new_token, successor = issue_refresh_token(db, used.user_id, used.family_id)
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == used.id)
+        .values(replaced_by_id=successor.id)
+        .execution_options(synchronize_session=False)
+    )
+    return used.user_id, new_token
+
+
+def revoke_refresh_family(db: Session, family_id: str) -> int:
+    """
+    Revoke every live token of a family; the caller commits
+
+    Returns:
+        Number of tokens revoked
+    """
+    return db.execute(
+        update(RefreshToken)
+        .where(and_(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None)))
+        .values(revoked_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def revoke_refresh_token(db: Session, token: str, user_id: int) -> int:
+    """
+    Revoke the family of a user's refresh token (logout); the caller commits
+
+    Returns:
+        Number of tokens revoked
+    """
+    family_id = db.execute(
+        select(RefreshToken.family_id).where(
+            and_(RefreshToken.token_hash == hash_token(token), RefreshToken.user_id == user_id)
+        )
+    ).scalar()
+    return revoke_refresh_family(db, family_id) if family_id is not None else 0
@@ -0,0 +1,168 @@
+"""
+Per-client request counts over a sliding window, for security monitoring.
+
+SecurityLoggingMiddleware counts every request per client IP and reports
+clients exceeding SECURITY_REQUEST_LIMIT requests per window. Counts are kept
+in fixed-size rings of time buckets (SECURITY_COUNTER_BUCKETS per window), so
+a hit costs O(1) time however busy the client is, and each key costs a
+constant amount of memory. The in-process backend tracks at most
+SECURITY_COUNTER_MAX_KEYS clients, evicting the least recently seen; the
+Redis backend keeps one small hash per client with an expiry, so counts are
+shared across workers. As with rate limiting, Redis failures fall back to
+the in-process counter.
+
+The window slides one bucket at a time: a count covers between
+window - window / buckets and window seconds of history.
+"""
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, List
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class _Ring:
+    """Bucket counts of one key; counts[bucket % len(counts)] for the last len(counts) buckets"""
+
+    __slots__ = ("bucket", "total", "counts")
+
+    def __init__(self, bucket: int, buckets: int):
+        self.bucket = bucket
+        self.total = 0
+        self.counts: List[int] = [0] * buckets
+
+
+class MemoryRequestCounter:
+    """In-process bucketed sliding-window counter with LRU eviction of idle keys"""
+
+    def __init__(
+        self,
+        window_seconds: float = 60.0,
+        buckets: int = 12,
+        max_keys: int = 100000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.max_keys = max_keys
+        self.clock = clock
+        self._rings: "OrderedDict[str, _Ring]" = OrderedDict()
+
+    def _advance(self, ring: _Ring, bucket: int):
+        """Zero the buckets that slid out of the window since the ring was last touched"""
+        if bucket - ring.bucket >= self.buckets:
+            ring.counts = [0] * self.buckets
+            ring.total = 0
+        else:
+            for expired in range(ring.bucket + 1, bucket + 1):
+                index = expired % self.buckets
+                ring.total -= ring.counts[index]
+                ring.counts[index] = 0
+        ring.bucket = bucket
+
+    async def hit(self, key: str) -> int:
+        """
+        Count a request against a key
+
+        Returns:
+            Requests for the key in the current window, this one included
+        """
+        bucket = int(self.clock() // self.bucket_seconds)
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = self._rings[key] = _Ring(bucket, self.buckets)
+            if len(self._rings) > self.max_keys:
+                self._rings.popitem(last=False)
+        else:
+            self._rings.move_to_end(key)
+            if bucket > ring.bucket:
+                self._advance(ring, bucket)
+
+        ring.counts[bucket % self.buckets] += 1
+        ring.total += 1
+        return ring.total
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+
+# KEYS: counter hash of a client
+# ARGV: current bucket, buckets per window, expiry (s)
+_WINDOW_SCRIPT = """
+local current = tonumber(ARGV[1])
+local buckets = tonumber(ARGV[2])
+redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+local total = 0
+local fields = redis.call('HGETALL', KEYS[1])
+for i = 1, #fields, 2 do
+    if tonumber(fields[i]) <= current - buckets then
+        redis.call('HDEL', KEYS[1], fields[i])
+    else
+        total = total + tonumber(fields[i + 1])
+    end
+end
+return total
+"""
+
+
+class RedisRequestCounter:
+    """Bucketed sliding-window counter shared across workers through Redis"""
+
+    KEY_PREFIX = "reqcount"
+
+    def __init__(self, redis_client, fallback: MemoryRequestCounter):
+        self.redis = redis_client
+        self.fallback = fallback
+        self.buckets = fallback.buckets
+        self.bucket_seconds = fallback.bucket_seconds
+        self.expire_seconds = math.ceil(fallback.window_seconds + fallback.bucket_seconds)
+        self._window = redis_client.register_script(_WINDOW_SCRIPT)
+
+    async def hit(self, key: str) -> int:
+        try:
+            # Wall-clock buckets, so all workers agree on them
+            return int(await self._window(
+                keys=[f"{self.KEY_PREFIX}:{key}"],
+                args=[int(time.time() // self.bucket_seconds), self.buckets, self.expire_seconds]
+            ))
+        except Exception as e:
+            logger.warning(f"Redis request counting failed, using in-process counter: {e}")
+            return await self.fallback.hit(key)
+
+
+def _memory_counter() -> MemoryRequestCounter:
+    return MemoryRequestCounter(
+        window_seconds=Config.SECURITY_WINDOW_SECONDS,
+        buckets=Config.SECURITY_COUNTER_BUCKETS,
+        max_keys=Config.SECURITY_COUNTER_MAX_KEYS
+    )
+
+
+# Active counter; replaced by configure_request_counting() at startup
+counter = _memory_counter()
+
+
+async def configure_request_counting():
+    """Select the counter backend, falling back to in-process counting if Redis is unreachable"""
+    global counter
+    memory_counter = _memory_counter()
+
+    if Config.SECURITY_COUNTER_BACKEND.lower() == "redis":
+        try:
+            import redis.asyncio as aioredis
+            client = aioredis.from_url(Config.REDIS_URL, decode_responses=True)
+            await client.ping()
+            counter = RedisRequestCounter(client, fallback=memory_counter)
+            logging.info("Redis request counter initialized")
+            return counter
+        except Exception as e:
+            logging.warning(f"Redis not available, using in-process request counter: {e}")
+
+    counter = memory_counter
+    return counter
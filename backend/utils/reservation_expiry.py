@@ -0,0 +1,231 @@
+"""
+In-memory expiry timers for NFT reservations.
+
+Every reservation is armed in a min-heap keyed by its expiry deadline, rounded
+up to the whole second so reservations expiring in the same second are
+released together in one batch. Arming is O(log n); cancelling is O(1) and
+lazy (the heap entry is skipped when it surfaces), with the heap compacted
+once stale entries outnumber live ones.
+
+The heap is rebuilt from nfts.reserved_at when the engine starts, so
+reservations made before a restart still expire on time. Releases are
+guarded in SQL (still reserved, unsold and past the TTL), which makes firing
+a stale timer harmless. The periodic sweep in utils.scheduler remains as a
+backstop for reservations armed in other worker processes.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Cancelled entries tolerated in the heap before it is compacted
+_COMPACT_MIN_STALE = 1024
+
+
+def _epoch_seconds(reserved_at: datetime) -> float:
+    """Epoch seconds of a reserved_at value (naive values are UTC, as stored)"""
+    if reserved_at.tzinfo is None:
+        reserved_at = reserved_at.replace(tzinfo=timezone.utc)
+    return reserved_at.timestamp()
+
+
+class ReservationExpiryEngine:
+    """
+    Min-heap of reservation deadlines with a single asyncio task firing them
+
+    The engine only tracks timers; releasing is delegated to the release
+    callback given to start(), which receives a batch of due NFT IDs.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_batch: int = 1000,
+        retry_seconds: float = 5.0,
+        max_sleep: float = 60.0
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_batch = max_batch
+        self.retry_seconds = retry_seconds
+        self.max_sleep = max_sleep
+        self._heap: List[Tuple[int, int]] = []
+        self._deadlines: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._sleep_until = math.inf
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, nft_id: int) -> bool:
+        return nft_id in self._deadlines
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def deadline_for(self, reserved_at: datetime) -> int:
+        """Expiry deadline (whole epoch seconds) of a reservation made at reserved_at"""
+        return math.ceil(_epoch_seconds(reserved_at) + self.ttl_seconds)
+
+    def arm(self, nft_id: int, reserved_at: datetime):
+        """
+        Start (or restart) the expiry timer of a reservation
+
+        Args:
+            nft_id: Reserved NFT
+            reserved_at: Reservation time as stored in nfts.reserved_at
+        """
+        self._push(nft_id, self.deadline_for(reserved_at))
+
+    def cancel(self, nft_id: int) -> bool:
+        """
+        Stop the expiry timer of a reservation (e.g. when payment is completed)
+
+        Returns:
+            True if a timer was armed for the NFT
+        """
+        if self._deadlines.pop(nft_id, None) is None:
+            return False
+        self._maybe_compact()
+        return True
+
+    def load(self, rows: Iterable[Tuple[int, datetime]]):
+        """
+        Replace every timer with the given reservations in O(n)
+
+        Args:
+            rows: (nft_id, reserved_at) of every active reservation
+        """
+        self._deadlines = {nft_id: self.deadline_for(reserved_at) for nft_id, reserved_at in rows}
+        self._heap = [(deadline, nft_id) for nft_id, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+        self._wake()
+
+    def next_deadline(self) -> Optional[int]:
+        """Earliest armed deadline, or None when nothing is armed"""
+        heap = self._heap
+        while heap and self._deadlines.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now: float, limit: Optional[int] = None) -> List[int]:
+        """
+        Disarm and return NFTs whose deadline has passed, earliest first
+
+        Args:
+            now: Current epoch seconds
+            limit: Maximum number of NFT IDs to return
+        """
+        limit = limit or self.max_batch
+        heap = self._heap
+        due = []
+        while heap and heap[0][0] <= now and len(due) < limit:
+            deadline, nft_id = heapq.heappop(heap)
+            if self._deadlines.get(nft_id) == deadline:
+                del self._deadlines[nft_id]
+                due.append(nft_id)
+        return due
+
+    def start(
+        self,
+        release: Callable[[List[int]], Awaitable[object]],
+        load: Optional[Callable[[], Awaitable[Iterable[Tuple[int, datetime]]]]] = None
+    ):
+        """
+        Start firing timers on the running event loop
+
+        Args:
+            release: Coroutine releasing a batch of due NFT IDs
+            load: Coroutine returning active reservations to rebuild the heap from
+        """
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run(release, load))
+        logger.info("Reservation expiry engine started")
+
+    def stop(self):
+        """Stop firing timers (armed timers are kept)"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        self._wakeup = None
+        logger.info("Reservation expiry engine stopped")
+
+    def _push(self, nft_id: int, deadline: int):
+        self._deadlines[nft_id] = deadline
+        heapq.heappush(self._heap, (deadline, nft_id))
+        self._maybe_compact()
+        if deadline < self._sleep_until:
+            self._wake()
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _maybe_compact(self):
+        stale = len(self._heap) - len(self._deadlines)
+        if stale > _COMPACT_MIN_STALE and stale > len(self._deadlines):
+            self._heap = [(deadline, nft_id) for nft_id, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    async def rebuild(self, load: Callable[[], Awaitable[Iterable[Tuple[int, datetime]]]]):
+        """
+        Arm timers for every active reservation, keeping timers already armed
+
+        Args:
+            load: Coroutine returning (nft_id, reserved_at) of active reservations
+        """
+        try:
+            rows = list(await load())
+            # Keep timers armed while the rows were loading
+            armed = list(self._deadlines.items())
+            self.load(rows)
+            for nft_id, deadline in armed:
+                self._push(nft_id, deadline)
+            logger.info(f"Rebuilt reservation expiry timers for {len(rows)} reservations")
+        except Exception as e:
+            logger.error(f"Error rebuilding reservation expiry timers: {str(e)}")
+
+    async def _run(self, release, load):
+        if load is not None:
+            await self.rebuild(load)
+
+        while True:
+            now = time.time()
+            due = self.pop_due(now)
+            if due:
+                try:
+                    await release(due)
+                except Exception as e:
+                    logger.error(f"Error releasing {len(due)} expired reservations: {str(e)}")
+                    retry_at = math.ceil(now + self.retry_seconds)
+                    for nft_id in due:
+                        if nft_id not in self._deadlines:
+                            self._push(nft_id, retry_at)
+                # Let other tasks run between batches
+                await asyncio.sleep(0)
+                continue
+
+            deadline = self.next_deadline()
+            timeout = self.max_sleep if deadline is None else min(max(deadline - now, 0), self.max_sleep)
+            self._sleep_until = now + timeout
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._sleep_until = math.inf
+
+
+# Global engine instance (started by utils.scheduler.start_scheduler)
+expiry_engine = ReservationExpiryEngine(ttl_seconds=Config.RESERVATION_TTL_MINUTES * 60)
@@ -0,0 +1,187 @@
+"""
+Revocation of access tokens before they expire.
+
+Access tokens are short-lived (ACCESS_TOKEN_MINUTES) and carry a jti. Logging
+out records the jti in revoked_tokens; every worker mirrors the rows of
+unexpired tokens into an in-memory Bloom filter, which verify_jwt_token
+consults on every request. The check hashes the jti once and probes a few
+bits, with no I/O and no per-entry allocation.
+
+A Bloom filter can report a token as revoked when it is not. The filter is
+sized for REVOCATION_FILTER_ERROR_RATE (one in a million by default) and the
+only consequence of a false positive is that the client refreshes its access
+token. There are no false negatives for synced rows.
+
+Workers sync incrementally every REVOCATION_SYNC_SECONDS, re-reading a short
+overlap window so rows committed out of revoked_at order are not missed, and
+rebuild the filter from scratch every REVOCATION_REBUILD_SECONDS to drop
+expired tokens (Bloom filters cannot delete). Revocations made by a worker
+apply to that worker immediately, and to the others within one sync.
+"""
+import hashlib
+import math
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from config import Config
+from models.auth_token import RevokedToken
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings using double hashing of one BLAKE2b digest"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item: str) -> bool:
+        """Add an item; returns False (and leaves count alone) if it was already present"""
+        bits = self._bits
+        new = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationFilter:
+    """Per-worker Bloom filter of revoked jtis, kept in sync with revoked_tokens"""
+
+    def __init__(
+        self,
+        capacity: int = 100000,
+        error_rate: float = 1e-6,
+        overlap_seconds: float = 60.0,
+        rebuild_seconds: float = 600.0
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.overlap_seconds = overlap_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.synced_at: Optional[datetime] = None
+        self.rebuilt_at: Optional[datetime] = None
+        self._bloom = BloomFilter(capacity, error_rate)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """Whether a token may have been revoked (false positives at error_rate)"""
+        return jti is not None and jti in self._bloom
+
+    def add(self, jti: str):
+        """Revoke a jti in this worker (after recording it in revoked_tokens)"""
+        self._bloom.add(jti)
+
+    def needs_rebuild(self, now: datetime) -> bool:
+        """Whether the next sync should rebuild the filter rather than extend it"""
+        return (
+            self.rebuilt_at is None
+            or now - self.rebuilt_at >= timedelta(seconds=self.rebuild_seconds)
+            or self._bloom.count > self._bloom.capacity
+        )
+
+    def since(self) -> Optional[datetime]:
+        """revoked_at from which the next incremental sync reads"""
+        if self.synced_at is None:
+            return None
+        return self.synced_at - timedelta(seconds=self.overlap_seconds)
+
+    def rebuild(self, jtis: Iterable[str], now: datetime) -> int:
+        """Replace the filter with the given jtis, sized to keep the error rate"""
+        jtis = list(jtis)
+        bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        self._bloom = bloom
+        self.rebuilt_at = self.synced_at = now
+        return len(jtis)
+
+    def merge(self, jtis: Iterable[str], now: datetime) -> int:
+        """Add jtis revoked since the last sync; jtis re-read by the overlap window are not counted again"""
+        count = 0
+        for jti in jtis:
+            self._bloom.add(jti)
+            count += 1
+        self.synced_at = now
+        return count
+
+    def to_dict(self):
+        """Filter state for monitoring"""
+        return {
+            "entries": self._bloom.count,
+            "capacity": self._bloom.capacity,
+            "bits": self._bloom.num_bits,
+            "hashes": self._bloom.num_hashes,
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+            "rebuilt_at": self.rebuilt_at.isoformat() if self.rebuilt_at else None,
+        }
+
+
+# Revocation filter of this worker (synced by utils.scheduler.sync_revoked_tokens)
+revocation_filter = RevocationFilter(
+    capacity=Config.REVOCATION_FILTER_CAPACITY,
+    error_rate=Config.REVOCATION_FILTER_ERROR_RATE,
+    overlap_seconds=Config.REVOCATION_SYNC_OVERLAP_SECONDS,
+    rebuild_seconds=Config.REVOCATION_REBUILD_SECONDS
+)
+
+
+def _insert(db: Session):
+    """INSERT construct supporting ON CONFLICT for the session's dialect"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(RevokedToken)
+    return sqlite.insert(RevokedToken)
+
+
+def revoke_access_token(db: Session, claims: dict):
+    """
+    Record an access token as revoked; the caller commits, then adds the jti
+    to revocation_filter
+
+    Args:
+        db: Database session
+        claims: Verified claims of the token (jti, exp, user_id)
+    """
+    db.execute(
+        _insert(db)
+        .values(
+            jti=claims["jti"],
+            user_id=claims.get("user_id"),
+            revoked_at=datetime.utcnow(),
+            expires_at=datetime.utcfromtimestamp(claims["exp"])
+        )
+        .on_conflict_do_nothing(index_elements=[RevokedToken.jti])
+    )
+
+
+def revoked_jtis(db: Session, now: datetime, since: Optional[datetime] = None):
+    """
+    jtis of unexpired revoked tokens, optionally only those revoked at or after since
+
+    Returns:
+        List of jtis
+    """
+    query = select(RevokedToken.jti).where(RevokedToken.expires_at > now)
+    if since is not None:
+        query = query.where(RevokedToken.revoked_at >= since)
+    return db.execute(query).scalars().all()
@@ -0,0 +1,100 @@
+"""
+Incremental maintenance of the daily_sales_rollup table.
+
+Whenever transactions become paid, their NFTs are grouped by currency and
+contract and added to the rollup row for the payment day with a single
+upsert, in the same database transaction as the status change. Analytics
+read only the rollup, so revenue queries never scan or cast transactions.
+
+Only confirmed payments are counted: the PayPal webhook, admin verification
+and statement reconciliation. A buyer marking their own transaction complete
+(POST /transactions/{id}/complete) is not.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models.nft import NFT
+from models.sales_rollup import DailySalesRollup
+from models.transaction import Transaction, TransactionItem, to_amount
+
+logger = logging.getLogger(__name__)
+
+
+def _upsert(db: Session):
+    """Dialect-specific INSERT supporting ON CONFLICT DO UPDATE"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(DailySalesRollup)
+    return sqlite.insert(DailySalesRollup)
+
+
+def record_paid_transactions(db: Session, transaction_ids: Iterable[int], paid_at: datetime):
+    """
+    Add newly paid transactions to the daily sales rollup
+
+    Must be called exactly once per transaction, when its status changes to
+    paid; the caller commits.
+
+    Args:
+        db: Database session
+        transaction_ids: IDs of transactions that just became paid
+        paid_at: Payment completion time (UTC); selects the rollup day
+    """
+    transaction_ids = list(transaction_ids)
+    if not transaction_ids:
+        return
+
+    contract = func.coalesce(NFT.contract_address, "")
+    # Single-NFT purchases carry the amount on the transaction, carts on their items
+    single = (
+        select(Transaction.currency, contract, func.count(), func.sum(Transaction.amount))
+        .join(NFT, NFT.id == Transaction.nft_id)
+        .where(Transaction.id.in_(transaction_ids))
+        .group_by(Transaction.currency, contract)
+    )
+    cart = (
+        select(Transaction.currency, contract, func.count(), func.sum(TransactionItem.amount))
+        .join(TransactionItem, TransactionItem.transaction_id == Transaction.id)
+        .join(NFT, NFT.id == TransactionItem.nft_id)
+        .where(Transaction.id.in_(transaction_ids))
+        .group_by(Transaction.currency, contract)
+    )
+
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for statement in (single, cart):
+        for currency, contract_address, sale_count, gross_amount in db.execute(statement):
+            total = totals[(currency, contract_address)]
+            total[0] += sale_count
+            total[1] += to_amount(gross_amount or 0)
+
+    if not totals:
+        return
+
+    day = paid_at.date()
+    insert_stmt = _upsert(db).values([
+        {
+            "day": day,
+            "currency": currency,
+            "contract_address": contract_address,
+            "sale_count": sale_count,
+            "gross_amount": gross_amount,
+        }
+        for (currency, contract_address), (sale_count, gross_amount) in totals.items()
+    ])
+    db.execute(
+        insert_stmt.on_conflict_do_update(
+            index_elements=["day", "currency", "contract_address"],
+            set_={
+                "sale_count": DailySalesRollup.sale_count + insert_stmt.excluded.sale_count,
+                "gross_amount": DailySalesRollup.gross_amount + insert_stmt.excluded.gross_amount,
+                "updated_at": func.now(),
+            }
+        )
+    )
+    logger.info(f"Added {len(transaction_ids)} paid transactions to the sales rollup for {day}")
@@ -1,35 +1,85 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from datetime import datetime, timedelta
+from datetime import datetime
+from typing import List, Tuple
+import functools
 import logging
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, delete, select, union, update
 
-from db.session import SessionLocal
-from models.nft import NFT
-from models.transaction import Transaction
+from db.session import JobSessionLocal
+from models.nft import NFT, reservation_cutoff, reservation_lapses_at
+from models.transaction import Transaction, TransactionItem, TransactionStatus
+from models.auth_token import RefreshToken, RevokedToken
+from utils.waiting_room import waiting_room
+from utils.inventory import inventory
+from utils.reservation_expiry import expiry_engine
+from utils.leader import scheduler_election
+from utils.revocation import revocation_filter, revoked_jtis
+from utils.jobs import instrumented, run_in_job_thread
+from config import Config
 
 logger = logging.getLogger(__name__)
 
 # Global scheduler instance
 scheduler = None
 
+def leader_only(job):
+    """Run a job only in the worker holding the scheduler lease (every worker without leader election)"""
+    @functools.wraps(job)
+    async def run(*args, **kwargs):
+        if Config.SCHEDULER_LEADER_ELECTION and not scheduler_election.is_leader:
+            return None
+        return await job(*args, **kwargs)
+    return run
+
 def create_scheduler():
     """Create and configure the scheduler"""
     global scheduler
     if scheduler is None:
         scheduler = AsyncIOScheduler()
         
-        # Add job to check expired reservations every 5 minutes
+        # Reservations expire through expiry_engine; this sweep is the backstop
+        # for reservations whose timer lives in another worker process
         scheduler.add_job(
-            func=check_expired_reservations,
-            trigger=IntervalTrigger(minutes=5),
+            func=leader_only(check_expired_reservations),
+            trigger=IntervalTrigger(minutes=Config.RESERVATION_SWEEP_MINUTES),
             id='check_expired_reservations',
             name='Check for expired NFT reservations',
             replace_existing=True
         )
         
-        logger.info("Scheduler created with reservation expiry job")
+        # Rebuild the inventory availability cache from the nfts table,
+        # once at startup and then periodically; the in-process cache is
+        # per worker, so every worker rebuilds its own
+        scheduler.add_job(
+            func=leader_only(reconcile_inventory_cache) if Config.INVENTORY_CACHE_BACKEND == "redis" else reconcile_inventory_cache,
+            trigger=IntervalTrigger(seconds=Config.INVENTORY_RECONCILE_SECONDS),
+            id='reconcile_inventory_cache',
+            name='Rebuild inventory availability cache',
+            next_run_time=datetime.now(),
+            replace_existing=True
+        )
+        
+        # Mirror revoked access tokens into this worker's revocation filter
+        scheduler.add_job(
+            func=sync_revoked_tokens,
+            trigger=IntervalTrigger(seconds=Config.REVOCATION_SYNC_SECONDS),
+            id='sync_revoked_tokens',
+            name='Sync revoked access tokens',
+            next_run_time=datetime.now(),
+            replace_existing=True
+        )
+        
+        scheduler.add_job(
+            func=leader_only(prune_auth_tokens),
+            trigger=IntervalTrigger(hours=1),
+            id='prune_auth_tokens',
+            name='Delete expired refresh and revoked tokens',
+            replace_existing=True
+        )
+        
+        logger.info("Scheduler created with reservation expiry, inventory reconciliation and token jobs")
     
     return scheduler
 
@@ -42,156 +92,300 @@ def start_scheduler():
     if not scheduler.running:
         scheduler.start()
         logger.info("Scheduler started")
+    
+    if Config.SCHEDULER_LEADER_ELECTION:
+        # Every worker fires the timers of reservations it made; the leader
+        # also arms timers for reservations made before it was elected
+        expiry_engine.start(release=release_due_reservations)
+        scheduler_election.start(on_elected=on_elected_leader)
+    else:
+        expiry_engine.start(release=release_due_reservations, load=load_active_reservations)
 
 def stop_scheduler():
     """Stop the scheduler"""
     global scheduler
+    scheduler_election.stop()
+    expiry_engine.stop()
     if scheduler and scheduler.running:
         scheduler.shutdown()
         logger.info("Scheduler stopped")
 
-async def check_expired_reservations():
+async def on_elected_leader():
+    """Take over reservation expiry when this worker becomes the scheduler leader"""
+    await expiry_engine.rebuild(load_active_reservations)
+
+# Stale reservations released per statement pair (one database transaction each)
+EXPIRY_BATCH_SIZE = 1000
+
+def release_reservations(db: Session, stale_nfts) -> Tuple[List[int], List[int]]:
     """
-    Check for expired NFT reservations and release them
-    Reservations expire after 30 minutes
+    Release a set of reserved NFTs and expire their pending transactions
+    
+    Two set-based statements in one database transaction: the NFTs are
+    released with RETURNING, then every pending transaction holding one of
+    them (single purchase or cart item) is expired. The caller commits.
+    
+    Args:
+        db: Database session
+        stale_nfts: SELECT of NFT IDs to release (still reserved and unsold)
+    
+    Returns:
+        Tuple of (released NFT IDs, expired transaction IDs)
     """
+    released_ids = db.execute(
+        update(NFT)
+        .where(NFT.id.in_(stale_nfts))
+        .values(is_reserved=False, reserved_at=None)
+        .returning(NFT.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    
+    if not released_ids:
+        return [], []
+    
+    expired_ids = db.execute(
+        update(Transaction)
+        .where(
+            and_(
+                Transaction.status == TransactionStatus.PENDING,
+                # UNION rather than OR so both lookups can use their nft_id index
+                Transaction.id.in_(
+                    union(
+                        select(Transaction.id).where(Transaction.nft_id.in_(released_ids)),
+                        select(TransactionItem.transaction_id).where(TransactionItem.nft_id.in_(released_ids))
+                    )
+                )
+            )
+        )
+        .values(status=TransactionStatus.EXPIRED, updated_at=datetime.utcnow())
+        .returning(Transaction.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    
+    return released_ids, expired_ids
+
+def _in_session(work, *args):
+    """Run work(db, *args) in a job session and commit (called on the job thread pool)"""
+    db: Session = JobSessionLocal()
     try:
-        db: Session = SessionLocal()
-        
-        # Calculate expiry time (30 minutes ago)
-        expiry_time = datetime.utcnow() - timedelta(minutes=30)
-        
-        # Find reserved NFTs that have expired
-        expired_nfts = db.query(NFT).filter(
+        result = work(db, *args)
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def release_lapsed_reservations(db: Session, nft_ids: List[int], cutoff: datetime) -> Tuple[List[int], List[int]]:
+    """
+    Release reservations among nft_ids made before cutoff; the caller commits
+    
+    Used when a lapsed reservation is taken over at read time, before the
+    expiry timer or sweep got to it, so the previous holder's pending
+    transaction is expired rather than left payable.
+    
+    Returns:
+        Tuple of (released NFT IDs, expired transaction IDs)
+    """
+    return release_reservations(
+        db,
+        select(NFT.id).where(
             and_(
-                NFT.is_reserved == True,
-                NFT.is_sold == False,
+                NFT.id.in_(nft_ids),
+                NFT.is_reserved,
+                ~NFT.is_sold,
+                NFT.reserved_at < cutoff
+            )
+        )
+    )
+
+async def _reopen(released_ids: List[int]):
+    """Released NFTs are back on sale, so let their drop queues admit buyers again"""
+    for nft_id in released_ids:
+        await inventory.set_available(nft_id, True)
+        await waiting_room.reopen(nft_id)
+
+@instrumented("check_expired_reservations")
+async def check_expired_reservations(batch_size: int = EXPIRY_BATCH_SIZE) -> int:
+    """
+    Check for expired NFT reservations and release them
+    Reservations expire after Config.RESERVATION_TTL_MINUTES
+    
+    Works through stale reservations in chunks of batch_size, oldest first,
+    committing each chunk so locks stay short. Each chunk runs on the job
+    thread pool, so the event loop keeps serving requests meanwhile.
+    
+    Returns:
+        Number of reservations released
+    """
+    # Calculate expiry time
+    expiry_time = reservation_cutoff()
+    
+    # One chunk of expired reservations, served by the partial index on reserved_at;
+    # rows locked by a concurrent sweep are skipped (PostgreSQL)
+    stale_nfts = (
+        select(NFT.id)
+        .where(
+            and_(
+                NFT.is_reserved,
+                ~NFT.is_sold,
                 NFT.reserved_at < expiry_time
             )
-        ).all()
+        )
+        .order_by(NFT.reserved_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    
+    total_released = 0
+    while True:
+        released_ids, expired_ids = await run_in_job_thread(_in_session, release_reservations, stale_nfts)
         
-        if expired_nfts:
-            logger.info(f"Found {len(expired_nfts)} expired reservations")
-            
-            for nft in expired_nfts:
-                # Release the reservation
-                nft.is_reserved = False
-                nft.reserved_at = None
-                
-                # Find and cancel related pending transactions
-                pending_transactions = db.query(Transaction).filter(
-                    and_(
-                        Transaction.nft_id == nft.id,
-                        Transaction.status == "pending"
-                    )
-                ).all()
-                
-                for transaction in pending_transactions:
-                    transaction.status = "expired"
-                    transaction.updated_at = datetime.utcnow()
-                    logger.info(f"Expired transaction {transaction.id} for NFT {nft.id}")
-                
-                logger.info(f"Released expired reservation for NFT {nft.id}")
-            
-            db.commit()
-            logger.info(f"Successfully processed {len(expired_nfts)} expired reservations")
+        if not released_ids:
+            break
         
-        db.close()
+        total_released += len(released_ids)
+        logger.info(f"Released {len(released_ids)} expired reservations and expired {len(expired_ids)} transactions")
+        logger.debug(f"Released NFTs {released_ids}; expired transactions {expired_ids}")
+        
+        await _reopen(released_ids)
         
-    except Exception as e:
-        logger.error(f"Error checking expired reservations: {str(e)}")
-        if 'db' in locals():
-            db.rollback()
-            db.close()
+        if len(released_ids) < batch_size:
+            break
+    
+    if total_released:
+        logger.info(f"Successfully processed {total_released} expired reservations")
+    return total_released
 
-def add_reservation_expiry_job(nft_id: int, minutes: int = 30):
+def _inventory_rows(db: Session):
+    return db.query(NFT.id, NFT.is_available(reservation_cutoff()), NFT.is_reserved, NFT.is_sold, NFT.reserved_at).all()
+
+@instrumented("reconcile_inventory_cache")
+async def reconcile_inventory_cache() -> int:
     """
-    Add a specific job to expire a reservation after specified minutes
+    Rebuild the inventory availability cache from the nfts table
+    Corrects any transition the cache missed (other processes, manual updates)
     
-    Args:
-        nft_id: NFT ID to expire
-        minutes: Minutes until expiry (default 30)
+    Returns:
+        Number of NFTs in the rebuilt cache
     """
-    global scheduler
-    if scheduler is None:
-        scheduler = create_scheduler()
-    
-    # Schedule expiry for specific NFT
-    run_date = datetime.utcnow() + timedelta(minutes=minutes)
-    
-    scheduler.add_job(
-        func=expire_specific_reservation,
-        args=[nft_id],
-        trigger='date',
-        run_date=run_date,
-        id=f'expire_nft_{nft_id}',
-        name=f'Expire reservation for NFT {nft_id}',
-        replace_existing=True
+    # Lapsed reservations count as available, as they do for purchases; live
+    # ones carry their lapse time so the cache stops rejecting them on time
+    rows = await run_in_job_thread(_in_session, _inventory_rows)
+    await inventory.rebuild(
+        (
+            nft_id,
+            bool(is_available),
+            reservation_lapses_at(reserved_at) if is_reserved and not is_sold and reserved_at else None
+        )
+        for nft_id, is_available, is_reserved, is_sold, reserved_at in rows
     )
     
-    logger.info(f"Scheduled reservation expiry for NFT {nft_id} at {run_date}")
+    logger.info(f"Rebuilt inventory cache for {len(rows)} NFTs")
+    return len(rows)
+
+def _active_reservations(db: Session) -> List[Tuple[int, datetime]]:
+    return db.query(NFT.id, NFT.reserved_at).filter(
+        and_(
+            NFT.is_reserved,
+            ~NFT.is_sold,
+            NFT.reserved_at.isnot(None)
+        )
+    ).all()
 
-async def expire_specific_reservation(nft_id: int):
+@instrumented("load_active_reservations")
+async def load_active_reservations() -> List[Tuple[int, datetime]]:
+    """Load (nft_id, reserved_at) of every active reservation to rebuild the expiry timers"""
+    return await run_in_job_thread(_in_session, _active_reservations)
+
+@instrumented("release_due_reservations")
+async def release_due_reservations(nft_ids: List[int]) -> List[int]:
     """
-    Expire a specific NFT reservation
+    Release a batch of reservations whose expiry timer fired
+    
+    The NFTs are re-checked in SQL, so NFTs sold or reserved again since the
+    timer was armed are left alone. Errors propagate so the engine retries.
     
     Args:
-        nft_id: NFT ID to expire
+        nft_ids: NFT IDs due for expiry
+    
+    Returns:
+        IDs of the NFTs released
     """
-    try:
-        db: Session = SessionLocal()
-        
-        # Find the NFT
-        nft = db.query(NFT).filter(
+    expiry_time = reservation_cutoff()
+    released_ids, expired_ids = await run_in_job_thread(
+        _in_session,
+        release_reservations,
+        select(NFT.id)
+        .where(
             and_(
-                NFT.id == nft_id,
-                NFT.is_reserved == True,
-                NFT.is_sold == False
+                NFT.id.in_(nft_ids),
+                NFT.is_reserved,
+                ~NFT.is_sold,
+                NFT.reserved_at <= expiry_time
             )
-        ).first()
-        
-        if nft:
-            # Release the reservation
-            nft.is_reserved = False
-            nft.reserved_at = None
-            
-            # Cancel related pending transactions
-            pending_transactions = db.query(Transaction).filter(
-                and_(
-                    Transaction.nft_id == nft_id,
-                    Transaction.status == "pending"
-                )
-            ).all()
-            
-            for transaction in pending_transactions:
-                transaction.status = "expired"
-                transaction.updated_at = datetime.utcnow()
-                logger.info(f"Expired transaction {transaction.id} for NFT {nft_id}")
-            
-            db.commit()
-            logger.info(f"Expired specific reservation for NFT {nft_id}")
-        else:
-            logger.info(f"NFT {nft_id} is no longer reserved or was sold")
-        
-        db.close()
-        
-    except Exception as e:
-        logger.error(f"Error expiring specific reservation for NFT {nft_id}: {str(e)}")
-        if 'db' in locals():
-            db.rollback()
-            db.close()
+        )
+        .with_for_update(skip_locked=True)
+    )
+    
+    await _reopen(released_ids)
+    
+    if released_ids:
+        logger.info(f"Released {len(released_ids)} expired reservations and expired {len(expired_ids)} transactions")
+    return released_ids
+
+def add_reservation_expiry_job(nft_id: int, reserved_at: datetime):
+    """
+    Arm the expiry timer of a new reservation
+    
+    Args:
+        nft_id: Reserved NFT ID
+        reserved_at: Reservation time as stored on the NFT
+    """
+    expiry_engine.arm(nft_id, reserved_at)
 
 def cancel_reservation_expiry(nft_id: int):
     """
-    Cancel a scheduled reservation expiry (e.g., when payment is completed)
+    Cancel a reservation's expiry timer (e.g., when payment is completed)
     
     Args:
         nft_id: NFT ID to cancel expiry for
     """
-    global scheduler
-    if scheduler:
-        try:
-            scheduler.remove_job(f'expire_nft_{nft_id}')
-            logger.info(f"Cancelled reservation expiry for NFT {nft_id}")
-        except Exception as e:
-            logger.warning(f"Could not cancel reservation expiry for NFT {nft_id}: {str(e)}")
+    if expiry_engine.cancel(nft_id):
+        logger.debug(f"Cancelled reservation expiry for NFT {nft_id}")
+
+@instrumented("sync_revoked_tokens")
+async def sync_revoked_tokens() -> int:
+    """
+    Bring the revocation filter up to date with revoked_tokens
+    Reads only rows revoked since the last sync, except for the periodic rebuild
+    
+    Returns:
+        Number of jtis read
+    """
+    now = datetime.utcnow()
+    if revocation_filter.needs_rebuild(now):
+        jtis = await run_in_job_thread(_in_session, revoked_jtis, now)
+        return revocation_filter.rebuild(jtis, now)
+    jtis = await run_in_job_thread(_in_session, revoked_jtis, now, revocation_filter.since())
+    return revocation_filter.merge(jtis, now)
+
+def _prune_auth_tokens(db: Session, now: datetime) -> int:
+    revoked = db.execute(
+        delete(RevokedToken).where(RevokedToken.expires_at <= now)
+    ).rowcount
+    refresh = db.execute(
+        delete(RefreshToken).where(RefreshToken.expires_at <= now)
+    ).rowcount
+    return revoked + refresh
+
+@instrumented("prune_auth_tokens")
+async def prune_auth_tokens() -> int:
+    """
+    Delete refresh tokens and revocation records of tokens that have expired
+    
+    Returns:
+        Number of rows deleted
+    """
+    return await run_in_job_thread(_in_session, _prune_auth_tokens, datetime.utcnow())
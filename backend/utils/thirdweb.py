@@ -7,6 +7,7 @@ import httpx
 import asyncio
 from typing import Dict, Optional, Any
 from config import config
+from utils.metrics import observe_outbound
 
 # Thirdweb API base URL
 THIRDWEB_API_BASE = "https://api.thirdweb.com"
@@ -60,7 +61,8 @@ async def fetch_nft_metadata(
             }
             
             # Make API request
-            response = await client.get(url, headers=headers)
+            with observe_outbound("thirdweb", "nft_metadata"):
+                response = await client.get(url, headers=headers)
             
             if response.status_code == 404:
                 raise ValueError(f"NFT not found: chain={chain_id}, contract={contract_address}, token_id={nft_id}")
@@ -149,7 +151,8 @@ async def fetch_marketplace_listings(
             }
             
             # Make API request
-            response = await client.get(url, headers=headers, params=params)
+            with observe_outbound("thirdweb", "marketplace_listings"):
+                response = await client.get(url, headers=headers, params=params)
             
             if response.status_code != 200:
                 raise httpx.HTTPError(f"Thirdweb API error: {response.status_code} - {response.text}")
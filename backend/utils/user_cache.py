@@ -0,0 +1,152 @@
+"""
+Cache of authenticated users for get_current_user.
+
+Every authenticated request used to load its user row just to learn the id,
+email and admin flag. Verified tokens now resolve to an immutable snapshot of
+those columns held in a bounded in-process LRU, so repeat requests within
+USER_CACHE_TTL_SECONDS authenticate without touching the database.
+
+Entries are dropped whenever a session commits an update or delete of the
+user (the OAuth callback refreshing the profile, a change of the admin flag),
+so changes made through the ORM take effect on the next request in this
+worker. Other workers, and changes made with raw SQL, pick them up once the
+entry expires; the TTL bounds how long a revoked admin flag can linger.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import Config
+from models.user import User
+from utils.metrics import cache_lookups
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Detached, read-only copy of the user columns needed by routes"""
+    id: int
+    name: str
+    email: str
+    google_id: str
+    profile_pic: Optional[str]
+    is_admin: bool
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            name=user.name,
+            email=user.email,
+            google_id=user.google_id,
+            profile_pic=user.profile_pic,
+            is_admin=bool(user.is_admin),
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+    def to_dict(self):
+        """Same shape as User.to_dict"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "email": self.email,
+            "google_id": self.google_id,
+            "profile_pic": self.profile_pic,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+# Shared by all UserCache instances; their own hits/misses are per instance
+_hits = cache_lookups.labels("user", "hit")
+_misses = cache_lookups.labels("user", "miss")
+
+
+class UserCache:
+    """Bounded LRU of user snapshots with a per-entry TTL"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[float, UserSnapshot]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int) -> Optional[UserSnapshot]:
+        """Cached snapshot of a user, or None if absent or expired"""
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            _misses.inc()
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        _hits.inc()
+        return entry[1]
+
+    def put(self, user: User) -> UserSnapshot:
+        """Snapshot a freshly loaded user and cache it"""
+        snapshot = UserSnapshot.from_user(user)
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return snapshot
+        self._entries[snapshot.id] = (time.monotonic() + self.ttl_seconds, snapshot)
+        self._entries.move_to_end(snapshot.id)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id: int):
+        """Drop a user so the next request reloads it"""
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def to_dict(self):
+        """Cache statistics for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+# Global cache used by both get_current_user dependencies
+user_cache = UserCache(max_entries=Config.USER_CACHE_MAX_ENTRIES, ttl_seconds=Config.USER_CACHE_TTL_SECONDS)
+
+_CHANGED_KEY = "user_cache_changed"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _remember_changed_user(mapper, connection, target):
+    # Dropped after commit rather than at flush, so a concurrent request
+    # cannot re-cache the row as it was before the transaction
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_CHANGED_KEY, set()).add(target.id)
+    else:
+        user_cache.invalidate(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop(_CHANGED_KEY, ()):
+        user_cache.invalidate(user_id)
+
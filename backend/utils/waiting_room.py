@@ -0,0 +1,360 @@
+"""
+Virtual waiting room for high-demand NFT drops.
+
+NFTs put into drop mode get a FIFO admission queue. Every purchase attempt
+takes (or re-polls) a ticket; only the head of the queue is admitted to try
+the reservation against the database, everyone else gets their position and
+an ETA straight from the queue. Once the head reserves the NFT the queue is
+closed, so late arrivals are turned away without a database round trip,
+until the reservation lapses or is released.
+
+Two backends share one interface: an in-process one (single worker) and a
+Redis one (shared across workers and hosts).
+"""
+import bisect
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueueStatus:
+    """Position of a user in a drop queue after joining or polling it"""
+    nft_id: int
+    ticket: int
+    position: int  # 0 means head of the queue
+    admitted: bool  # True if this request may attempt the reservation
+    eta_seconds: float
+    closed: bool = False
+
+    def to_dict(self) -> dict:
+        """Convert queue status to dictionary for API responses"""
+        return asdict(self)
+
+
+def parse_nft_ids(value: str) -> Set[int]:
+    """Parse a comma-separated list of NFT IDs (e.g. DROP_MODE_NFT_IDS)"""
+    return {int(part) for part in value.split(",") if part.strip()}
+
+
+class _MemoryQueue:
+    """Ticket bookkeeping for a single NFT"""
+
+    def __init__(self):
+        self.next_ticket = 1
+        self.tickets: Dict[str, int] = {}  # user key -> ticket
+        self.owners: Dict[int, str] = {}  # ticket -> user key
+        self.order: List[int] = []  # live tickets, ascending
+        self.expires_at: Dict[str, float] = {}  # user key -> ticket expiry
+        self.head_lock: Optional[Tuple[str, float]] = None  # (user key, lock expiry)
+
+    def remove(self, user_key: str):
+        ticket = self.tickets.pop(user_key, None)
+        if ticket is None:
+            return
+        self.owners.pop(ticket, None)
+        self.expires_at.pop(user_key, None)
+        index = bisect.bisect_left(self.order, ticket)
+        if index < len(self.order) and self.order[index] == ticket:
+            del self.order[index]
+        if self.head_lock and self.head_lock[0] == user_key:
+            self.head_lock = None
+
+
+class MemoryWaitingRoom:
+    """
+    In-process waiting room.
+
+    All operations run without awaiting, so they are atomic on the event loop.
+    Queues are per worker; use the Redis backend when running several workers.
+    """
+
+    def __init__(
+        self,
+        admission_ttl: float,
+        eta_per_ticket: float,
+        grace: float,
+        initial_nft_ids: Iterable[int] = ()
+    ):
+        self.admission_ttl = admission_ttl
+        self.eta_per_ticket = eta_per_ticket
+        self.grace = grace
+        self._active: Set[int] = set(initial_nft_ids)
+        self._closed: Dict[int, Optional[float]] = {}  # NFT ID -> epoch seconds it reopens, if ever
+        self._queues: Dict[int, _MemoryQueue] = {}
+
+    async def enable(self, nft_id: int):
+        """Put an NFT into drop mode"""
+        self._active.add(nft_id)
+
+    async def disable(self, nft_id: int):
+        """Take an NFT out of drop mode and discard its queue"""
+        self._active.discard(nft_id)
+        self._closed.pop(nft_id, None)
+        self._queues.pop(nft_id, None)
+
+    async def is_active(self, nft_id: int) -> bool:
+        """Check whether purchases of an NFT go through the waiting room"""
+        return nft_id in self._active
+
+    async def join(self, nft_id: int, user_key: str) -> QueueStatus:
+        """
+        Take a ticket for an NFT, or refresh an existing one
+
+        Args:
+            nft_id: NFT being purchased
+            user_key: Stable identifier of the buyer (one ticket per buyer)
+
+        Returns:
+            QueueStatus; admitted is True for at most one in-flight request per NFT
+        """
+        if self._is_closed(nft_id):
+            return QueueStatus(nft_id=nft_id, ticket=0, position=0, admitted=False, eta_seconds=0, closed=True)
+
+        now = time.monotonic()
+        queue = self._queues.setdefault(nft_id, _MemoryQueue())
+
+        if queue.head_lock and queue.head_lock[1] <= now:
+            logger.warning(f"Drop admission for NFT {nft_id} timed out for {queue.head_lock[0]}")
+            queue.remove(queue.head_lock[0])
+
+        # Drop abandoned tickets from the front so they do not block the queue;
+        # abandoned tickets further back are dropped once they reach the front
+        while queue.order and queue.head_lock is None:
+            head_user = queue.owners[queue.order[0]]
+            if head_user == user_key or queue.expires_at.get(head_user, 0) > now:
+                break
+            queue.remove(head_user)
+
+        ticket = queue.tickets.get(user_key)
+        if ticket is None:
+            ticket = queue.next_ticket
+            queue.next_ticket += 1
+            queue.tickets[user_key] = ticket
+            queue.owners[ticket] = user_key
+            queue.order.append(ticket)
+
+        position = bisect.bisect_left(queue.order, ticket)
+        admitted = False
+        if position == 0 and queue.head_lock is None:
+            queue.head_lock = (user_key, now + self.admission_ttl)
+            admitted = True
+
+        eta_seconds = position * self.eta_per_ticket
+        queue.expires_at[user_key] = now + eta_seconds + self.grace
+
+        return QueueStatus(
+            nft_id=nft_id,
+            ticket=ticket,
+            position=position,
+            admitted=admitted,
+            eta_seconds=eta_seconds
+        )
+
+    async def leave(self, nft_id: int, user_key: str):
+        """Give up a ticket (called once an admitted request has finished)"""
+        queue = self._queues.get(nft_id)
+        if queue:
+            queue.remove(user_key)
+
+    async def close(self, nft_id: int, until: Optional[float] = None):
+        """
+        Close the queue after a successful reservation and turn away everyone waiting
+
+        Args:
+            nft_id: Reserved NFT
+            until: Epoch seconds when the reservation lapses; the queue reopens
+                on its own then, even before the expiry timer releases it
+        """
+        self._closed[nft_id] = until
+        self._queues.pop(nft_id, None)
+
+    async def reopen(self, nft_id: int):
+        """Reopen a closed queue (e.g. when the reservation expires)"""
+        self._closed.pop(nft_id, None)
+
+    def _is_closed(self, nft_id: int) -> bool:
+        if nft_id not in self._closed:
+            return False
+        until = self._closed[nft_id]
+        if until is not None and time.time() >= until:
+            del self._closed[nft_id]
+            return False
+        return True
+
+    async def stats(self, nft_id: int) -> dict:
+        """Queue statistics for monitoring"""
+        queue = self._queues.get(nft_id)
+        return {
+            "nft_id": nft_id,
+            "active": nft_id in self._active,
+            "closed": self._is_closed(nft_id),
+            "waiting": len(queue.order) if queue else 0,
+            "head": queue.head_lock[0] if queue and queue.head_lock else None,
+        }
+
+
+# KEYS: queue zset, ticket sequence, ticket expiry zset, head lock, closed flag
+# ARGV: user key, now (ms), eta per ticket (ms), grace (ms), admission ttl (ms)
+_JOIN_SCRIPT = """
+if redis.call('EXISTS', KEYS[5]) == 1 then
+    return {0, 0, 0, 1}
+end
+local now = tonumber(ARGV[2])
+local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now)
+local holder = redis.call('GET', KEYS[4])
+for _, user in ipairs(expired) do
+    if user ~= ARGV[1] and user ~= holder then
+        redis.call('ZREM', KEYS[1], user)
+        redis.call('ZREM', KEYS[3], user)
+    end
+end
+local ticket = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not ticket then
+    ticket = redis.call('INCR', KEYS[2])
+    redis.call('ZADD', KEYS[1], ticket, ARGV[1])
+end
+local position = redis.call('ZRANK', KEYS[1], ARGV[1])
+local admitted = 0
+if position == 0 and redis.call('SET', KEYS[4], ARGV[1], 'NX', 'PX', ARGV[5]) then
+    admitted = 1
+end
+redis.call('ZADD', KEYS[3], now + position * tonumber(ARGV[3]) + tonumber(ARGV[4]), ARGV[1])
+return {tonumber(ticket), position, admitted, 0}
+"""
+
+# KEYS: queue zset, ticket expiry zset, head lock
+# ARGV: user key
+_LEAVE_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if redis.call('GET', KEYS[3]) == ARGV[1] then
+    redis.call('DEL', KEYS[3])
+end
+return 1
+"""
+
+
+class RedisWaitingRoom:
+    """
+    Redis-backed waiting room shared by all workers.
+
+    Each NFT queue is a sorted set scored by ticket number; join and leave run
+    as Lua scripts so ticket issue, ranking and head admission are atomic.
+    """
+
+    KEY_PREFIX = "drop"
+
+    def __init__(
+        self,
+        redis_client,
+        admission_ttl: float,
+        eta_per_ticket: float,
+        grace: float,
+        initial_nft_ids: Iterable[int] = ()
+    ):
+        self.redis = redis_client
+        self.admission_ttl = admission_ttl
+        self.eta_per_ticket = eta_per_ticket
+        self.grace = grace
+        self._static_active: Set[int] = set(initial_nft_ids)
+        self._join = redis_client.register_script(_JOIN_SCRIPT)
+        self._leave = redis_client.register_script(_LEAVE_SCRIPT)
+
+    def _keys(self, nft_id: int) -> Dict[str, str]:
+        base = f"{self.KEY_PREFIX}:{nft_id}"
+        return {
+            "queue": f"{base}:queue",
+            "seq": f"{base}:seq",
+            "expiry": f"{base}:expiry",
+            "head": f"{base}:head",
+            "closed": f"{base}:closed",
+        }
+
+    async def enable(self, nft_id: int):
+        await self.redis.srem(f"{self.KEY_PREFIX}:disabled", nft_id)
+        await self.redis.sadd(f"{self.KEY_PREFIX}:active", nft_id)
+
+    async def disable(self, nft_id: int):
+        # Recorded in Redis so every worker stops treating a DROP_MODE_NFT_IDS entry as a drop
+        if nft_id in self._static_active:
+            await self.redis.sadd(f"{self.KEY_PREFIX}:disabled", nft_id)
+        await self.redis.srem(f"{self.KEY_PREFIX}:active", nft_id)
+        await self.redis.delete(*self._keys(nft_id).values())
+
+    async def is_active(self, nft_id: int) -> bool:
+        if nft_id in self._static_active:
+            return not await self.redis.sismember(f"{self.KEY_PREFIX}:disabled", nft_id)
+        return bool(await self.redis.sismember(f"{self.KEY_PREFIX}:active", nft_id))
+
+    async def join(self, nft_id: int, user_key: str) -> QueueStatus:
+        keys = self._keys(nft_id)
+        ticket, position, admitted, closed = await self._join(
+            keys=[keys["queue"], keys["seq"], keys["expiry"], keys["head"], keys["closed"]],
+            args=[
+                user_key,
+                int(time.time() * 1000),
+                int(self.eta_per_ticket * 1000),
+                int(self.grace * 1000),
+                int(self.admission_ttl * 1000),
+            ]
+        )
+        return QueueStatus(
+            nft_id=nft_id,
+            ticket=int(ticket),
+            position=int(position),
+            admitted=bool(admitted),
+            eta_seconds=int(position) * self.eta_per_ticket,
+            closed=bool(closed)
+        )
+
+    async def leave(self, nft_id: int, user_key: str):
+        keys = self._keys(nft_id)
+        await self._leave(keys=[keys["queue"], keys["expiry"], keys["head"]], args=[user_key])
+
+    async def close(self, nft_id: int, until: Optional[float] = None):
+        keys = self._keys(nft_id)
+        # The flag expires with the reservation
+        await self.redis.set(keys["closed"], 1, pxat=int(until * 1000) if until is not None else None)
+        await self.redis.delete(keys["queue"], keys["expiry"], keys["head"])
+
+    async def reopen(self, nft_id: int):
+        await self.redis.delete(self._keys(nft_id)["closed"])
+
+    async def stats(self, nft_id: int) -> dict:
+        keys = self._keys(nft_id)
+        return {
+            "nft_id": nft_id,
+            "active": await self.is_active(nft_id),
+            "closed": bool(await self.redis.exists(keys["closed"])),
+            "waiting": await self.redis.zcard(keys["queue"]),
+            "head": await self.redis.get(keys["head"]),
+        }
+
+
+def create_waiting_room():
+    """Create the waiting room backend selected by DROP_MODE_BACKEND"""
+    initial_nft_ids = parse_nft_ids(Config.DROP_MODE_NFT_IDS)
+    settings = {
+        "admission_ttl": Config.DROP_ADMISSION_TTL_SECONDS,
+        "eta_per_ticket": Config.DROP_ETA_SECONDS_PER_TICKET,
+        "grace": Config.DROP_TICKET_GRACE_SECONDS,
+        "initial_nft_ids": initial_nft_ids,
+    }
+
+    if Config.DROP_MODE_BACKEND.lower() == "redis":
+        import redis.asyncio as aioredis
+        client = aioredis.from_url(Config.REDIS_URL, decode_responses=True)
+        logger.info("Drop waiting room using Redis backend")
+        return RedisWaitingRoom(client, **settings)
+
+    return MemoryWaitingRoom(**settings)
+
+
+# Global waiting room instance
+waiting_room = create_waiting_room()
@@ -29,7 +29,13 @@ const GoogleLogin = () => {
     window.location.href = 'http://localhost:8000/auth/login-google';
   };
 
-  const handleLogout = () => {
+  const handleLogout = async () => {
+    try {
+      // Revokes the access token and the refresh token cookie's family
+      await apiClient.post('/auth/logout', null, { withCredentials: true });
+    } catch (error) {
+      console.error('Logout failed:', error);
+    }
     localStorage.removeItem('jwt_token');
     localStorage.removeItem('user_data');
     setUser(null);
@@ -23,12 +23,44 @@ apiClient.interceptors.request.use(
   }
 );
 
+// Access tokens are short-lived; one refresh is shared by every request that hit a 401.
+// The refresh token itself is an HttpOnly cookie scoped to /auth, so only credentials are sent.
+let refreshing = null;
+
+const refreshAccessToken = () => {
+  if (!refreshing) {
+    refreshing = apiClient
+      .post('/auth/refresh', null, { withCredentials: true, skipAuthRefresh: true })
+      .then((response) => {
+        const token = response.data.data.access_token;
+        localStorage.setItem('jwt_token', token);
+        return token;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+};
+
 // Response interceptor to handle errors
 apiClient.interceptors.response.use(
   (response) => {
     return response;
   },
-  (error) => {
+  async (error) => {
+    const request = error.config;
+    if (error.response?.status === 401 && request && !request.skipAuthRefresh && !request.retried) {
+      // Access token expired: renew it once and replay the request
+      try {
+        const token = await refreshAccessToken();
+        request.retried = true;
+        request.headers.Authorization = `Bearer ${token}`;
+        return apiClient(request);
+      } catch (refreshError) {
+        // Fall through to logging out below
+      }
+    }
     if (error.response?.status === 401) {
       // Token expired or invalid
       localStorage.removeItem('jwt_token');
@@ -28,12 +28,49 @@ api.interceptors.request.use(
   }
 );
 
+// Access tokens are short-lived; one refresh is shared by every request that hit a 401.
+// The refresh token itself is an HttpOnly cookie scoped to /auth, so only credentials are sent.
+let refreshing = null;
+
+const refreshAccessToken = () => {
+  if (!refreshing) {
+    refreshing = api
+      .post('/auth/refresh', null, { withCredentials: true, skipAuthRefresh: true })
+      .then((response) => {
+        const token = response.data.data.access_token;
+        localStorage.setItem('jwt_token', token);
+        return token;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+};
+
 // Response interceptor for error handling
 api.interceptors.response.use(
   (response) => {
     return response;
   },
-  (error) => {
+  async (error) => {
+    // Access token expired: renew it once and replay the request
+    const request = error.config;
+    if (
+      error.response?.status === 401 &&
+      typeof window !== 'undefined' &&
+      request && !request.skipAuthRefresh && !request.retried
+    ) {
+      try {
+        const token = await refreshAccessToken();
+        request.retried = true;
+        request.headers.Authorization = `Bearer ${token}`;
+        return api(request);
+      } catch (refreshError) {
+        // Fall through to the login redirect below
+      }
+    }
+
     // Handle 401 unauthorized - redirect to login
     if (error.response?.status === 401) {
       if (typeof window !== 'undefined') {
@@ -148,7 +185,8 @@ export const authAPI = {
   // Logout
   logout: async () => {
     try {
-      const response = await api.post('/auth/logout');
+      // Credentials carry the refresh token cookie so its family is revoked too
+      const response = await api.post('/auth/logout', null, { withCredentials: true });
       localStorage.removeItem('jwt_token');
       return response.data;
     } catch (error) {